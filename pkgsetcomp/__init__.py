@@ -4,6 +4,7 @@
 pkgsetcomp module
 
 """
+import sys
 
 
 def __read_version_txt():
@@ -16,8 +17,19 @@ def __read_version_txt():
     return version
 
 
-global __version__
-global version
-version = __version__ = __read_version_txt()
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """read VERSION.txt on first access to __version__ or version
+        (PEP 562), instead of on every import"""
+        if name in ('__version__', 'version'):
+            value = __read_version_txt()
+            globals().update(__version__=value, version=value)
+            return value
+        raise AttributeError(
+            "module %r has no attribute %r" % (__name__, name))
+else:
+    global __version__
+    global version
+    version = __version__ = __read_version_txt()
 
 # __ALL__ = ['pkgsetcomp', 'version', '__version__']
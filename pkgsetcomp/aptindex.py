@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import absolute_import, print_function
+"""
+Package metadata indexes built from the APT ``Packages`` lists
+(``/var/lib/apt/lists/*_Packages``) and the dpkg status file
+
+Each index is a sorted :class:`pkgsetcomp.pkgset.PkgSet` of package
+names plus :mod:`array` columns in the same order; a list of names is
+resolved to column positions by binary search
+(:meth:`PkgSet.positions`), and totals are sums over those positions.
+
+* :class:`PackageSizes`: ``Size`` and ``Installed-Size``
+* :class:`SourceIndex`: binary package -> ``Source`` package
+"""
+
+import array
+import collections
+import glob
+import os
+
+from pkgsetcomp import dpkg, rootfs
+from pkgsetcomp.pkgset import PkgSet
+
+APT_LISTS = '/var/lib/apt/lists'
+PACKAGES_GLOB = '*_Packages'
+SOURCE_FIELDS = ('Package', 'Source')
+
+SizeTotals = collections.namedtuple('SizeTotals', (
+    'count',
+    'download',
+    'installed',
+    'missing'))
+
+
+def get_packages_files(lists_dir=APT_LISTS):
+    """
+    Args:
+        lists_dir (str): APT lists directory
+    Returns:
+        list: sorted paths of the uncompressed ``*_Packages`` files
+    """
+    return sorted(glob.glob(os.path.join(lists_dir, PACKAGES_GLOB)))
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class PackageSizes(object):
+
+    """
+    ``Size`` (download bytes) and ``Installed-Size`` (KiB) columns for
+    a sorted set of package names
+
+    Args:
+        sizes (dict): package name -> (size, installed_size)
+    """
+
+    def __init__(self, sizes=None):
+        sizes = sizes or {}
+        self.names = PkgSet(sizes)
+        self.size = array.array('L', (sizes[name][0] for name in self.names))
+        self.installed_size = array.array(
+            'L', (sizes[name][1] for name in self.names))
+
+    @classmethod
+    def from_apt_lists(cls,
+                       lists_dir=APT_LISTS,
+                       status=dpkg.DPKG_STATUS):
+        """
+        Index package sizes from the APT lists and the dpkg status file
+
+        The first ``Size``/``Installed-Size`` found in the ``Packages``
+        files is kept for each name; the ``Installed-Size`` of installed
+        packages is then taken from the dpkg status file.
+
+        Args:
+            lists_dir (str): APT lists directory (None to skip)
+            status (str): path to a dpkg status file (None to skip)
+        Returns:
+            PackageSizes: size index
+        """
+        fields = ('Package', 'Size', 'Installed-Size')
+        sizes = {}
+        for filename in (get_packages_files(lists_dir) if lists_dir else ()):
+            with dpkg.open_text(filename) as f:
+                for para in dpkg.iter_paragraphs(f, fields):
+                    name = para.get('Package')
+                    if name and name not in sizes:
+                        sizes[name] = (_int(para.get('Size')),
+                                       _int(para.get('Installed-Size')))
+        if status and os.path.exists(status):
+            with dpkg.open_text(status) as f:
+                for para in dpkg.iter_installed(f, fields):
+                    name = para['Package']
+                    sizes[name] = (sizes.get(name, (0, 0))[0],
+                                   _int(para.get('Installed-Size')))
+        return cls(sizes)
+
+    @classmethod
+    def from_rootfs(cls, root):
+        """
+        Index package sizes from the APT lists and the dpkg status file
+        of a rootfs directory
+
+        Args:
+            root (str): rootfs directory
+        Returns:
+            PackageSizes: size index
+        Raises:
+            ValueError: if ``root`` is not a directory (the ``Packages``
+                files of a tarball are not read)
+        """
+        if not os.path.isdir(root):
+            raise ValueError("Package sizes require a rootfs directory, "
+                             "not %r" % root)
+        return cls.from_apt_lists(
+            lists_dir=os.path.join(root, APT_LISTS.lstrip('/')),
+            status=os.path.join(root, rootfs.DPKG_STATUS))
+
+    def __len__(self):
+        return len(self.names)
+
+    def totals(self, names):
+        """
+        Sum the sizes of ``names``
+
+        Args:
+            names (iterable): package names (PkgSet or any iterable)
+        Returns:
+            SizeTotals: (count, download bytes, installed bytes, number
+            of names missing from the index)
+        """
+        if not isinstance(names, PkgSet):
+            names = PkgSet(names)
+        found = [i for i in self.names.positions(names) if i >= 0]
+        size, installed_size = self.size, self.installed_size
+        return SizeTotals(
+            len(names),
+            sum(size[i] for i in found),
+            sum(installed_size[i] for i in found) * 1024,
+            len(names) - len(found))
+
+
+class SourceIndex(object):
+
+    """
+    Source package names for a sorted set of binary package names
+
+    Source names are stored once (:attr:`sources`) and referenced by
+    position from the :attr:`source_ids` column, so grouping a list of
+    binaries is one lookup of their positions in :attr:`names`.
+
+    Args:
+        sources (dict): binary package name -> source package name
+    """
+
+    def __init__(self, sources=None):
+        sources = sources or {}
+        self.names = PkgSet(sources)
+        self.sources = PkgSet(sources.values())
+        source_ids = dict(
+            (source, i) for i, source in enumerate(self.sources))
+        self.source_ids = array.array(
+            'L', (source_ids[sources[name]] for name in self.names))
+
+    @classmethod
+    def from_apt_lists(cls,
+                       lists_dir=APT_LISTS,
+                       status=dpkg.DPKG_STATUS):
+        """
+        Index the source packages of the binary packages in the APT
+        lists and the dpkg status file (which takes precedence)
+
+        Args:
+            lists_dir (str): APT lists directory (None to skip)
+            status (str): path to a dpkg status file (None to skip)
+        Returns:
+            SourceIndex: source package index
+        """
+        sources = {}
+        for filename in (get_packages_files(lists_dir) if lists_dir else ()):
+            with dpkg.open_text(filename) as f:
+                for para in dpkg.iter_paragraphs(f, SOURCE_FIELDS):
+                    name = para.get('Package')
+                    if name and name not in sources:
+                        sources[name] = dpkg.source_name(para)
+        if status and os.path.exists(status):
+            with dpkg.open_text(status) as f:
+                sources.update(cls._read_installed(f))
+        return cls(sources)
+
+    @classmethod
+    def from_dpkg_lines(cls, status):
+        """
+        Index the source packages of the installed packages
+
+        Args:
+            status (iterable): lines of a dpkg status file
+                (e.g. from :func:`pkgsetcomp.rootfs.read_dpkg_database`)
+        Returns:
+            SourceIndex: source package index
+        """
+        return cls(dict(cls._read_installed(status)))
+
+    @staticmethod
+    def _read_installed(lines):
+        for para in dpkg.iter_installed(lines, SOURCE_FIELDS):
+            yield para['Package'], dpkg.source_name(para)
+
+    def __len__(self):
+        return len(self.names)
+
+    def source(self, name):
+        """
+        Args:
+            name (str): binary package name
+        Returns:
+            str: source package name (``name`` if it is not indexed)
+        """
+        try:
+            return self.sources[self.source_ids[self.names.index(name)]]
+        except ValueError:
+            return name
+
+    def group(self, names):
+        """
+        Group binary package names by source package
+
+        Names missing from the index are their own source package.
+
+        Args:
+            names (iterable): binary package names (PkgSet or any iterable)
+        Returns:
+            OrderedDict: source name -> sorted list of binary names,
+            sorted by source name
+        """
+        if not isinstance(names, PkgSet):
+            names = PkgSet(names)
+        groups = collections.defaultdict(list)
+        for name, i in zip(names, self.names.positions(names)):
+            if i < 0:
+                groups[name].append(name)
+            else:
+                groups[self.sources[self.source_ids[i]]].append(name)
+        return collections.OrderedDict(
+            (source, sorted(groups[source])) for source in sorted(groups))
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Run VCS commands with asyncio subprocesses (Python 3.7+)
+
+:func:`ash` is the asynchronous counterpart of :func:`pkgsetcomp.pyrpo.sh`:
+commands are started with ``asyncio.create_subprocess_exec`` (shell
+command strings through ``/bin/sh -c``), at most :data:`CONCURRENCY` at a
+time across the whole event loop, and killed after ``timeout`` seconds.
+
+The async reports first run the commands of the cached properties
+which the report uses (``status``, ``last_commit``, ...) concurrently,
+storing the results in the instance ``__dict__`` as
+:class:`pyrpo.cached_property` would, and then generate the report from
+the cached values; the log of a ``full`` report is read with
+:func:`log_records`. The commands of a report are run with :func:`ash`.
+
+The other report lines are generated in the loop's default executor:
+they only read the cached values, unless a prefetch failed (e.g.
+``last_commit`` of a repository without commits) or the repository
+type has no :data:`PREFETCH_COMMANDS` (svn), in which case the property
+runs its blocking command there, as a fallback, without blocking the
+loop.
+
+.. code:: python
+
+    >>> repos = list(pyrpo.find_unique_repos('~/src'))
+    >>> run_repo_report(repos, report='status')
+
+:mod:`pkgsetcomp.pyrpo` only imports this module on first use of
+:meth:`pyrpo.Repository.ash`, so it stays importable on Python 2.
+"""
+
+import asyncio
+import os
+import signal
+import sys
+
+from pkgsetcomp.pyrpo import REPORT_TYPES, log
+
+CONCURRENCY = 64
+TIMEOUT = 60
+
+# cached properties used by each report type (default: all)
+REPORT_PROPERTIES = {
+    'sh': ('remote_url',),
+    'origin': ('remote_url',),
+    'hgsub': ('remote_url',),
+    'gitsubmodule': ('remote_url',),
+    'pip': ('remote_url', 'current_id'),
+    'full': ('status', 'remote_url'),
+    'status': ('status', 'last_commit', 'remote_url'),
+}
+
+# label -> (cached property, command, ignore_error, transform)
+# (the remote_url, current_id and branch of git and hg repositories are
+# read from files: see pkgsetcomp.gitfiles and pkgsetcomp.hgfiles)
+PREFETCH_COMMANDS = {
+    'hg': (
+        ('status', 'hg status', False, str.rstrip),
+    ),
+    'git': (
+        ('status', 'git status -s', False, None),
+    ),
+    'bzr': (
+        ('status', 'bzr status', False, None),
+        ('current_id',
+         "bzr version-info --custom --template='{revision_id}'", False, None),
+        ('branch', 'bzr nick', False, None),
+    ),
+}
+
+_semaphore = None
+_semaphore_loop = None
+
+
+def set_concurrency(concurrency):
+    """
+    Args:
+        concurrency (int): maximum number of commands running at once
+            (takes effect for commands started afterwards)
+    """
+    global CONCURRENCY, _semaphore
+    CONCURRENCY = concurrency
+    _semaphore = None
+
+
+def get_semaphore():
+    """
+    Returns:
+        asyncio.Semaphore: the command semaphore of the running loop
+    """
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def ash(cmd, ignore_error=False, cwd=None, timeout=TIMEOUT,
+              stderr=True):
+    """
+    Run a command and return its output (stdout and stderr)
+
+    Args:
+        cmd (str or sequence): shell command string, or argument list
+            (run without a shell)
+        ignore_error (bool): return the output of a failed command
+            instead of raising
+        cwd (str): working directory
+        timeout (float): seconds to wait for the command (None: forever)
+        stderr (bool): include stderr in the output (else discard it)
+    Returns:
+        str: command output
+    Raises:
+        Exception: if the command fails (and not ``ignore_error``)
+        asyncio.TimeoutError: if the command takes longer than
+            ``timeout`` (its process group is killed)
+    """
+    if isinstance(cmd, str):
+        argv = ('/bin/sh', '-c', cmd)
+    else:
+        argv = tuple(cmd)
+    async with get_semaphore():
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=(asyncio.subprocess.STDOUT if stderr else
+                    asyncio.subprocess.DEVNULL),
+            start_new_session=True)
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            # kill the children of /bin/sh too, which hold the pipe open
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            await proc.wait()
+            raise
+    output = stdout.decode('utf-8', 'replace')
+    if proc.returncode and not ignore_error:
+        raise Exception("Subprocess return code: %d\n%r\n%r" % (
+            proc.returncode, cmd, output))
+    return output
+
+
+async def log_records(repo, maxentries=None, timeout=TIMEOUT):
+    """
+    Read the log of a repository (as :meth:`pyrpo.Repository.log_iter`)
+
+    Args:
+        repo (Repository): repository
+        maxentries (int): maximum number of revisions
+        timeout (float): seconds to wait for the log command
+    Returns:
+        list: parsed revisions (empty if the log command fails and
+        ``repo.log_ignore_error``)
+    """
+    cmd = repo.log_cmd(n=maxentries, template=repr(repo.template))
+    output = await repo.ash(cmd, ignore_error=repo.log_ignore_error,
+                            timeout=timeout, stderr=False)
+    revs = []
+    for l in output.split(repo.lsep):
+        l = l.strip()
+        if not l:
+            continue
+        revs.append(repo._parselog(l))
+        if maxentries and len(revs) >= maxentries:
+            break
+    return revs
+
+
+async def _last_commit(repo, timeout=TIMEOUT):
+    revs = await log_records(repo, maxentries=1, timeout=timeout)
+    if not revs:
+        raise Exception("%s: no revisions" % repo)
+    return revs[0]
+
+
+async def prefetch(repo, names=None, timeout=TIMEOUT):
+    """
+    Run the commands of a repository's cached properties concurrently
+    and store their results in ``repo.__dict__``
+
+    A property whose command fails is left unset (it is computed, or
+    raises, when the report accesses it).
+
+    Args:
+        repo (Repository): repository
+        names (iterable): cached property names (default: all of
+            :data:`PREFETCH_COMMANDS` for ``repo.label``, and
+            ``last_commit``)
+        timeout (float): seconds to wait for each command
+    Returns:
+        Repository: ``repo``
+    """
+    if repo.label not in PREFETCH_COMMANDS:
+        return repo
+    wanted = (lambda name: (names is None or name in names) and
+              name not in repo.__dict__)
+    labels, coros = [], []
+    for name, cmd, ignore_error, transform in PREFETCH_COMMANDS[repo.label]:
+        if wanted(name):
+            labels.append((name, cmd, transform))
+            coros.append(repo.ash(cmd, ignore_error=ignore_error,
+                                  timeout=timeout))
+    if wanted('last_commit'):
+        labels.append(('last_commit', 'log', None))
+        coros.append(_last_commit(repo, timeout=timeout))
+    outputs = await asyncio.gather(*coros, return_exceptions=True)
+    for (name, cmd, transform), output in zip(labels, outputs):
+        if isinstance(output, Exception):
+            log.debug("%s: prefetch %r failed: %r" % (repo, cmd, output))
+            continue
+        repo.__dict__[name] = transform(output) if transform else output
+    return repo
+
+
+async def _getattr(repo, name):
+    # a cached value, or the (blocking) property in the default executor
+    if name in repo.__dict__:
+        return repo.__dict__[name]
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, getattr, repo, name)
+
+
+async def full_report(repo, timeout=TIMEOUT):
+    """
+    :meth:`pyrpo.Repository.full_report`, with the log read by
+    :func:`log_records`
+
+    Returns:
+        list: report lines
+    """
+    revs = await log_records(repo, timeout=timeout)
+    if revs:
+        repo.__dict__.setdefault('last_commit', revs[0])
+    last_commit = await _getattr(repo, 'last_commit')
+    status = await _getattr(repo, 'status')
+    lines = ['', '# %s' % next(repo.origin_report()),
+             '%s [%s]' % (last_commit, repo)]
+    if status:
+        lines.extend(status.split('\n'))
+        lines.append('')
+    lines.extend(revs)
+    return lines
+
+
+# report type -> coroutine function(repo, timeout), after the prefetch
+ASYNC_REPORTS = {
+    'full': full_report,
+}
+
+
+async def repo_report(repo, report='full', timeout=TIMEOUT):
+    """
+    Generate one report for one repository
+
+    The cached properties used by the report
+    (:data:`REPORT_PROPERTIES`) are prefetched with :func:`prefetch`;
+    a report of :data:`ASYNC_REPORTS` is then awaited, and any other is
+    generated in the loop's default executor (see the module
+    docstring).
+
+    Args:
+        repo (Repository): repository
+        report (str): report type (one of :data:`pyrpo.REPORT_TYPES`)
+        timeout (float): seconds to wait for each command
+    Returns:
+        list: report lines
+    """
+    reportfunc = REPORT_TYPES[report]
+    await prefetch(repo, REPORT_PROPERTIES.get(report), timeout=timeout)
+    if report in ASYNC_REPORTS:
+        return await ASYNC_REPORTS[report](repo, timeout=timeout)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, lambda: list(reportfunc(repo)))
+
+
+async def do_repo_report(repos, report='full', output=sys.stdout,
+                         timeout=TIMEOUT):
+    """
+    Print a report for each repository, running the reports of all of
+    the repositories concurrently (bounded by :data:`CONCURRENCY`)
+
+    Reports are printed in the order of ``repos``; a report which fails
+    is logged and skipped, as in :func:`pyrpo.do_repo_report`.
+
+    Args:
+        repos (iterable): Repository instances (None is skipped)
+        report (str): report type (one of :data:`pyrpo.REPORT_TYPES`)
+        output (file): file to print the reports to
+        timeout (float): seconds to wait for each command
+    Returns:
+        list: the repositories, in order
+    Raises:
+        Exception: if ``report`` is not a known report type
+    """
+    if report not in REPORT_TYPES:
+        raise Exception("Unrecognized report type: %r (%s)" %
+                        (report, ', '.join(REPORT_TYPES.keys())))
+    repos = [repo for repo in repos if repo is not None]
+    tasks = [asyncio.ensure_future(repo_report(repo, report, timeout))
+             for repo in repos]
+    for repo, task in zip(repos, tasks):
+        try:
+            lines = await task
+        except Exception as e:
+            log.error("%s: %s report failed: %r" % (repo, report, e))
+            continue
+        for l in lines:
+            print(l, file=output)
+    return repos
+
+
+def run_repo_report(repos, report='full', output=sys.stdout,
+                    timeout=TIMEOUT):
+    """
+    Run :func:`do_repo_report` in a new event loop
+
+    Returns:
+        list: the repositories, in order
+    """
+    return asyncio.run(do_repo_report(repos, report, output, timeout))
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import absolute_import, print_function
+"""
+Package database backends
+
+A backend reads, from files only (without spawning a package manager):
+
+* the installed packages, their dependency edges and which of them were
+  automatically installed, as a :class:`pkgsetcomp.depgraph.DepGraph`
+* the package names of a manifest in the distribution's list format
+
+so that comparisons, minimal sets and removal queries run unchanged
+across distributions.
+
+===========  ==========================================================
+``dpkg``     ``var/lib/dpkg/status`` + ``var/lib/apt/extended_states``
+``pacman``   ``var/lib/pacman/local/*/desc``
+``apk``      ``lib/apk/db/installed`` + ``etc/apk/world``
+``rpm-list`` a ``rpm -qa`` listing of names or NEVRAs (no dependencies)
+===========  ==========================================================
+"""
+
+import collections
+import os
+import re
+
+from pkgsetcomp import rootfs, setops
+from pkgsetcomp.depgraph import DepGraph
+
+_dependency_name = re.compile(r'^\s*([^\s<>=~]+)')
+# a NEVRA of ``rpm -qa``: name-version-release.arch, or a gpg-pubkey
+# (which has no arch); package names may contain dashes and digits
+# (``xorg-x11-fonts-ISO8859-1-100dpi``), so anything else is a name
+RPM_ARCHES = ('noarch', 'x86_64', 'i386', 'i486', 'i586', 'i686',
+              'aarch64', 'armv7hl', 'ppc64le', 's390x', 'src')
+_rpm_nevra = re.compile(
+    r'^(gpg-pubkey)-[0-9a-f]{8}-[0-9a-f]{8}$|'
+    r'^(.+)-[^-]+-[^-]+\.(?:%s)$' % '|'.join(RPM_ARCHES))
+
+
+def dependency_name(value):
+    """
+    Args:
+        value (str): dependency or provides entry (e.g. ``bar>=1.0``,
+            ``so:libc.musl-x86_64.so.1``, ``sh=5.1``)
+    Returns:
+        str: name without its version constraint (None if empty)
+    """
+    match = _dependency_name.match(value)
+    return match.group(1) if match is not None else None
+
+
+class PackageBackend(object):
+
+    """
+    Base class of the package database backends
+
+    Args:
+        root (str): root filesystem (directory, or a tarball where the
+            backend supports it; see :func:`pkgsetcomp.rootfs.read_files`)
+    """
+
+    name = None
+
+    def __init__(self, root='/'):
+        self.root = root
+        self._depgraph = None
+
+    def read_depgraph(self):
+        """
+        Read the package database (implemented by each backend)
+
+        Returns:
+            DepGraph: installed package dependency graph
+        """
+        raise NotImplementedError()
+
+    def depgraph(self):
+        """
+        Returns:
+            DepGraph: installed package dependency graph
+            (read on first call)
+        """
+        if self._depgraph is None:
+            self._depgraph = self.read_depgraph()
+        return self._depgraph
+
+    def installed_packages(self):
+        """
+        Returns:
+            list: sorted names of the installed packages
+        """
+        return sorted(self.depgraph().depends)
+
+    def manual_packages(self):
+        """
+        Returns:
+            list: sorted names of the packages which were not
+            automatically installed
+        """
+        return self.depgraph().manual_packages()
+
+    def read_manifest(self, lines):
+        """
+        Read the package names of a manifest
+
+        Args:
+            lines (iterable): lines of a manifest (the first field of
+                each line is a package name)
+        Returns:
+            list: sorted, unique package names
+        """
+        return sorted(set(setops.iter_names(lines)))
+
+
+class DpkgBackend(PackageBackend):
+
+    """
+    Debian/Ubuntu: the dpkg status and apt extended_states files
+    """
+
+    name = 'dpkg'
+
+    def read_depgraph(self):
+        return DepGraph.from_rootfs(self.root)
+
+
+class PacmanBackend(PackageBackend):
+
+    """
+    Arch Linux: the ``desc`` files of the pacman local database
+    (``%NAME%``, ``%DEPENDS%``, ``%PROVIDES%`` and ``%REASON%``,
+    where a reason of ``1`` marks a dependency)
+
+    Only directory roots are supported.
+    """
+
+    name = 'pacman'
+    LOCAL_DB = 'var/lib/pacman/local'
+
+    @staticmethod
+    def parse_desc(lines):
+        """
+        Args:
+            lines (iterable): lines of a pacman ``desc`` file
+        Returns:
+            dict: ``%SECTION%`` name (without ``%``) -> list of values
+        """
+        sections = {}
+        values = None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                values = None
+            elif (values is None and len(line) > 2 and
+                    line.startswith('%') and line.endswith('%')):
+                values = sections.setdefault(line[1:-1], [])
+            elif values is not None:
+                values.append(line)
+        return sections
+
+    def iter_descs(self):
+        """
+        Yields:
+            dict: parsed ``desc`` file of each installed package
+        """
+        local = os.path.join(self.root, *self.LOCAL_DB.split('/'))
+        if not os.path.isdir(local):
+            raise IOError("No %s found in %r" % (self.LOCAL_DB, self.root))
+        for entry in sorted(os.listdir(local)):
+            desc = os.path.join(local, entry, 'desc')
+            if os.path.isfile(desc):
+                with open(desc) as f:
+                    yield self.parse_desc(f)
+
+    def read_depgraph(self):
+        graph = DepGraph()
+        for desc in self.iter_descs():
+            if not desc.get('NAME'):
+                continue
+            graph.add(
+                desc['NAME'][0],
+                filter(None, map(dependency_name, desc.get('DEPENDS', ()))),
+                auto=desc.get('REASON') == ['1'],
+                provides=filter(None, map(dependency_name,
+                                          desc.get('PROVIDES', ()))))
+        return graph
+
+
+class ApkBackend(PackageBackend):
+
+    """
+    Alpine Linux: the apk installed database (``P:`` name, ``D:``
+    dependencies, ``p:`` provides) and the ``world`` file of explicitly
+    installed packages
+    """
+
+    name = 'apk'
+    INSTALLED = 'lib/apk/db/installed'
+    WORLD = 'etc/apk/world'
+
+    @staticmethod
+    def iter_installed(lines):
+        """
+        Args:
+            lines (iterable): lines of ``lib/apk/db/installed``
+        Yields:
+            dict: field letter -> value, per package
+        """
+        para = {}
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if not line:
+                if para:
+                    yield para
+                    para = {}
+                continue
+            key, sep, value = line.partition(':')
+            if sep and len(key) == 1 and key not in para:
+                para[key] = value
+        if para:
+            yield para
+
+    def read_manifest(self, lines):
+        """
+        Read the package names of a ``world``-style list
+        (``name``, ``name>=1.0``, ``name@repo``)
+        """
+        names = set()
+        for line in lines:
+            for value in line.split():
+                name = dependency_name(value)
+                if name and not name.startswith('!'):
+                    names.add(name.split('@', 1)[0])
+        return sorted(names)
+
+    def read_depgraph(self):
+        files = rootfs.read_files(self.root, (self.INSTALLED, self.WORLD))
+        if files[self.INSTALLED] is None:
+            raise IOError("No %s found in %r" % (self.INSTALLED, self.root))
+        graph = DepGraph()
+        for para in self.iter_installed(files[self.INSTALLED].splitlines()):
+            if 'P' not in para:
+                continue
+            graph.add(
+                para['P'],
+                (dependency_name(dep) for dep in para.get('D', '').split()
+                 if not dep.startswith('!')),
+                provides=(dependency_name(provides)
+                          for provides in para.get('p', '').split()))
+        world = set(self.read_manifest(
+            (files[self.WORLD] or '').splitlines()))
+        graph.auto.update(name for name in graph.depends
+                          if name not in world)
+        return graph
+
+
+class RpmListBackend(PackageBackend):
+
+    """
+    RPM-based distributions: a ``rpm -qa`` listing of package names or
+    NEVRAs (``bash-4.2.46-34.el7.x86_64``), as a stand-in for the rpm
+    database (which is not plain text)
+
+    The listing has no dependency edges: every package is considered
+    manually installed.
+
+    Args:
+        root (str): path to the listing (e.g. the output of
+            ``rpm -qa --qf '%{NAME}\\n'``)
+    """
+
+    name = 'rpm-list'
+
+    @staticmethod
+    def package_name(value):
+        """
+        Args:
+            value (str): package name or NEVRA (``rpm -qa`` output:
+                name-version-release.arch, with one of
+                :data:`RPM_ARCHES`, or a ``gpg-pubkey``)
+        Returns:
+            str: package name
+        """
+        mobj = _rpm_nevra.match(value)
+        if mobj is None:
+            return value
+        return mobj.group(1) or mobj.group(2)
+
+    def read_manifest(self, lines):
+        return sorted(set(
+            self.package_name(name) for name in setops.iter_names(lines)))
+
+    def read_depgraph(self):
+        if os.path.isdir(self.root):
+            raise IOError("%r is a directory, not a rpm -qa listing"
+                          % self.root)
+        graph = DepGraph()
+        with open(self.root) as f:
+            for name in self.read_manifest(f):
+                graph.add(name)
+        return graph
+
+
+BACKENDS = collections.OrderedDict(
+    (backend.name, backend) for backend in (
+        DpkgBackend,
+        PacmanBackend,
+        ApkBackend,
+        RpmListBackend))
+
+
+def get_backend(name, root='/'):
+    """
+    Args:
+        name (str): backend name (one of :data:`BACKENDS`)
+        root (str): root filesystem, or path to a listing
+    Returns:
+        PackageBackend: backend instance
+    Raises:
+        ValueError: if ``name`` is not a known backend
+    """
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError("Unrecognized backend: %r (%s)"
+                         % (name, ', '.join(BACKENDS)))
+    return cls(root)
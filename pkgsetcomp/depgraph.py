@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import absolute_import, print_function
+"""
+Installed package dependency graph
+
+A :class:`DepGraph` maps each installed package to its dependencies
+(a list of alternative groups, ``a | b``) and records which packages
+were automatically installed.
+
+Reverse edges and per-package reference counts (the number of installed
+packages that depend on a package) are indexed once; removal impact
+queries are then answered with a copy-on-write overlay of decrements,
+so evaluating many candidate removals never rebuilds the index.
+"""
+
+import collections
+import os
+
+from pkgsetcomp import dpkg, rootfs
+
+try:
+    string_types = (str, unicode)  # noqa
+except NameError:
+    string_types = (str,)
+
+
+class ProvidesIndex(object):
+
+    """
+    An index of virtual package names (``Provides``) and the installed
+    packages which provide them
+
+    Args:
+        provides (dict): virtual package name -> iterable of providers
+    """
+
+    def __init__(self, provides=None):
+        self.providers = {}
+        for virtual, providers in (provides or {}).items():
+            for provider in providers:
+                self.add(virtual, provider)
+
+    def add(self, virtual, provider):
+        """
+        Args:
+            virtual (str): virtual package name
+            provider (str): name of an installed package providing it
+        """
+        providers = self.providers.setdefault(virtual, [])
+        if provider not in providers:
+            providers.append(provider)
+
+    def __contains__(self, virtual):
+        return virtual in self.providers
+
+    def __len__(self):
+        return len(self.providers)
+
+    def resolve(self, name, installed):
+        """
+        Resolve a dependency name to the installed packages satisfying it
+
+        Args:
+            name (str): real or virtual package name
+            installed (container): names of installed packages
+        Returns:
+            tuple: ``(name,)`` if ``name`` is installed, else the
+            installed providers of ``name`` (empty if unsatisfied)
+        """
+        if name in installed:
+            return (name,)
+        return tuple(self.providers.get(name, ()))
+
+
+class DepGraph(object):
+
+    """
+    An installed package dependency graph with reference counts
+
+    Args:
+        depends (dict): package name -> iterable of dependencies, where
+            each dependency is a name or a tuple of alternative names
+        auto (iterable): names of automatically installed packages
+    """
+
+    def __init__(self, depends=None, auto=()):
+        self.depends = collections.OrderedDict()
+        self.auto = set(auto)
+        self.provides = ProvidesIndex()
+        self._targets = None
+        self._refcounts = None
+        self._unsatisfied = None
+        for name, groups in (depends or {}).items():
+            self.add(name, groups)
+
+    def add(self, name, groups=(), auto=False, provides=()):
+        """
+        Add (or replace) an installed package and its dependencies
+
+        Args:
+            name (str): package name
+            groups (iterable): dependencies; names or tuples of
+                alternative names
+            auto (bool): whether the package was automatically installed
+            provides (iterable): virtual package names provided by ``name``
+        """
+        self.depends[name] = [
+            (group,) if isinstance(group, string_types) else tuple(group)
+            for group in groups]
+        if auto:
+            self.auto.add(name)
+        for virtual in provides:
+            self.provides.add(virtual, name)
+        self._targets = self._refcounts = self._unsatisfied = None
+
+    @classmethod
+    def from_apt_cache(cls, apt_cache):
+        """
+        Build a DepGraph from the installed packages in an ``apt.Cache``
+
+        Args:
+            apt_cache (apt.Cache): python-apt package cache
+        Returns:
+            DepGraph: installed package dependency graph
+        """
+        graph = cls()
+        for pkg in apt_cache:
+            if not pkg.is_installed:
+                continue
+            graph.add(
+                pkg.name,
+                ([dep.name for dep in group]
+                 for group in pkg.installed.dependencies),
+                auto=pkg.is_auto_installed,
+                provides=pkg.installed.provides)
+        return graph
+
+    @classmethod
+    def from_dpkg_status(cls,
+                         status=dpkg.DPKG_STATUS,
+                         extended_states=dpkg.APT_EXTENDED_STATES):
+        """
+        Build a DepGraph straight from the dpkg status file
+        (``Depends``, ``Pre-Depends`` and ``Provides``), without
+        python-apt
+
+        Args:
+            status (str): path to a dpkg status file
+            extended_states (str): path to an apt extended_states file
+                (``Auto-Installed`` flags); skipped if it does not exist
+        Returns:
+            DepGraph: installed package dependency graph
+        """
+        extended_states_lines = ()
+        if extended_states and os.path.exists(extended_states):
+            with dpkg.open_text(extended_states) as f:
+                extended_states_lines = f.readlines()
+        with dpkg.open_text(status) as f:
+            return cls.from_dpkg_lines(f, extended_states_lines)
+
+    @classmethod
+    def from_dpkg_lines(cls, status, extended_states=()):
+        """
+        Build a DepGraph from the lines of a dpkg status file and an
+        apt extended_states file
+
+        Args:
+            status (iterable): lines of a dpkg status file
+            extended_states (iterable): lines of an apt extended_states file
+        Returns:
+            DepGraph: installed package dependency graph
+        """
+        depends, provides = dpkg.read_status_depends(status)
+        graph = cls(depends, auto=dpkg.read_auto_installed(extended_states))
+        graph.provides = ProvidesIndex(provides)
+        return graph
+
+    @classmethod
+    def from_rootfs(cls, root):
+        """
+        Build a DepGraph from the dpkg database of a root filesystem
+        directory, rootfs/layer tarball or image tarball
+
+        Args:
+            root (str): see :func:`pkgsetcomp.rootfs.read_files`
+        Returns:
+            DepGraph: installed package dependency graph
+        """
+        return cls.from_dpkg_lines(*rootfs.read_dpkg_database(root))
+
+    def __len__(self):
+        return len(self.depends)
+
+    def __contains__(self, name):
+        return name in self.depends
+
+    def manual_packages(self):
+        """
+        Returns:
+            list: sorted names of installed packages which were not
+            automatically installed (``aptitude search '~i !~M'``)
+        """
+        return sorted(name for name in self.depends if name not in self.auto)
+
+    def _index(self):
+        """
+        Index the installed targets of every package and count, for each
+        package, the installed packages that depend on it
+
+        Dependencies on virtual packages are resolved through the
+        :class:`ProvidesIndex`. Every installed member of an alternative
+        group holds a reference, so a package is only orphaned once no
+        installed package could be satisfied by it.
+        """
+        if self._refcounts is not None:
+            return
+        resolve = self.provides.resolve
+        targets = {}
+        unsatisfied = collections.OrderedDict()
+        refcounts = dict.fromkeys(self.depends, 0)
+        for name, groups in self.depends.items():
+            _targets = []
+            for group in groups:
+                satisfied = False
+                for dep in group:
+                    for target in resolve(dep, refcounts):
+                        satisfied = True
+                        if target != name and target not in _targets:
+                            _targets.append(target)
+                if not satisfied:
+                    unsatisfied.setdefault(name, []).append(group)
+            for dep in _targets:
+                refcounts[dep] += 1
+            targets[name] = _targets
+        self._targets = targets
+        self._refcounts = refcounts
+        self._unsatisfied = unsatisfied
+
+    @property
+    def refcounts(self):
+        """dict of package name -> number of installed reverse dependencies
+        """
+        self._index()
+        return self._refcounts
+
+    @property
+    def unsatisfied(self):
+        """OrderedDict of package name -> list of dependency groups
+        with no installed (or providing) package
+        """
+        self._index()
+        return self._unsatisfied
+
+    def targets(self, name):
+        """
+        Args:
+            name (str): installed package name
+        Returns:
+            list: installed packages that ``name`` depends on
+        """
+        self._index()
+        return self._targets.get(name, [])
+
+    def dependencies_of(self, names):
+        """
+        Find every installed package reachable through at least one
+        dependency edge from ``names``
+
+        Args:
+            names (iterable): names of packages to start from
+        Returns:
+            set: names of (transitive) dependencies of ``names``
+        """
+        self._index()
+        targets = self._targets
+        reached = set()
+        stack = [name for name in names if name in targets]
+        while stack:
+            for dep in targets[stack.pop()]:
+                if dep not in reached:
+                    reached.add(dep)
+                    stack.append(dep)
+        return reached
+
+    def layers(self, names):
+        """
+        Split ``names`` into dependency layers, so that every package
+        comes after the packages of ``names`` it (transitively) depends
+        on, including through packages which are not in ``names``
+
+        Edges closing a dependency cycle are ignored.
+
+        Args:
+            names (iterable): names of packages to order
+        Returns:
+            list: lists of package names, in install order (names keep
+            their input order within a layer)
+        """
+        self._index()
+        targets = self._targets
+        names = list(names)
+        selected = set(names)
+        # floor[n]: the first layer in which a package depending on n
+        # may be installed
+        floor = {}
+        for root in names:
+            if root in floor or root not in targets:
+                continue
+            stack = [(root, iter(targets[root]))]
+            visiting = set((root,))
+            while stack:
+                node, deps = stack[-1]
+                for dep in deps:
+                    if dep not in floor and dep not in visiting:
+                        visiting.add(dep)
+                        stack.append((dep, iter(targets[dep])))
+                        break
+                else:
+                    stack.pop()
+                    visiting.discard(node)
+                    level = max([floor.get(dep, 0)
+                                 for dep in targets[node]] or [0])
+                    floor[node] = level + 1 if node in selected else level
+        layers = []
+        for name in names:
+            layer = floor.get(name, 1) - 1
+            while len(layers) <= layer:
+                layers.append([])
+            layers[layer].append(name)
+        return layers
+
+    def autoremovable(self, remove):
+        """
+        Compute the automatically installed packages that
+        ``apt-get autoremove`` would drop after removing ``remove``
+
+        Removing a package releases one reference on each of its
+        dependencies; an automatically installed package whose count
+        drops to zero is orphaned and released in turn. Decrements are
+        kept in a per-query overlay, so the graph is not modified.
+
+        .. note:: Like any reference counting scheme, cycles of
+           automatically installed packages which only depend on each
+           other are not reported.
+
+        Args:
+            remove (iterable): names of packages to remove
+        Returns:
+            list: orphaned package names, in the order they are released
+        """
+        self._index()
+        refcounts, targets, auto = self._refcounts, self._targets, self.auto
+        removed = set(name for name in remove if name in refcounts)
+        released = collections.defaultdict(int)
+        stack = list(removed)
+        orphans = []
+        while stack:
+            for dep in targets[stack.pop()]:
+                if dep in removed:
+                    continue
+                released[dep] += 1
+                if dep in auto and released[dep] == refcounts[dep]:
+                    removed.add(dep)
+                    orphans.append(dep)
+                    stack.append(dep)
+        return orphans
+
+    def removal_impact(self, candidates):
+        """
+        Evaluate the autoremove cascade of each candidate removal
+
+        Args:
+            candidates (iterable): package names or iterables of names
+        Returns:
+            OrderedDict: candidate -> list of orphaned package names
+        """
+        impact = collections.OrderedDict()
+        for candidate in candidates:
+            if isinstance(candidate, string_types):
+                impact[candidate] = self.autoremovable((candidate,))
+            else:
+                candidate = tuple(candidate)
+                impact[candidate] = self.autoremovable(candidate)
+        return impact
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Read the dpkg and APT databases without python-apt
+
+* ``/var/lib/dpkg/status``: installed packages, ``Depends``,
+  ``Pre-Depends`` and ``Provides``
+* ``/var/lib/apt/extended_states``: ``Auto-Installed`` flags
+
+Both files are deb822 paragraphs; only the requested fields are kept,
+and continuation lines (``Description``, ``Conffiles``) are skipped.
+"""
+
+import collections
+import re
+
+DPKG_STATUS = '/var/lib/dpkg/status'
+APT_EXTENDED_STATES = '/var/lib/apt/extended_states'
+
+DEPENDS_FIELDS = ('Pre-Depends', 'Depends')
+STATUS_FIELDS = ('Package', 'Status', 'Provides') + DEPENDS_FIELDS
+
+_relation_name = re.compile(r'^\s*([^\s(:\[<]+)')
+
+
+def open_text(path):
+    """
+    Open a deb822 file as text
+
+    Args:
+        path (str): path to a dpkg/apt database file
+    Returns:
+        file: file object yielding lines
+    """
+    if str is bytes:
+        return open(path)
+    return open(path, encoding='utf-8', errors='replace')
+
+
+def iter_paragraphs(lines, fields=None):
+    """
+    Parse deb822 paragraphs (``Field: value`` lines separated by a
+    blank line)
+
+    Args:
+        lines (iterable): lines of a deb822 file
+        fields (iterable): if given, only keep these fields
+    Yields:
+        dict: field name -> value
+    """
+    if fields is not None:
+        fields = frozenset(fields)
+    para = {}
+    field = None
+    for line in lines:
+        if line[:1] in (' ', '\t'):
+            if field is not None:
+                para[field] = '\n'.join((para[field], line.strip()))
+            continue
+        line = line.rstrip('\r\n')
+        if not line:
+            if para:
+                yield para
+                para = {}
+            field = None
+            continue
+        key, _, value = line.partition(':')
+        if fields is None or key in fields:
+            field = key
+            para[key] = value.strip()
+        else:
+            field = None
+    if para:
+        yield para
+
+
+def parse_relations(value):
+    """
+    Parse a relationship field (``Depends``, ``Provides``) into
+    alternative groups of package names, dropping version constraints
+    and architecture qualifiers
+
+    .. code:: python
+
+        >>> parse_relations('libc6 (>= 2.4), exim4 | mail-transport-agent')
+        [('libc6',), ('exim4', 'mail-transport-agent')]
+
+    Args:
+        value (str): relationship field value
+    Returns:
+        list: list of tuples of alternative package names
+    """
+    groups = []
+    if not value:
+        return groups
+    for relation in value.split(','):
+        group = []
+        for alternative in relation.split('|'):
+            match = _relation_name.match(alternative)
+            if match is not None:
+                group.append(match.group(1))
+        if group:
+            groups.append(tuple(group))
+    return groups
+
+
+def is_installed(para):
+    """
+    Args:
+        para (dict): dpkg status paragraph
+    Returns:
+        bool: whether the ``Status`` field is ``install ok installed``
+    """
+    return para.get('Status', '').endswith(' installed')
+
+
+def iter_installed(lines, fields=STATUS_FIELDS):
+    """
+    Args:
+        lines (iterable): lines of a dpkg status file
+        fields (iterable): fields to keep (``Status`` is always kept)
+    Yields:
+        dict: paragraphs of installed packages
+    """
+    fields = set(fields) | set(('Package', 'Status'))
+    for para in iter_paragraphs(lines, fields):
+        if 'Package' in para and is_installed(para):
+            yield para
+
+
+def source_name(para):
+    """
+    Args:
+        para (dict): dpkg status or ``Packages`` paragraph
+    Returns:
+        str: name of the source package (``Source``, without its
+        ``(version)``), which defaults to the binary package name
+    """
+    source = para.get('Source', '').split(None, 1)
+    return source[0] if source else para.get('Package')
+
+
+def read_installed_packages(lines):
+    """
+    Args:
+        lines (iterable): lines of a dpkg status file
+    Returns:
+        list: sorted, unique names of installed packages
+    """
+    return sorted(set(
+        para['Package'] for para in iter_installed(lines, ('Package',))))
+
+
+def read_auto_installed(lines):
+    """
+    Args:
+        lines (iterable): lines of an apt ``extended_states`` file
+    Returns:
+        set: names of automatically installed packages
+    """
+    return set(
+        para['Package'] for para in
+        iter_paragraphs(lines, ('Package', 'Auto-Installed'))
+        if para.get('Auto-Installed') == '1' and 'Package' in para)
+
+
+def read_status_depends(lines):
+    """
+    Read the dependencies of every installed package
+
+    Args:
+        lines (iterable): lines of a dpkg status file
+    Returns:
+        tuple: (depends, provides) where ``depends`` is an OrderedDict of
+        package name -> list of alternative groups and ``provides`` is
+        a dict of virtual package name -> list of providing packages
+    """
+    depends = collections.OrderedDict()
+    provides = {}
+    for para in iter_installed(lines):
+        name = para['Package']
+        groups = depends.setdefault(name, [])
+        for field in DEPENDS_FIELDS:
+            groups.extend(parse_relations(para.get(field)))
+        for group in parse_relations(para.get('Provides')):
+            providers = provides.setdefault(group[0], [])
+            if name not in providers:
+                providers.append(name)
+    return depends, provides
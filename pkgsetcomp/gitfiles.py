@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Read git metadata from the files of a repository (without git)
+
+* ``HEAD``: the current branch (``ref: refs/heads/master``) or revision
+* ``refs/...`` and ``packed-refs``: revisions of branches and tags
+* ``config``: ``remote.origin.url`` and other configuration values
+
+A ``.git`` file (``gitdir: ../.git/modules/sub``) of a submodule or a
+linked worktree is followed, and the refs and config of a worktree are
+read from its ``commondir``.
+
+:class:`GitDir` returns None for what it cannot read (an unborn branch,
+a config with ``include`` directives, a ``reftable`` ref store), so that
+callers can fall back to running git. Revisions are abbreviated to a
+fixed length (:meth:`GitDir.head_id`), which may be shorter than the
+unique abbreviation of ``git rev-parse --short``.
+
+.. code:: python
+
+    >>> gitdir = GitDir.find('.')
+    >>> gitdir.branch(), gitdir.head_id(), gitdir.get('remote.origin.url')
+    ('master', 'b9bb772', 'https://github.com/westurner/pkgsetcomp')
+
+"""
+
+import collections
+import os
+import re
+
+DEFAULT_ABBREV = 7
+MAX_SYMREF_DEPTH = 5
+# HEAD of a reftable repository, for older versions of git
+INVALID_HEAD = 'refs/heads/.invalid'
+
+_section = re.compile(r'^\[\s*([-.\w]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+_key = re.compile(r'^([A-Za-z][-A-Za-z0-9]*)\s*(=?)')
+_escapes = {'n': '\n', 't': '\t', 'b': '\b', '"': '"', '\\': '\\'}
+
+
+def _read(path):
+    """
+    Returns:
+        str: contents of the file at ``path``, or None if it cannot be read
+    """
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def parse_config_value(value):
+    """
+    Parse the value of a git config line (after the ``=``)
+
+    Args:
+        value (str): raw value
+    Returns:
+        tuple: (value, continued), where ``continued`` is True if the
+        line ends with a backslash (the value continues on the next line)
+    """
+    output = []
+    quoted = False
+    spaces = ''
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char == '\\':
+            if i + 1 == len(value):
+                return ''.join(output) + spaces, True
+            output.append(spaces + _escapes.get(value[i + 1], value[i + 1]))
+            spaces = ''
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif char in '#;' and not quoted:
+            break
+        elif char.isspace() and not quoted:
+            if output:
+                spaces += char
+        else:
+            output.append(spaces + char)
+            spaces = ''
+        i += 1
+    return ''.join(output), False
+
+
+def parse_config(lines):
+    """
+    Parse a git config file
+
+    Section and key names are lowercased; subsection names are not
+    (``[remote "origin"]`` + ``url`` -> ``remote.origin.url``).
+
+    Args:
+        lines (iterable): lines of a git config file
+    Returns:
+        OrderedDict: key -> list of values, in file order (a key without
+        ``=`` has the value True)
+    """
+    config = collections.OrderedDict()
+    section = None
+    key, raw = None, None
+    for line in lines:
+        if key is not None:
+            # the value continues on this line: parse the joined lines
+            raw = raw[:-1] + line.rstrip('\r\n')
+            value, continued = parse_config_value(raw)
+            if not continued:
+                config.setdefault(key, []).append(value)
+                key = None
+            continue
+        line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+        mobj = _section.match(line)
+        if mobj is not None:
+            name, subsection = mobj.groups()
+            section = name.lower()
+            if subsection is not None:
+                section = '%s.%s' % (
+                    section, re.sub(r'\\(.)', r'\1', subsection))
+            line = line[mobj.end():].strip()
+            if not line or line[0] in '#;':
+                continue
+        mobj = _key.match(line)
+        if mobj is None or section is None:
+            continue
+        name = '%s.%s' % (section, mobj.group(1).lower())
+        if not mobj.group(2):
+            config.setdefault(name, []).append(True)
+            continue
+        raw = line[mobj.end():]
+        value, continued = parse_config_value(raw)
+        if continued:
+            key = name
+        else:
+            config.setdefault(name, []).append(value)
+    if key is not None:
+        config.setdefault(key, []).append(parse_config_value(raw[:-1])[0])
+    return config
+
+
+def normalize_key(key):
+    """
+    Args:
+        key (str): config key (e.g. ``Remote.origin.URL``)
+    Returns:
+        str: key with lowercased section and name (``remote.origin.url``)
+    """
+    section, _, name = key.partition('.')
+    subsection, _, name = name.rpartition('.')
+    if subsection:
+        return '%s.%s.%s' % (section.lower(), subsection, name.lower())
+    return '%s.%s' % (section.lower(), name.lower())
+
+
+class GitDir(object):
+
+    """
+    A git directory (``.git``), read without running git
+
+    Args:
+        git_dir (str): path to the git directory
+    """
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        commondir = _read(os.path.join(git_dir, 'commondir'))
+        if commondir is not None:
+            self.common_dir = os.path.normpath(
+                os.path.join(git_dir, commondir.strip()))
+        else:
+            self.common_dir = git_dir
+        self._packed_refs = None
+        self._config = False
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.git_dir)
+
+    @classmethod
+    def find(cls, worktree):
+        """
+        Args:
+            worktree (str): path to a working tree (or a bare repository)
+        Returns:
+            GitDir: git directory of ``worktree`` (``.git``, or the
+            ``gitdir:`` of a ``.git`` file), or None if there is none
+        """
+        dotgit = os.path.join(worktree, '.git')
+        if os.path.isdir(dotgit):
+            return cls(dotgit)
+        if os.path.isfile(dotgit):
+            contents = _read(dotgit) or ''
+            if contents.startswith('gitdir:'):
+                git_dir = os.path.join(
+                    worktree, contents[len('gitdir:'):].strip())
+                if os.path.isdir(git_dir):
+                    return cls(os.path.normpath(git_dir))
+            return None
+        if (os.path.isfile(os.path.join(worktree, 'HEAD')) and
+                os.path.isdir(os.path.join(worktree, 'refs'))):
+            return cls(worktree)
+        return None
+
+    def read_config(self):
+        """
+        Returns:
+            OrderedDict: parsed ``config`` (see :func:`parse_config`), or
+            None if it cannot be read
+        """
+        if self._config is False:
+            contents = _read(os.path.join(self.common_dir, 'config'))
+            self._config = (parse_config(contents.splitlines())
+                            if contents is not None else None)
+        return self._config
+
+    @property
+    def config(self):
+        """
+        Returns:
+            OrderedDict: parsed ``config``, or None if it cannot be read
+            or includes other files (which git would also read)
+        """
+        config = self.read_config()
+        if config is None or any(
+                key.startswith(('include.', 'includeif.')) for key in config):
+            return None
+        return config
+
+    def get(self, key, default=None):
+        """
+        Args:
+            key (str): config key (e.g. ``remote.origin.url``)
+            default: value if ``key`` is not set
+        Returns:
+            str: last value of ``key``
+        """
+        values = (self.config or {}).get(normalize_key(key))
+        if not values:
+            return default
+        return values[-1]
+
+    def _ref_store(self):
+        # refs are not files with the reftable backend
+        config = self.read_config()
+        return config is not None and 'extensions.refstorage' not in config
+
+    @property
+    def packed_refs(self):
+        """
+        Returns:
+            dict: ref name -> revision, from ``packed-refs``
+        """
+        if self._packed_refs is None:
+            packed_refs = {}
+            contents = _read(os.path.join(self.common_dir, 'packed-refs'))
+            for line in (contents or '').splitlines():
+                if not line or line[0] in '#^':
+                    continue
+                oid, _, ref = line.partition(' ')
+                packed_refs[ref.strip()] = oid
+            self._packed_refs = packed_refs
+        return self._packed_refs
+
+    def read_ref(self, ref):
+        """
+        Args:
+            ref (str): ref name (``HEAD``, ``refs/heads/master``, ...)
+        Returns:
+            str: contents of the ref (a revision, or ``ref: <name>``),
+            or None if the ref does not exist
+        """
+        for git_dir in (self.git_dir, self.common_dir):
+            contents = _read(os.path.join(git_dir, *ref.split('/')))
+            if contents is not None and contents.strip():
+                return contents.strip()
+        return self.packed_refs.get(ref)
+
+    def head(self):
+        """
+        Returns:
+            str: ref name that ``HEAD`` points to (e.g.
+            ``refs/heads/master``), or None if ``HEAD`` is detached
+        """
+        contents = self.read_ref('HEAD') or ''
+        if contents.startswith('ref:'):
+            return contents[len('ref:'):].strip()
+        return None
+
+    def resolve(self, ref='HEAD'):
+        """
+        Args:
+            ref (str): ref name
+        Returns:
+            str: full revision of ``ref``, or None if it cannot be read
+            (e.g. an unborn branch)
+        """
+        if not self._ref_store():
+            return None
+        for _ in range(MAX_SYMREF_DEPTH):
+            contents = self.read_ref(ref)
+            if contents is None:
+                return None
+            if not contents.startswith('ref:'):
+                return contents
+            ref = contents[len('ref:'):].strip()
+        return None
+
+    def branch(self):
+        """
+        Returns:
+            str: current branch name (as ``git status --branch``),
+            ``(detached)``, or None if the ref store cannot be read
+        """
+        ref = self.head()
+        if ref == INVALID_HEAD or not self._ref_store():
+            # a reftable HEAD file only points git at the reftable
+            return None
+        if ref is None:
+            return '(detached)'
+        if ref.startswith('refs/heads/'):
+            return ref[len('refs/heads/'):]
+        return ref
+
+    def head_id(self, abbrev=None):
+        """
+        Args:
+            abbrev (int): length of the abbreviated revision (default:
+                ``core.abbrev``, or :data:`DEFAULT_ABBREV`)
+        Returns:
+            str: abbreviated revision of ``HEAD``, or None if it cannot
+            be read
+
+        .. note:: ``git rev-parse --short`` lengthens abbreviations
+           until they are unique (and, with ``core.abbrev=auto``, in
+           large repositories); this does not, so in a large repository
+           the result can be shorter than git's (pass ``abbrev=40`` for
+           the full revision).
+        """
+        oid = self.resolve('HEAD')
+        if oid is None:
+            return None
+        if abbrev is None:
+            abbrev = self.get('core.abbrev', '')
+            abbrev = int(abbrev) if str(abbrev).isdigit() else DEFAULT_ABBREV
+        return oid[:abbrev]
+
+    def iter_urls(self):
+        """
+        Yields:
+            str: ``key=value`` config lines whose key or value contains
+            ``url`` (as ``git config -l | grep url``, for this repository)
+        """
+        for key, values in (self.config or {}).items():
+            for value in values:
+                line = '%s=%s' % (key, 'true' if value is True else value)
+                if 'url' in line:
+                    yield line
@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Read Mercurial metadata from the files of a repository (without hg)
+
+* ``.hg/hgrc``: ``[paths]`` (``hg showconfig paths.default``)
+* ``.hg/branch``: the working directory branch (``default`` if missing)
+* ``.hg/dirstate``: the working directory parents (``hg id -i``), from
+  the header of a dirstate-v1 file or a dirstate-v2 docket
+* ``/etc/mercurial/hgrc``, ``~/.hgrc`` (or ``$HGRCPATH``): ``[schemes]``
+  (:class:`UrlSchemes`, ``hg showconfig schemes``)
+
+Starting ``hg`` (a Python interpreter) for each of these takes ~100ms.
+:class:`HgDir` returns None for what it cannot read (an ``%include`` in
+``hgrc``, an uncommitted merge), so that callers can fall back to hg.
+
+.. code:: python
+
+    >>> hgdir = HgDir.find('.')
+    >>> hgdir.get('paths', 'default'), hgdir.branch(), hgdir.head_id()
+    ('https://bitbucket.org/westurner/dotfiles', 'default', '1f4e63d8e4a2')
+
+"""
+
+import binascii
+import collections
+import glob
+import os
+import re
+
+NULL_ID = b'\0' * 20
+SHORT_ID = 12
+DIRSTATE_V2_MARKER = b'dirstate-v2\n'
+
+_section = re.compile(r'^\[([^\[]+)\]')
+_item = re.compile(r'^([^=\s][^=]*?)\s*=\s*((.*\S)?)')
+_continuation = re.compile(r'^\s+(\S|\S.*\S)\s*$')
+_empty = re.compile(r'^(;|#|\s*$)')
+_placeholder = re.compile(r'\{(\d+)\}')
+
+
+def parse_hgrc(lines):
+    """
+    Parse a Mercurial config file, as ``mercurial.config``
+
+    Args:
+        lines (iterable): lines of an ``hgrc`` file
+    Returns:
+        OrderedDict: section -> OrderedDict of key -> value, or None if
+        the file has ``%include`` directives (which hg would follow)
+    """
+    config = collections.OrderedDict()
+    section, key = '', None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if key is not None:
+            mobj = _continuation.match(line)
+            if mobj is not None:
+                config[section][key] += '\n' + mobj.group(1)
+                continue
+            key = None
+        if _empty.match(line):
+            continue
+        if line.startswith('%include'):
+            return None
+        if line.startswith('%unset'):
+            config.get(section, {}).pop(line[len('%unset'):].strip(), None)
+            continue
+        mobj = _section.match(line)
+        if mobj is not None:
+            section = mobj.group(1).strip()
+            config.setdefault(section, collections.OrderedDict())
+            continue
+        mobj = _item.match(line)
+        if mobj is not None:
+            key = mobj.group(1)
+            items = config.setdefault(section, collections.OrderedDict())
+            items.pop(key, None)
+            items[key] = mobj.group(2) or ''
+    return config
+
+
+def config_paths(environ=None):
+    """
+    Args:
+        environ (dict): environment (default: ``os.environ``)
+    Returns:
+        list: system and user config files and directories, in the order
+        hg reads them: the entries of ``$HGRCPATH`` if it is set, or
+        ``/etc/mercurial/hgrc``, ``/etc/mercurial/hgrc.d``, ``~/.hgrc``
+        and ``$XDG_CONFIG_HOME/hg/hgrc`` (a directory stands for its
+        ``*.rc`` files)
+    """
+    if environ is None:
+        environ = os.environ
+    if 'HGRCPATH' in environ:
+        paths = [path for path in environ['HGRCPATH'].split(os.pathsep)
+                 if path]
+    else:
+        paths = [
+            '/etc/mercurial/hgrc',
+            '/etc/mercurial/hgrc.d',
+            '~/.hgrc',
+            os.path.join(environ.get('XDG_CONFIG_HOME', '~/.config'),
+                         'hg', 'hgrc')]
+    return [os.path.expanduser(path) for path in paths]
+
+
+def config_stamp(paths):
+    """
+    Args:
+        paths (list): config files and directories (see
+            :func:`config_paths`)
+    Returns:
+        tuple: (mtime, size) of each path (None if it does not exist),
+        which changes when a file is changed, added or removed
+    """
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamp.append(None)
+            continue
+        stamp.append((st.st_mtime, st.st_size))
+    return tuple(stamp)
+
+
+def read_config_files(paths):
+    """
+    Read and merge config files (later files override earlier ones)
+
+    Args:
+        paths (list): config files and directories (see
+            :func:`config_paths`)
+    Returns:
+        OrderedDict: section -> OrderedDict of key -> value, or None if a
+        file has ``%include`` directives (see :func:`parse_hgrc`)
+    """
+    config = collections.OrderedDict()
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = sorted(glob.glob(os.path.join(path, '*.rc')))
+        else:
+            filenames = [path]
+        for filename in filenames:
+            try:
+                with open(filename) as f:
+                    items = parse_hgrc(f)
+            except (IOError, OSError):
+                continue
+            if items is None:
+                return None
+            for section, values in items.items():
+                config.setdefault(
+                    section, collections.OrderedDict()).update(values)
+    return config
+
+
+class UrlSchemes(object):
+
+    """
+    URL schemes of the Mercurial ``schemes`` extension
+
+    ``[schemes]`` maps a scheme to a URL template, in which ``{1}``,
+    ``{2}``, ... are replaced by the first path segments of a URL with
+    that scheme (``py = https://hg.python.org/`` makes ``py://cpython``
+    ``https://hg.python.org/cpython``).
+
+    :meth:`to_hg_scheme_url` matches a URL against the templates of all
+    of the schemes at once, with one regular expression.
+
+    Args:
+        schemes (iterable): (scheme, template) tuples
+    """
+
+    # schemes per regular expression (Python 2 allows 100 groups)
+    BATCH_SIZE = 30
+
+    def __init__(self, schemes):
+        self.schemes = collections.OrderedDict(schemes)
+        self.nparts = dict(
+            (key, max([int(n) for n in _placeholder.findall(template)] or
+                      [0]))
+            for key, template in self.schemes.items())
+        # the longest (most specific) templates first
+        entries = sorted(self.schemes.items(),
+                         key=lambda item: (-len(item[1]), item[0]))
+        self._regexes = [
+            self._compile(entries[i:i + self.BATCH_SIZE])
+            for i in range(0, len(entries), self.BATCH_SIZE)]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self.schemes.items()))
+
+    def _compile(self, entries):
+        alternatives = []
+        groups = {}
+        ngroups = 0
+        for key, template in entries:
+            pieces = _placeholder.split(template)
+            numbers = [int(n) for n in pieces[1::2]]
+            if set(numbers) != set(range(1, self.nparts[key] + 1)):
+                # a path segment is not in the URL: it cannot be recovered
+                continue
+            ngroups += 1
+            outer = ngroups
+            part_groups = {}
+            pattern = [re.escape(pieces[0])]
+            for n, literal in zip(numbers, pieces[2::2]):
+                if n in part_groups:
+                    pattern.append('(?:\\%d)' % part_groups[n])
+                else:
+                    ngroups += 1
+                    part_groups[n] = ngroups
+                    pattern.append('([^/]*)')
+                pattern.append(re.escape(literal))
+            ngroups += 1
+            pattern.append('(.*)')
+            alternatives.append('(%s)' % ''.join(pattern))
+            groups[outer] = (
+                key, [part_groups[n] for n in sorted(part_groups)], ngroups)
+        if not alternatives:
+            return None, groups
+        return re.compile('|'.join(alternatives)), groups
+
+    def to_normal_url(self, url):
+        """
+        Args:
+            url (str): URL (e.g. ``py://cpython``)
+        Returns:
+            str: ``url`` with its scheme expanded (as hg does), or ``url``
+            if its scheme is not one of :attr:`schemes`
+        """
+        if not url:
+            return url
+        scheme, sep, path = url.partition('://')
+        template = self.schemes.get(scheme) if sep else None
+        if template is None:
+            return url
+        nparts = self.nparts[scheme]
+        parts = path.split('/', nparts)
+        tail = parts.pop() if len(parts) > nparts else ''
+        return _placeholder.sub(
+            lambda mobj: (parts[int(mobj.group(1)) - 1]
+                          if int(mobj.group(1)) <= len(parts) else ''),
+            template) + tail
+
+    def to_hg_scheme_url(self, url):
+        """
+        Args:
+            url (str): URL (e.g. ``https://hg.python.org/cpython``)
+        Returns:
+            str: ``url`` with the scheme of the longest matching template
+            (``py://cpython``), or None if no template matches
+        """
+        if not url:
+            return None
+        for regex, groups in self._regexes:
+            mobj = regex.match(url) if regex is not None else None
+            if mobj is None:
+                continue
+            key, part_groups, tail_group = groups[mobj.lastindex]
+            path = [mobj.group(group) for group in part_groups]
+            tail = mobj.group(tail_group)
+            if tail or not path:
+                path.append(tail)
+            return '%s://%s' % (key, '/'.join(path))
+        return None
+
+
+def read_dirstate_parents(data):
+    """
+    Args:
+        data (bytes): start of a ``.hg/dirstate`` file (at least 76 bytes
+            of a dirstate-v2 docket, or 40 bytes of a dirstate-v1 file)
+    Returns:
+        tuple: (p1, p2) binary node ids, or None if ``data`` is too short
+    """
+    if data.startswith(DIRSTATE_V2_MARKER):
+        # marker, then each parent padded to 32 bytes
+        start = len(DIRSTATE_V2_MARKER)
+        if len(data) < start + 64:
+            return None
+        return data[start:start + 20], data[start + 32:start + 52]
+    if len(data) < 40:
+        return None
+    return data[:20], data[20:40]
+
+
+class HgDir(object):
+
+    """
+    A Mercurial repository directory (``.hg``), read without running hg
+
+    Args:
+        hg_dir (str): path to the ``.hg`` directory
+    """
+
+    def __init__(self, hg_dir):
+        self.hg_dir = hg_dir
+        self._config = False
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.hg_dir)
+
+    @classmethod
+    def find(cls, worktree):
+        """
+        Args:
+            worktree (str): path to a working directory
+        Returns:
+            HgDir: ``.hg`` directory of ``worktree``, or None
+        """
+        hg_dir = os.path.join(worktree, '.hg')
+        if os.path.isdir(hg_dir):
+            return cls(hg_dir)
+        return None
+
+    def _read(self, name, mode='r', size=-1):
+        try:
+            with open(os.path.join(self.hg_dir, name), mode) as f:
+                return f.read(size)
+        except (IOError, OSError):
+            return None
+
+    @property
+    def config(self):
+        """
+        Returns:
+            OrderedDict: parsed ``hgrc`` (empty if there is none; see
+            :func:`parse_hgrc`), or None if it includes other files
+        """
+        if self._config is False:
+            contents = self._read('hgrc')
+            self._config = parse_hgrc((contents or '').splitlines())
+        return self._config
+
+    def get(self, section, key, default=None):
+        """
+        Args:
+            section (str): config section (e.g. ``paths``)
+            key (str): config key (e.g. ``default``)
+            default: value if the key is not set
+        Returns:
+            str: value of ``section.key`` in ``hgrc``
+        """
+        return (self.config or {}).get(section, {}).get(key, default)
+
+    def iter_config(self, section):
+        """
+        Yields:
+            str: ``section.key=value`` lines (as ``hg showconfig section``,
+            for this repository's ``hgrc``)
+        """
+        for key, value in (self.config or {}).get(section, {}).items():
+            yield '%s.%s=%s' % (section, key, value)
+
+    def branch(self):
+        """
+        Returns:
+            str: working directory branch (``hg branch``)
+        """
+        contents = self._read('branch')
+        return (contents or '').strip() or 'default'
+
+    def parents(self):
+        """
+        Returns:
+            tuple: (p1, p2) binary node ids of the working directory
+            (``NULL_ID`` for none), or None if the dirstate cannot be read
+        """
+        # only the header (a dirstate-v1 file can be megabytes)
+        data = self._read('dirstate', 'rb', len(DIRSTATE_V2_MARKER) + 64)
+        if data is None:
+            # a new repository, without a dirstate
+            if self._read('requires') is not None:
+                return NULL_ID, NULL_ID
+            return None
+        return read_dirstate_parents(data)
+
+    def head_id(self):
+        """
+        Returns:
+            str: short id of the working directory parent (``hg id -i``,
+            without the ``+`` of uncommitted changes), or None if the
+            dirstate cannot be read or a merge is in progress
+        """
+        parents = self.parents()
+        if parents is None or parents[1] != NULL_ID:
+            return None
+        return binascii.hexlify(parents[0])[:SHORT_ID].decode('ascii')
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Compiled include/exclude package name matchers
+
+Patterns are shell globs (``linux-image-*``) or, with an ``re:``
+prefix, regular expressions (``re:^language-pack-(?!en)``), matched
+from the start of the name.
+
+The patterns of each list are compiled once into:
+
+* a set of exact names (patterns without glob characters)
+* a trie of literal prefixes (patterns of the form ``prefix*``), so
+  that the common case is one walk over the characters of a name
+* one combined regular expression for every other pattern
+
+.. code:: python
+
+    >>> match = compile_matcher(exclude=['linux-image-*', 're:.*-dbg$'])
+    >>> [name for name in ['bash', 'linux-image-generic', 'libc6-dbg']
+    ...  if match(name)]
+    ['bash']
+
+"""
+
+import fnmatch
+import re
+
+GLOB_CHARS = '*?['
+REGEX_PREFIX = 're:'
+
+
+class PrefixTrie(object):
+
+    """
+    A character trie of literal prefixes
+
+    Args:
+        prefixes (iterable): literal prefixes
+    """
+
+    def __init__(self, prefixes=()):
+        self.root = {}
+        self.count = 0
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix):
+        """
+        Args:
+            prefix (str): literal prefix
+        """
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        if None not in node:
+            node[None] = True
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def match(self, name):
+        """
+        Args:
+            name (str): package name
+        Returns:
+            bool: whether ``name`` starts with any of the prefixes
+        """
+        node = self.root
+        if None in node:
+            return True
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+class PatternSet(object):
+
+    """
+    A compiled list of glob (and ``re:``) patterns
+
+    Args:
+        patterns (iterable): globs, or regexes prefixed with ``re:``
+    """
+
+    def __init__(self, patterns=()):
+        self.patterns = list(patterns)
+        self.names = set()
+        self.prefixes = PrefixTrie()
+        regexes = []
+        for pattern in self.patterns:
+            if pattern.startswith(REGEX_PREFIX):
+                regexes.append(pattern[len(REGEX_PREFIX):])
+                continue
+            literal = pattern.rstrip('*')
+            if any(char in literal for char in GLOB_CHARS):
+                regexes.append(fnmatch.translate(pattern))
+            elif literal == pattern:
+                self.names.add(pattern)
+            else:
+                self.prefixes.add(literal)
+        self.regex = None
+        if regexes:
+            self.regex = re.compile(
+                '|'.join('(?:%s)' % regex for regex in regexes))
+
+    def __bool__(self):
+        return bool(self.patterns)
+    __nonzero__ = __bool__
+
+    def match(self, name):
+        """
+        Args:
+            name (str): package name
+        Returns:
+            bool: whether ``name`` matches any of the patterns
+        """
+        return (name in self.names or
+                self.prefixes.match(name) or
+                (self.regex is not None and
+                 self.regex.match(name) is not None))
+
+
+class Matcher(object):
+
+    """
+    An include/exclude package name filter
+
+    A name is kept if it matches an ``include`` pattern (or there are
+    none) and does not match any ``exclude`` pattern.
+
+    Args:
+        include (iterable): patterns of names to keep
+        exclude (iterable): patterns of names to drop
+    """
+
+    def __init__(self, include=(), exclude=()):
+        self.include = PatternSet(include)
+        self.exclude = PatternSet(exclude)
+
+    def __call__(self, name):
+        if self.exclude.match(name):
+            return False
+        return not self.include or self.include.match(name)
+
+    def filter(self, names):
+        """
+        Args:
+            names (iterable): package names
+        Yields:
+            str: the names which are kept, in order
+        """
+        for name in names:
+            if self(name):
+                yield name
+
+
+def compile_matcher(include=(), exclude=()):
+    """
+    Args:
+        include (iterable): patterns of names to keep
+        exclude (iterable): patterns of names to drop
+    Returns:
+        Matcher: compiled matcher, or None if there are no patterns
+    """
+    include, exclude = list(include or ()), list(exclude or ())
+    if not include and not exclude:
+        return None
+    return Matcher(include, exclude)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Compact sorted sets of package names
+
+A :class:`PkgSet` stores a sorted, de-duplicated set of package names
+as one concatenated byte buffer plus an array of offsets, so that
+hundreds of thousands of names cost roughly one byte per character
+(instead of one Python string object per name).
+
+Membership and prefix queries are binary searches over the buffer;
+set algebra is a linear merge of two buffers.
+
+.. code:: python
+
+    >>> a = PkgSet(['libfoo-dev', 'bash', 'libbar-dev', 'libbar1'])
+    >>> b = PkgSet(['bash', 'zsh'])
+    >>> list(a - b)
+    ['libbar-dev', 'libbar1', 'libfoo-dev']
+    >>> list(a.match('lib*-dev'))
+    ['libbar-dev', 'libfoo-dev']
+
+"""
+
+import array
+import fnmatch
+import re
+
+if str is bytes:
+    def _encode(name):
+        if isinstance(name, unicode):  # noqa
+            return name.encode('utf-8')
+        return name
+
+    def _decode(key):
+        return key
+else:
+    def _encode(name):
+        if isinstance(name, bytes):
+            return name
+        return name.encode('utf-8')
+
+    def _decode(key):
+        return key.decode('utf-8')
+
+OFFSET_TYPECODE = 'L'
+GLOB_CHARS = '*?['
+
+
+class PkgSet(object):
+
+    """
+    An immutable, sorted set of package names backed by a byte buffer
+    and an offset array
+
+    Args:
+        names (iterable): package names (str) or another PkgSet
+    """
+
+    __slots__ = ('_buf', '_offsets')
+
+    def __init__(self, names=()):
+        if isinstance(names, PkgSet):
+            self._buf, self._offsets = names._buf, names._offsets
+            return
+        keys = sorted(set(_encode(name) for name in names))
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        pos = 0
+        for key in keys:
+            pos += len(key)
+            offsets.append(pos)
+        self._buf = b''.join(keys)
+        self._offsets = offsets
+
+    @classmethod
+    def _from_buffer(cls, buf, offsets):
+        self = cls.__new__(cls)
+        self._buf = bytes(buf)
+        self._offsets = offsets
+        return self
+
+    @classmethod
+    def from_sorted(cls, names):
+        """
+        Build a PkgSet from names that are already sorted and unique
+        (e.g. the output of ``sort -u``) without re-sorting them
+
+        Args:
+            names (iterable): sorted, unique package names
+        Returns:
+            PkgSet: set of names
+        Raises:
+            ValueError: if ``names`` are not strictly increasing
+        """
+        buf = bytearray()
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        last = None
+        for name in names:
+            key = _encode(name)
+            if last is not None and key <= last:
+                raise ValueError("names are not sorted and unique: %r, %r"
+                                 % (last, key))
+            buf.extend(key)
+            offsets.append(len(buf))
+            last = key
+        return cls._from_buffer(buf, offsets)
+
+    def _key(self, i):
+        return self._buf[self._offsets[i]:self._offsets[i + 1]]
+
+    def _bisect(self, key, lo=0, hi=None):
+        """return the first index whose key is >= ``key``"""
+        if hi is None:
+            hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _prefix_range(self, prefix):
+        """return (start, stop) indices of keys starting with ``prefix``"""
+        start = self._bisect(prefix)
+        # the smallest key greater than every key starting with prefix
+        upper = bytearray(prefix)
+        while upper and upper[-1] == 0xff:
+            upper.pop()
+        if not upper:
+            return start, len(self)
+        upper[-1] += 1
+        return start, self._bisect(bytes(upper), start)
+
+    def _slice(self, start, stop):
+        base = self._offsets[start]
+        offsets = array.array(
+            OFFSET_TYPECODE,
+            (off - base for off in self._offsets[start:stop + 1]))
+        return PkgSet._from_buffer(
+            self._buf[base:self._offsets[stop]], offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __bool__(self):
+        return len(self) > 0
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        buf, offsets = self._buf, self._offsets
+        for i in range(len(self)):
+            yield _decode(buf[offsets[i]:offsets[i + 1]])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return _decode(self._key(i))
+
+    def __contains__(self, name):
+        key = _encode(name)
+        i = self._bisect(key)
+        return i < len(self) and self._key(i) == key
+
+    def index(self, name):
+        """
+        Args:
+            name (str): package name
+        Returns:
+            int: position of ``name`` in the set
+        Raises:
+            ValueError: if ``name`` is not in the set
+        """
+        key = _encode(name)
+        i = self._bisect(key)
+        if i < len(self) and self._key(i) == key:
+            return i
+        raise ValueError("%r is not in PkgSet" % (name,))
+
+    def __eq__(self, other):
+        if isinstance(other, (set, frozenset)):
+            other = PkgSet(other)
+        if not isinstance(other, PkgSet):
+            return NotImplemented
+        return (self._buf == other._buf and
+                self._offsets == other._offsets)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%d names, %d bytes)' % (
+            self.__class__.__name__, len(self), self.nbytes)
+
+    @property
+    def nbytes(self):
+        """number of bytes held by the buffer and the offset array"""
+        return (len(self._buf) +
+                len(self._offsets) * self._offsets.itemsize)
+
+    def prefix(self, prefix):
+        """
+        Select the names starting with ``prefix``
+
+        Args:
+            prefix (str): literal name prefix (e.g. ``linux-image-``)
+        Returns:
+            PkgSet: names starting with ``prefix``
+        """
+        return self._slice(*self._prefix_range(_encode(prefix)))
+
+    def match(self, pattern):
+        """
+        Select the names matching a shell glob (e.g. ``lib*-dev``)
+
+        The literal prefix of the pattern is resolved by binary search;
+        only the names within that range are tested against the glob.
+
+        Args:
+            pattern (str): :mod:`fnmatch` pattern
+        Returns:
+            PkgSet: names matching ``pattern``
+        """
+        key = _encode(pattern)
+        literal = key
+        for char in GLOB_CHARS:
+            pos = literal.find(char.encode('ascii'))
+            if pos != -1:
+                literal = literal[:pos]
+        start, stop = self._prefix_range(literal)
+        if literal == key:
+            # no glob characters: only the name itself matches
+            if start < stop and self._key(start) == key:
+                stop = start + 1
+            else:
+                stop = start
+            return self._slice(start, stop)
+        regex = re.compile(_encode(fnmatch.translate(_decode(key))))
+        buf = bytearray()
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        for i in range(start, stop):
+            name = self._key(i)
+            if regex.match(name):
+                buf.extend(name)
+                offsets.append(len(buf))
+        return PkgSet._from_buffer(buf, offsets)
+
+    def _merge(self, other, left, both, right):
+        """
+        Merge two sorted buffers, keeping the keys found only in self
+        (``left``), in both (``both``) and only in other (``right``)
+        """
+        if not isinstance(other, PkgSet):
+            other = PkgSet(other)
+        buf = bytearray()
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        i, j = 0, 0
+        m, n = len(self), len(other)
+        while i < m and j < n:
+            a, b = self._key(i), other._key(j)
+            if a < b:
+                if left:
+                    buf.extend(a)
+                    offsets.append(len(buf))
+                i += 1
+            elif b < a:
+                if right:
+                    buf.extend(b)
+                    offsets.append(len(buf))
+                j += 1
+            else:
+                if both:
+                    buf.extend(a)
+                    offsets.append(len(buf))
+                i += 1
+                j += 1
+        for source, k, count, keep in ((self, i, m, left),
+                                       (other, j, n, right)):
+            if keep and k < count:
+                base = len(buf) - source._offsets[k]
+                buf.extend(
+                    source._buf[source._offsets[k]:source._offsets[count]])
+                offsets.extend(
+                    off + base for off in source._offsets[k + 1:count + 1])
+        return PkgSet._from_buffer(buf, offsets)
+
+    def positions(self, other):
+        """
+        Find the positions of the names of ``other`` in self
+
+        Only the range of self between the first and the last name of
+        ``other`` is searched: with a binary search per name if
+        ``other`` is small, else with one merge over that range, so a
+        few names are resolved in a large set in O(len(other) * log n).
+
+        Args:
+            other (iterable): names (PkgSet or any iterable)
+        Returns:
+            array.array: for each name of ``other`` (in sorted order),
+            its position in self, or -1 if it is not in self
+        """
+        if not isinstance(other, PkgSet):
+            other = PkgSet(other)
+        n = len(other)
+        positions = array.array('l', [-1]) * n
+        if not n or not self:
+            return positions
+        lo = self._bisect(other._key(0))
+        hi = min(self._bisect(other._key(n - 1), lo) + 1, len(self))
+        if n * (hi - lo).bit_length() < hi - lo:
+            for j in range(n):
+                key = other._key(j)
+                i = self._bisect(key, lo, hi)
+                if i < hi and self._key(i) == key:
+                    positions[j] = i
+                    i += 1
+                lo = i
+            return positions
+        i, j = lo, 0
+        while i < hi and j < n:
+            a, b = self._key(i), other._key(j)
+            if a < b:
+                i += 1
+            elif b < a:
+                j += 1
+            else:
+                positions[j] = i
+                i += 1
+                j += 1
+        return positions
+
+    def mask(self, other):
+        """
+        Mark the names of self which are also in ``other``
+
+        The result lines up with columns indexed by this set, e.g.
+        ``sum(itertools.compress(column, pkgset.mask(names)))``
+        (:meth:`positions` is faster for a few names).
+
+        Args:
+            other (iterable): names (PkgSet or any iterable)
+        Returns:
+            bytearray: 1 at position i if self[i] is in other, else 0
+        """
+        mask = bytearray(len(self))
+        for i in self.positions(other):
+            if i >= 0:
+                mask[i] = 1
+        return mask
+
+    def union(self, other):
+        return self._merge(other, True, True, True)
+
+    def intersection(self, other):
+        return self._merge(other, False, True, False)
+
+    def difference(self, other):
+        return self._merge(other, True, False, False)
+
+    def symmetric_difference(self, other):
+        return self._merge(other, True, False, True)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+    def issubset(self, other):
+        return not self.difference(other)
+
+    def isdisjoint(self, other):
+        return not self.intersection(other)
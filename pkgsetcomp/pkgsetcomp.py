@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 # encoding: utf-8
-from __future__ import print_function
+from __future__ import absolute_import, print_function
 """
 given
  * a list of default packages
@@ -27,9 +27,18 @@ References:
 """
 
 import collections
-import subprocess
+import itertools
+import logging
 import os
-import shutil
+
+from pkgsetcomp import (aptindex, backends, dpkg, pydist, renames, rootfs,
+                        setops)
+from pkgsetcomp.matcher import compile_matcher
+from pkgsetcomp.aptindex import PackageSizes, SourceIndex
+from pkgsetcomp.depgraph import DepGraph
+from pkgsetcomp.pkgset import PkgSet
+
+log = logging.getLogger('pkgsetcomp')
 
 here = os.path.join(os.path.dirname(__file__))
 
@@ -53,6 +62,7 @@ def ensure_file(command, filename, overwrite=False, shell=False):
         None
 
     """
+    import subprocess
     print(command)
     if overwrite or not os.path.exists(filename):
         ret = subprocess.call(command, shell=shell)
@@ -61,25 +71,65 @@ def ensure_file(command, filename, overwrite=False, shell=False):
         return ret
 
 
-def read_lines(filename):
+def read_lines(filename, match=None):
     """
     Read and format lines of a file
 
     Args:
         filename (str): path to file to open as read-only
+        match (callable): if given, only yield the lines for which
+            ``match(line)`` is true (see :func:`compile_matcher`)
     Returns:
         generator of lines
 
     .. note:: this method is not unicode compatible
     """
-    with file(filename) as f:
+    with open(filename) as f:
         for line in f:
             _line = line.strip()
-            if _line:
+            if _line and (match is None or match(_line)):
                 yield _line
 
 
-def get_package_lists(manifest_url=MANIFEST_URL, cache=False, output_dir=None):
+def read_url_lines(url):
+    """
+    Read the lines of a local file or a URL
+
+    Args:
+        url (str): local path or URL
+    Returns:
+        list: lines
+    """
+    if os.path.exists(url):
+        with open(url) as f:
+            return f.readlines()
+    try:
+        from urllib.request import urlopen
+    except ImportError:
+        from urllib2 import urlopen
+    response = urlopen(url)
+    try:
+        return response.read().decode('utf-8', 'replace').splitlines()
+    finally:
+        response.close()
+
+
+def write_lines(filename, lines):
+    """
+    Write lines to a file
+
+    Args:
+        filename (str): path to file to (over)write
+        lines (iterable): lines to write (without newlines)
+    """
+    with open(filename, 'w') as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
+
+
+def get_package_lists(manifest_url=MANIFEST_URL, cache=False, output_dir=None,
+                      depgraph=None, backend=None, match=None):
     """
     Get list of installed packages and manifest packages
 
@@ -89,6 +139,12 @@ def get_package_lists(manifest_url=MANIFEST_URL, cache=False, output_dir=None):
 
     Args:
         cache (bool): whether to cache
+        depgraph (DepGraph): if given, read installed packages from
+            this graph (e.g. ``DepGraph.from_rootfs()``)
+        backend (PackageBackend): if given, read the manifest in this
+            backend's list format
+        match (callable): if given, only keep the package names for
+            which ``match(name)`` is true (the cached lists are complete)
     Returns:
         tuple of lists: (installed, manifest)
 
@@ -97,54 +153,77 @@ def get_package_lists(manifest_url=MANIFEST_URL, cache=False, output_dir=None):
     """
 
     installed = get_installed_packages(cache=cache,
-                                       output_dir=output_dir)
+                                       output_dir=output_dir,
+                                       depgraph=depgraph,
+                                       match=match)
     manifest = get_manifest_packages(manifest_url=manifest_url,
                                      cache=cache,
-                                     output_dir=output_dir)
+                                     output_dir=output_dir,
+                                     backend=backend,
+                                     match=match)
 
     return installed, manifest
 
 
 def get_installed_packages(cache=False,
                            output_dir='.',
-                           output_filename='installed.pkgs.txt'):
+                           output_filename='installed.pkgs.txt',
+                           depgraph=None,
+                           match=None):
     """
-    Get a list of the packages in a manifest
+    Get a list of the manually installed packages
 
     Args:
-        manifest_url (str): path or URL of a debian/ubuntu .manifest file
+        depgraph (DepGraph): if given, list the manually installed
+            packages of this graph instead of running aptitude
+            (``cache`` is ignored; the list is always rewritten)
+        match (callable): if given, only keep the package names for
+            which ``match(name)`` is true
 
     Returns:
-
-
+        list: sorted names of manually installed packages
     """
     output = os.path.join(output_dir, output_filename)
-    cmd = '''aptitude search '~i !~M' -F '%%p' | sort -u > %r''' % (
-        output)
-    ensure_file(cmd, output, shell=True, overwrite=not(cache))
-    installed = list(read_lines(output))
+    if depgraph is not None:
+        write_lines(output, depgraph.manual_packages())
+    else:
+        cmd = '''aptitude search '~i !~M' -F '%%p' | sort -u > %r''' % (
+            output)
+        ensure_file(cmd, output, shell=True, overwrite=not(cache))
+    installed = list(read_lines(output, match))
     return installed
 
 
 def get_manifest_packages(cache=False,
                           manifest_url=None,
                           output_dir='.',
-                          output_filename='manifest.pkgs.txt'):
+                          output_filename='manifest.pkgs.txt',
+                          backend=None,
+                          match=None):
     """
     Get a list of the packages in a manifest
 
     Args:
         manifest_url (str): path or URL of a debian/ubuntu .manifest file
+        backend (PackageBackend): if given, read the manifest in this
+            backend's list format (in process, instead of wget/awk/sort)
+        match (callable): if given, only keep the package names for
+            which ``match(name)`` is true
 
     Returns:
 
     """
     output = os.path.join(output_dir, output_filename)
-    cmd = ('''(wget -qO - %r || cat %r)'''
-           ''' | awk '{ print $1 }' '''
-           ''' | sort -u > %r''' % (manifest_url, manifest_url, output))
-    ensure_file(cmd, output, shell=True, overwrite=not(cache))
-    manifest = list(read_lines(output))
+    if backend is not None:
+        if not cache or not os.path.exists(output):
+            write_lines(output,
+                        backend.read_manifest(read_url_lines(manifest_url)))
+    else:
+        cmd = ('''(wget -qO - %r || cat %r)'''
+               ''' | awk '{ print $1 }' '''
+               ''' | sort -u > %r''' % (manifest_url, manifest_url, output))
+        ensure_file(cmd, output, shell=True, overwrite=not(cache))
+    manifest = list(read_lines(output, match))
     return manifest
 
 
@@ -177,16 +256,192 @@ def import_apt():
     return apt
 
 
-class PkgComparison(collections.namedtuple('PkgComparison', (
+def get_apt_depgraph():
+    """
+    Read the installed package dependency graph with python-apt
+
+    Returns:
+        DepGraph: installed package dependency graph
+    """
+    apt = None
+    try:
+        apt = import_apt()
+        return DepGraph.from_apt_cache(apt.Cache())
+    finally:
+        tmp_dir = getattr(apt, '_tmp_dirname', None)
+        if tmp_dir and os.path.exists(tmp_dir):
+            import shutil
+            shutil.rmtree(apt._tmp_dirname)
+
+
+class PkgComparison(object):
+
+    """
+    A package set comparison with serializers
+
+    Each list is computed when it is first accessed: ``uninstalled`` and
+    ``also_installed`` with a set difference, and ``minimal`` with the
+    dependency graph, which is only loaded (``depgraph``, or python-apt)
+    when ``minimal`` is requested.
+
+    A comparison is also a sequence of its :attr:`_fields`, like the
+    namedtuple it replaces (indexing, unpacking, ``len()`` and ``==``
+    compute every list).
+
+    Args:
+        minimal, also_installed, uninstalled (iterable): precomputed
+            lists (None to compute them on first access)
+        manifest (iterable): names of packages listed in a manifest
+        installed (iterable): names of packages installed locally
+        depgraph (DepGraph): installed package dependency graph
+            (if None, read with python-apt)
+        compact (bool): if true, store every field as a sorted
+            :class:`pkgsetcomp.pkgset.PkgSet` instead of a list
+        match (callable): if given, only list the package names for which
+            ``match(name)`` is true; ``minimal`` is still computed with
+            the dependencies of every ``also_installed`` package
+    """
+
+    _fields = (
         'minimal',
         'also_installed',
         'uninstalled',
         'manifest',
-        'installed'))):
+        'installed')
+
+    def __init__(self, minimal=None, also_installed=None, uninstalled=None,
+                 manifest=(), installed=(), depgraph=None, compact=False,
+                 match=None):
+        if compact:
+            manifest, installed = PkgSet(manifest), PkgSet(installed)
+        elif match is not None:
+            manifest, installed = list(manifest), list(installed)
+        self.compact = compact
+        self.match = match
+        # the unfiltered lists, for the covering in minimal
+        self._all_manifest = manifest
+        self._all_installed = installed
+        self.manifest = self._filter(manifest)
+        self.installed = self._filter(installed)
+        self._depgraph = depgraph
+        self._minimal = minimal
+        self._also_installed = also_installed
+        self._uninstalled = uninstalled
+
+    def __iter__(self):
+        for field in self._fields:
+            yield getattr(self, field)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(getattr(self, field) for field in self._fields[i])
+        return getattr(self, self._fields[i])
+
+    def __eq__(self, other):
+        if not isinstance(other, (tuple, PkgComparison)):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % (field, getattr(self, field))
+            for field in self._fields))
+
+    def _asdict(self):
+        return collections.OrderedDict(zip(self._fields, self))
+
+    def _filter(self, names):
+        if self.match is None:
+            return names
+        match = self.match
+        names = (name for name in names if match(name))
+        if self.compact:
+            return PkgSet.from_sorted(names)
+        return list(names)
+
+    def _difference(self, names, other):
+        # names in names (sorted) which are not in other
+        if self.compact:
+            return names - other
+        other = set(other)
+        return [x for x in names if x not in other]
+
+    @property
+    def uninstalled(self):
+        """manifest packages which are not installed"""
+        if self._uninstalled is None:
+            self._uninstalled = self._difference(self.manifest,
+                                                 self.installed)
+        return self._uninstalled
+
+    @property
+    def also_installed(self):
+        """installed packages which are not listed in the manifest"""
+        if self._also_installed is None:
+            # == comm -23
+            self._also_installed = self._difference(self.installed,
+                                                    self.manifest)
+        return self._also_installed
+
+    @property
+    def depgraph(self):
+        """installed package dependency graph (loaded on first access)"""
+        if self._depgraph is None:
+            self._depgraph = get_apt_depgraph()
+        return self._depgraph
+
+    @property
+    def minimal(self):
+        """also_installed packages which are not dependencies of other
+        also_installed packages"""
+        if self._minimal is None:
+            self._minimal = self._get_minimal()
+        return self._minimal
+
+    def _get_minimal(self):
+        # 'easiest' solution
+        # print "apt-get remove -y %s" % (' '.join(uninstalled))
+        # print "apt-get install -y %s" % (' '.join(also_installed))
+
+        # >>> why isn't this good enough?
+        # <<< why manually install dependencies that may change?
+        # <<< better to select the minimal graph/set/covering
+        # <<< though apt-get will just re-compute these dependencies again
+        # <<< "i swear i didn't manually install [...]"
+        also_installed = self.also_installed
+        depgraph = self.depgraph
+
+        # cover with every also_installed package (an excluded package
+        # still covers its dependencies), then list the matching ones
+        if self.match is None:
+            depends = depgraph.dependencies_of(also_installed)
+            listed = depends
+        else:
+            depends = depgraph.dependencies_of(self._difference(
+                self._all_installed, self._all_manifest))
+            listed = (name for name in depends if self.match(name))
+        unsatisfied = depgraph.unsatisfied
+        for pkgname in itertools.chain(also_installed, listed):
+            for group in unsatisfied.get(pkgname, ()):
+                log.warning("%s: unsatisfied dependency: %s",
+                            pkgname, ' | '.join(group))
 
-    """
-    A package set comparison namedtuple with serializers
-    """
+        # TODO: more optimal covering
+        minimal = [x for x in also_installed if x not in depends]
+        if self.compact:
+            minimal = PkgSet.from_sorted(minimal)
+        return minimal
 
     def print_string(self):
         """
@@ -199,13 +454,117 @@ class PkgComparison(collections.namedtuple('PkgComparison', (
         for x in self.uninstalled:
             print("uni: %s" % x)
 
-    def write_package_scripts(self, output_dir):
+    def sizes(self, pkgsizes):
+        """
+        Total the download and installed sizes of each package list
+
+        Args:
+            pkgsizes (PackageSizes): size index
+                (e.g. ``PackageSizes.from_apt_lists()``)
+        Returns:
+            OrderedDict: field name -> :class:`aptindex.SizeTotals`
+        """
+        return collections.OrderedDict(
+            (field, pkgsizes.totals(getattr(self, field)))
+            for field in self._fields)
+
+    def print_sizes(self, pkgsizes):
+        """
+        Print the download and installed size totals of each package list
+
+        Args:
+            pkgsizes (PackageSizes): size index
+        """
+        for field, totals in self.sizes(pkgsizes).items():
+            print("siz: %s count=%d download=%d installed=%d missing=%d" % (
+                (field,) + tuple(totals)))
+
+    def by_source(self, sources):
+        """
+        Group each package list by source package
+
+        Args:
+            sources (SourceIndex): source package index
+                (e.g. ``SourceIndex.from_apt_lists()``)
+        Returns:
+            OrderedDict: field name -> OrderedDict of source package
+            name -> sorted list of binary package names
+        """
+        return collections.OrderedDict(
+            (field, sources.group(getattr(self, field)))
+            for field in self._fields)
+
+    def print_by_source(self, sources):
+        """
+        Print the minimal, also_installed, and uninstalled lists
+        grouped by source package
+
+        Args:
+            sources (SourceIndex): source package index
+        """
+        for field, prefix in (('minimal', 'min'),
+                              ('also_installed', 'als'),
+                              ('uninstalled', 'uni')):
+            for source, pkgnames in sources.group(
+                    getattr(self, field)).items():
+                print("src: %s %s (%d): %s" % (
+                    prefix, source, len(pkgnames), ' '.join(pkgnames)))
+
+    def match_renames(self, threshold=renames.DEFAULT_THRESHOLD):
+        """
+        Pair uninstalled packages with the also_installed packages which
+        likely replaced them (e.g. ``libfoo1`` -> ``libfoo2``)
+
+        Args:
+            threshold (float): minimum n-gram similarity (0 to 1)
+        Returns:
+            list: :class:`pkgsetcomp.renames.Rename` tuples
+            (old, new, score), sorted by old name
+        """
+        return renames.match_renames(self.uninstalled, self.also_installed,
+                                     threshold=threshold)
+
+    def print_renames(self, threshold=renames.DEFAULT_THRESHOLD):
+        """
+        Print likely renames of uninstalled packages
+
+        Args:
+            threshold (float): minimum n-gram similarity (0 to 1)
+        """
+        for rename in self.match_renames(threshold=threshold):
+            print("ren: %s -> %s" % (rename.old, rename.new))
+
+    @staticmethod
+    def _install_batches(pkgnames, depgraph=None, sources=None):
+        """
+        Args:
+            pkgnames (iterable): package names
+            depgraph (DepGraph): if given, batch packages by dependency
+                layer (:meth:`DepGraph.layers`)
+            sources (SourceIndex): if given (and depgraph is not),
+                batch packages by source package
+        Returns:
+            iterable: lists of package names to install with one command
+        """
+        if depgraph is not None:
+            return depgraph.layers(pkgnames)
+        if sources is not None:
+            return sources.group(pkgnames).values()
+        return ([pkgname] for pkgname in pkgnames)
+
+    def write_package_scripts(self, output_dir, depgraph=None, sources=None):
         """
         Generate boilerplate apt-get command scripts
         for minimal, also_installed, and uninstalled
 
         Args:
             output_dir (str): directory in which to write scripts
+            depgraph (DepGraph): if given, install minimal and
+                also_installed with one ``apt-get install`` per dependency
+                layer (dependencies first) instead of one per package
+            sources (SourceIndex): if given, install (or remove) the
+                binary packages of each source package with one command
+                (dependency layers take precedence for installs)
         """
         manifest_sh = os.path.join(output_dir, 'manifest.pkgs.sh')
         installed_sh = os.path.join(output_dir, 'installed.pkgs.sh')
@@ -226,111 +585,197 @@ class PkgComparison(collections.namedtuple('PkgComparison', (
                 f.write("\n")
 
         with open(minimal_sh, 'w') as f:
-            for pkgname in self.minimal:
-                print("min: %s" % pkgname)
-                f.write("apt-get install %s" % pkgname)
+            for pkgnames in self._install_batches(self.minimal, depgraph,
+                                                  sources):
+                for pkgname in pkgnames:
+                    print("min: %s" % pkgname)
+                f.write("apt-get install %s" % ' '.join(pkgnames))
                 f.write("\n")
         with open(also_installed_sh, 'w') as f:
-            for pkgname in self.also_installed:
-                print("als: %s" % pkgname)
-                f.write("apt-get install %s" % pkgname)
+            for pkgnames in self._install_batches(self.also_installed,
+                                                  depgraph, sources):
+                for pkgname in pkgnames:
+                    print("als: %s" % pkgname)
+                f.write("apt-get install %s" % ' '.join(pkgnames))
                 f.write("\n")
         with open(uninstalled_sh, 'w') as f:
-            for pkgname in self.uninstalled:
-                print("uni: %s" % pkgname)
-                f.write("apt-get remove %s" % pkgname)
+            for pkgnames in self._install_batches(self.uninstalled,
+                                                  sources=sources):
+                for pkgname in pkgnames:
+                    print("uni: %s" % pkgname)
+                f.write("apt-get remove %s" % ' '.join(pkgnames))
                 f.write("\n")
 
 
-def compare_package_lists(manifest, installed):
+def compare_package_lists(manifest, installed, compact=False, depgraph=None,
+                          match=None):
     """
     Compare two sets (manifest, installed) of package names.
 
     Args:
         default (iterable): names of packages listed in a given MANIFEST
         installed (iterable): names of packages installed locally
+        compact (bool): if true, store every field as a sorted
+            :class:`pkgsetcomp.pkgset.PkgSet` instead of a list
+        depgraph (DepGraph): installed package dependency graph
+            (e.g. ``DepGraph.from_dpkg_status()``); if None, read
+            installed dependencies with python-apt
+        match (callable): if given, only list the package names for
+            which ``match(name)`` is true (e.g.
+            ``compile_matcher(exclude=['linux-image-*'])``); the lists
+            and the dependency graph are still read in full, so that
+            excluded packages cover their dependencies
 
     Returns:
-        PkgComparison: set comparison outputs
+        PkgComparison: set comparison outputs (computed on first access)
     """
+    return PkgComparison(
+        manifest=manifest,
+        installed=installed,
+        depgraph=depgraph,
+        compact=compact,
+        match=match)
 
-    uninstalled = [x for x in manifest if x not in installed]
-
-    # == comm -23
-    also_installed = [x for x in installed if x not in manifest]
-
-    # 'easiest' solution
-    # print "apt-get remove -y %s" % (' '.join(uninstalled))
-    # print "apt-get install -y %s" % (' '.join(also_installed))
-
-    # >>> why isn't this good enough?
-    # <<< why manually install dependencies that may change?
-    # <<< better to select the minimal graph/set/covering
-    # <<< though apt-get will just re-compute these dependencies again
-    # <<< "i swear i didn't manually install [...]"
-
-    # stack = collections.dequeue()
-    def visit_graph(apt_cache, pkgname, depends, visited):
-        try:
-            pkg = apt_cache[pkgname]
-        except KeyError as e:
-            print(e)  # TODO
-            return
-
-        for pkgset in pkg.installedDependencies:
-            for pkg in pkgset:
-                depends[pkg.name].append(pkgname)
-                if pkgname not in visited:
-                    visited[pkgname] = True
-                    visit_graph(apt_cache, pkg.name, depends, visited)
-                # stack.push( pkg['name'] )
 
-    try:
-        apt = import_apt()
-        apt_cache = apt.Cache()
+def compare_site_packages(requirements, site_packages, compact=False,
+                          match=None):
+    """
+    Compare the Python distributions installed in ``site-packages``
+    directories with requirements files
 
-        depends = collections.defaultdict(list)
-        visited = {}
-        for pkgname in also_installed:
-            visit_graph(apt_cache, pkgname, depends, visited)
+    Args:
+        requirements (iterable): paths to pip requirements files
+            (or ``pyrpo -r pip`` reports)
+        site_packages (iterable): paths to ``site-packages`` directories
+        compact (bool): see :func:`compare_package_lists`
+        match (callable): see :func:`compare_package_lists`
 
-        # TODO: more optimal covering
-        minimal = [x for x in also_installed if x not in depends]
-    finally:
-        tmp_dir = getattr(apt, '_tmp_dirname')
-        if tmp_dir and os.path.exists(tmp_dir):
-            shutil.rmtree(apt._tmp_dirname)
+    Returns:
+        PkgComparison: set comparison of normalized distribution names,
+        with a dependency graph from ``Requires-Dist``
+    """
+    depgraph = pydist.read_site_packages(site_packages)
+    return compare_package_lists(pydist.read_requirements(requirements),
+                                 sorted(depgraph.depends),
+                                 compact=compact,
+                                 depgraph=depgraph,
+                                 match=match)
 
-    return PkgComparison(
-        minimal,
-        also_installed,
-        uninstalled,
-        manifest,
-        installed)
 
+def pkgsetcomp_site_packages(requirements, site_packages,
+                             renames_threshold=None, include=(), exclude=()):
+    """
+    Compare installed Python distributions with requirements files
 
-def pkgsetcomp_packages_with_manifest(manifest_url, output_dir):
+    Args:
+        requirements (iterable): paths to pip requirements files
+        site_packages (iterable): paths to ``site-packages`` directories
+        renames_threshold (float): if given, print likely renames of
+            uninstalled distributions with this minimum similarity
+        include, exclude (iterable): glob (or ``re:``) patterns of the
+            names to compare (see :func:`compile_matcher`)
+
+    Returns:
+        PkgComparison: output of compare_site_packages
+    """
+    comparison = compare_site_packages(
+        requirements, site_packages,
+        match=compile_matcher(include, exclude))
+    comparison.print_string()
+    if renames_threshold is not None:
+        comparison.print_renames(threshold=renames_threshold)
+    return comparison
+
+
+def pkgsetcomp_packages_with_manifest(manifest_url, output_dir,
+                                      dpkg_status=None, root=None,
+                                      sizes=False, by_source=False,
+                                      renames_threshold=None, backend=None,
+                                      include=(), exclude=()):
     """
     Compare installed packages with manifest packages
 
     Args:
         manifest_url (str): URL (or local path) to a debian/ubuntu .manifest
         output_dir (str): directory in which to write .pkg.sh and pkg.txt files
+        dpkg_status (str): path to a dpkg status file from which to read
+            installed dependencies (instead of python-apt)
+        root (str): compare the packages installed in a rootfs directory,
+            rootfs/layer tarball or image tarball (instead of this host)
+        sizes (bool): print download/installed size totals from the APT
+            lists and the dpkg status file (of ``root``, which must then
+            be a directory)
+        by_source (bool): print the package lists grouped by source
+            package, and write one command per source package
+        renames_threshold (float): if given, print likely renames of
+            uninstalled packages with this minimum similarity
+        backend (str): name of the package database backend
+            (:data:`pkgsetcomp.backends.BACKENDS`) with which to read
+            ``root`` (default: ``/``) and the manifest; ``dpkg`` is the
+            same as ``root``, and the others do not support ``sizes``
+            and ``by_source``
+        include, exclude (iterable): glob (or ``re:``) patterns of the
+            package names to list (e.g. ``exclude=['linux-image-*']``)
 
     Returns:
         PkgComparison: output of compare_package_lists
     """
 
+    if backend == 'dpkg':
+        backend, root = None, root or '/'
+    elif backend is not None:
+        backend = backends.get_backend(backend, root or '/')
+
+    depgraph = sources = pkgsizes = None
+    if backend is not None:
+        depgraph = backend.depgraph()
+        sizes = by_source = False
+    elif root:
+        if sizes:
+            pkgsizes = PackageSizes.from_rootfs(root)
+        status, extended_states = rootfs.read_dpkg_database(root)
+        depgraph = DepGraph.from_dpkg_lines(status, extended_states)
+        if by_source:
+            sources = SourceIndex.from_dpkg_lines(status)
+    else:
+        if sizes:
+            pkgsizes = PackageSizes.from_apt_lists(
+                status=dpkg_status or dpkg.DPKG_STATUS)
+        if dpkg_status:
+            depgraph = DepGraph.from_dpkg_status(dpkg_status)
+        if by_source:
+            sources = SourceIndex.from_apt_lists(
+                status=dpkg_status or dpkg.DPKG_STATUS)
+
     installed, default = get_package_lists(
         manifest_url=manifest_url,
         cache=True,
-        output_dir=output_dir)
+        output_dir=output_dir,
+        depgraph=depgraph if (root or backend) else None,
+        backend=backend)
 
-    comparison = compare_package_lists(default, installed)
+    # filtered after reading, so that excluded packages still cover
+    # their dependencies in comparison.minimal
+    comparison = compare_package_lists(
+        default, installed, depgraph=depgraph,
+        match=compile_matcher(include, exclude))
 
     comparison.print_string()
 
-    comparison.write_package_scripts(output_dir=output_dir)
+    if sources is not None:
+        comparison.print_by_source(sources)
+
+    if renames_threshold is not None:
+        comparison.print_renames(threshold=renames_threshold)
+
+    if pkgsizes is not None:
+        comparison.print_sizes(pkgsizes)
+
+    # the graph read for comparison.minimal (python-apt if none was
+    # given), so that the install scripts are always layered
+    comparison.write_package_scripts(output_dir=output_dir,
+                                     depgraph=comparison.depgraph,
+                                     sources=sources)
 
     return comparison
 
@@ -341,14 +786,22 @@ def main():
     """
     import optparse
     import logging
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] in setops.SETOPS:
+        return setops.main(sys.argv[1:])
 
-    prs = optparse.OptionParser(usage="./%prog : [-o <path>] [-m <path/URL>]")
+    prs = optparse.OptionParser(
+        usage=("./%%prog : [-o <path>] [-m <path/URL>]\n"
+               "       ./%%prog {%s} <path> [<path> ...]"
+               % '|'.join(setops.SETOPS)))
 
     prs.add_option('-m', '--manifest',
                    dest='manifest',
                    action='store',
-                   help='PATH or URL to a debian/ubuntu .manifest',
-                   default=MANIFEST_URL)
+                   help=('PATH or URL to a debian/ubuntu .manifest '
+                         '(or a pip requirements file, with '
+                         '--site-packages)'))
 
     prs.add_option('-o', '--output-dir',
                    dest='output_dir',
@@ -356,6 +809,77 @@ def main():
                    help="Directory in which to store package lists",
                    default='.')
 
+    prs.add_option('--dpkg-status',
+                   dest='dpkg_status',
+                   action='store',
+                   help=("Read installed dependencies from a dpkg status "
+                         "file (e.g. %s) instead of python-apt"
+                         % dpkg.DPKG_STATUS))
+
+    prs.add_option('-r', '--root',
+                   dest='root',
+                   action='store',
+                   help=("Compare the packages installed in a rootfs "
+                         "directory, .tar/.tar.gz layer, or docker save "
+                         "image tarball"))
+
+    prs.add_option('--backend',
+                   dest='backend',
+                   action='store',
+                   type='choice',
+                   choices=list(backends.BACKENDS),
+                   help=("Read installed packages (from --root, default: /) "
+                         "and the manifest with a package database backend "
+                         "(%s)" % ', '.join(backends.BACKENDS)))
+
+    prs.add_option('--site-packages',
+                   dest='site_packages',
+                   action='append',
+                   help=("Compare the Python distributions installed in a "
+                         "site-packages directory with the pip requirements "
+                         "file given with -m (may be repeated)"))
+
+    prs.add_option('--include',
+                   dest='include',
+                   action='append',
+                   default=[],
+                   help=("Only compare packages matching a glob, or a "
+                         "regex prefixed with re: (may be repeated)"))
+    prs.add_option('--exclude',
+                   dest='exclude',
+                   action='append',
+                   default=[],
+                   help=("Ignore packages matching a glob (e.g. "
+                         "'linux-image-*'), or a regex prefixed with re: "
+                         "(may be repeated)"))
+
+    prs.add_option('--sizes',
+                   dest='sizes',
+                   action='store_true',
+                   help=("Print download and installed size totals "
+                         "(from %s and the dpkg status file, "
+                         "of --root if given)"
+                         % aptindex.APT_LISTS))
+
+    prs.add_option('--by-source',
+                   dest='by_source',
+                   action='store_true',
+                   help=("Group packages by source package "
+                         "(e.g. every libreoffice-* binary)"))
+
+    prs.add_option('--renames',
+                   dest='renames',
+                   action='store_true',
+                   help=("Pair uninstalled packages with likely renamed "
+                         "also_installed packages (e.g. libfoo1 -> libfoo2)"))
+    prs.add_option('--renames-threshold',
+                   dest='renames_threshold',
+                   action='store',
+                   type='float',
+                   default=renames.DEFAULT_THRESHOLD,
+                   help=("Minimum n-gram similarity of renamed packages, "
+                         "from 0 to 1 (default: %default)"))
+
     prs.add_option('-v', '--verbose',
                    dest='verbose',
                    action='store_true',)
@@ -371,7 +895,36 @@ def main():
         if opts.verbose:
             logging.getLogger().setLevel(logging.DEBUG)
 
-    return pkgsetcomp_packages_with_manifest(opts.manifest, opts.output_dir)
+    if opts.backend == 'rpm-list' and not opts.root:
+        prs.error("--backend rpm-list requires the path to a rpm -qa "
+                  "listing (-r/--root)")
+
+    if (opts.sizes and opts.root and opts.backend in (None, 'dpkg') and
+            not os.path.isdir(opts.root)):
+        prs.error("--sizes requires -r/--root to be a rootfs directory, "
+                  "not a file")
+
+    renames_threshold = opts.renames_threshold if opts.renames else None
+
+    if opts.site_packages:
+        if not opts.manifest:
+            prs.error("--site-packages requires a requirements file (-m)")
+        return pkgsetcomp_site_packages([opts.manifest], opts.site_packages,
+                                        renames_threshold=renames_threshold,
+                                        include=opts.include,
+                                        exclude=opts.exclude)
+
+    return pkgsetcomp_packages_with_manifest(
+        opts.manifest or MANIFEST_URL,
+        opts.output_dir,
+        dpkg_status=opts.dpkg_status,
+        root=opts.root,
+        sizes=opts.sizes,
+        by_source=opts.by_source,
+        renames_threshold=renames_threshold,
+        backend=opts.backend,
+        include=opts.include,
+        exclude=opts.exclude)
 
 if __name__ == "__main__":
     import sys
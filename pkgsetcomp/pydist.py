@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import absolute_import, print_function
+"""
+Installed Python distributions and requirements files
+
+Distributions are read from the metadata files in ``site-packages``
+(no ``pip freeze`` subprocess):
+
+* ``*.dist-info/METADATA`` (``Name``, ``Version``, ``Requires-Dist``)
+* ``*.egg-info/PKG-INFO`` + ``requires.txt``, or a ``*.egg-info`` file
+
+Only the metadata headers are read (not the long description), and
+names are normalized as in PEP 503 (``Foo_Bar`` -> ``foo-bar``).
+
+Requirements are read from ``pip`` requirements files, including the
+``-e vcs+url@rev#egg=name`` lines of :meth:`pyrpo.Repository.pip_report`.
+"""
+
+import collections
+import os
+import re
+
+from pkgsetcomp.depgraph import DepGraph
+
+Distribution = collections.namedtuple('Distribution', (
+    'name',
+    'version',
+    'requires',
+    'conditional',
+    'path'))
+
+METADATA_FIELDS = ('Name', 'Version', 'Requires-Dist')
+
+_normalize = re.compile(r'[-_.]+')
+_requirement_name = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+_egg_fragment = re.compile(r'#(?:.*&)?egg=([^&\s]+)')
+
+
+def normalize_name(name):
+    """
+    Args:
+        name (str): distribution name
+    Returns:
+        str: PEP 503 normalized name
+    """
+    return _normalize.sub('-', name).lower()
+
+
+def requirement_name(spec):
+    """
+    Args:
+        spec (str): requirement specifier
+            (e.g. ``Foo[bar] (>=1.0) ; python_version < "3"``)
+    Returns:
+        str: normalized name, or None if ``spec`` has no name
+    """
+    match = _requirement_name.match(spec)
+    if match is None:
+        return None
+    return normalize_name(match.group(1))
+
+
+def read_metadata(lines):
+    """
+    Read the headers of a ``METADATA`` / ``PKG-INFO`` file
+
+    Args:
+        lines (iterable): lines of the file
+    Returns:
+        dict: field name -> list of values (of :data:`METADATA_FIELDS`)
+    """
+    headers = {}
+    for line in lines:
+        if not line.strip():
+            break
+        if line[:1] in (' ', '\t'):
+            continue
+        key, _, value = line.partition(':')
+        if key in METADATA_FIELDS:
+            headers.setdefault(key, []).append(value.strip())
+    return headers
+
+
+def read_requires_txt(lines):
+    """
+    Read the unconditional requirements of an egg-info ``requires.txt``
+    (the ``[extra]`` and ``[:marker]`` sections are skipped)
+
+    Args:
+        lines (iterable): lines of ``requires.txt``
+    Returns:
+        list: requirement specifiers
+    """
+    requires = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            break
+        if line and not line.startswith('#'):
+            requires.append(line)
+    return requires
+
+
+def _open(path):
+    if str is bytes:
+        return open(path)
+    return open(path, encoding='utf-8', errors='replace')
+
+
+def read_distribution(path):
+    """
+    Read the metadata of one ``.dist-info`` or ``.egg-info``
+
+    Requirements conditional on an extra (``; extra == "test"``) are
+    not dependencies of the distribution, and are dropped; those with
+    another environment marker (``; sys_platform == "win32"``) are
+    listed separately, as ``conditional``.
+
+    Args:
+        path (str): path to a ``*.dist-info`` directory or a
+            ``*.egg-info`` directory or file
+    Returns:
+        Distribution: (name, version, requires, conditional, path),
+        or None if the metadata has no ``Name``
+    """
+    requires_txt = None
+    if path.endswith('.dist-info'):
+        metadata = os.path.join(path, 'METADATA')
+    elif os.path.isdir(path):
+        metadata = os.path.join(path, 'PKG-INFO')
+        requires_txt = os.path.join(path, 'requires.txt')
+    else:
+        metadata = path
+    try:
+        with _open(metadata) as f:
+            headers = read_metadata(f)
+    except IOError:
+        return None
+    if not headers.get('Name'):
+        return None
+    requires, conditional = [], []
+    for spec in headers.get('Requires-Dist', ()):
+        marker = spec.partition(';')[2]
+        if 'extra' not in marker:
+            (conditional if marker.strip() else requires).append(spec)
+    if requires_txt is not None and os.path.exists(requires_txt):
+        with _open(requires_txt) as f:
+            requires.extend(read_requires_txt(f))
+    return Distribution(
+        normalize_name(headers['Name'][0]),
+        (headers.get('Version') or [None])[0],
+        [name for name in map(requirement_name, requires) if name],
+        [name for name in map(requirement_name, conditional) if name],
+        path)
+
+
+def iter_distributions(site_packages):
+    """
+    Args:
+        site_packages (str): path to a ``site-packages`` directory
+    Yields:
+        Distribution: installed distributions, sorted by path
+    """
+    for entry in sorted(os.listdir(site_packages)):
+        if entry.endswith(('.dist-info', '.egg-info')):
+            dist = read_distribution(os.path.join(site_packages, entry))
+            if dist is not None:
+                yield dist
+
+
+def read_site_packages(paths):
+    """
+    Build a dependency graph of the distributions installed in one or
+    more ``site-packages`` directories (the first found wins)
+
+    Markers are not evaluated: a conditional requirement is a
+    dependency if it is installed, and is otherwise assumed not to
+    apply to this environment.
+
+    Args:
+        paths (iterable): paths to ``site-packages`` directories
+    Returns:
+        DepGraph: installed distribution dependency graph
+    """
+    dists = collections.OrderedDict()
+    for site_packages in paths:
+        for dist in iter_distributions(site_packages):
+            dists.setdefault(dist.name, dist)
+    graph = DepGraph()
+    for name, dist in dists.items():
+        graph.add(name, dist.requires +
+                  [dep for dep in dist.conditional if dep in dists])
+    return graph
+
+
+def iter_requirements(lines):
+    """
+    Read the distribution names of a pip requirements file
+
+    Handles ``name[extras]>=1.0 ; marker``, ``name @ url``, and
+    ``-e``/``--editable`` or plain VCS/URL lines with an ``#egg=name``
+    fragment (e.g. the output of ``pyrpo -r pip``); other options
+    (``-r``, ``-i``, ...) and comments are skipped.
+
+    Args:
+        lines (iterable): lines of a requirements file
+    Yields:
+        str: normalized distribution names, in file order
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        editable = line.startswith(('-e ', '--editable ', '--editable='))
+        if line.startswith('-') and not editable:
+            continue
+        match = _egg_fragment.search(line)
+        if match is not None:
+            yield requirement_name(match.group(1))
+            continue
+        if editable or '://' in line.split(' @ ')[0]:
+            continue
+        name = requirement_name(line.split(' #', 1)[0])
+        if name:
+            yield name
+
+
+def read_requirements(filenames):
+    """
+    Args:
+        filenames (iterable): paths to requirements files
+    Returns:
+        list: sorted, unique normalized distribution names
+    """
+    names = set()
+    for filename in filenames:
+        with _open(filename) as f:
+            names.update(iter_requirements(f))
+    return sorted(names)
@@ -1,54 +1,62 @@
 #!/usr/bin/env python
 # encoding: utf-8
-from __future__ import print_function
+from __future__ import absolute_import, print_function
 """Search for code repositories and generate reports"""
 
 import datetime
 import errno
 import logging
 import os
-import pprint
 import re
-import subprocess
+import stat
 import sys
+import traceback
 from collections import deque, namedtuple
-from distutils.util import convert_path
-from itertools import chain, imap, izip_longest
+from itertools import chain
 
-# TODO: arrow
-from dateutil.parser import parse as parse_date
+from pkgsetcomp import gitfiles, hgfiles, splitting
+from pkgsetcomp.matcher import PatternSet
+from pkgsetcomp.splitting import itersplit, split_fields
+
+try:
+    from itertools import imap
+except ImportError:
+    imap = map
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
 try:
     from collections import OrderedDict as Dict
 except ImportError as e:
     Dict = dict
 
-# def parse_date(*args, **kwargs):
-#     print(args)
-#     print(kwargs)
+
+# TODO: arrow
+def parse_date(*args, **kwargs):
+    """
+    Parse a date string with ``dateutil.parser.parse``
+
+    dateutil is imported on first use, not when this module is imported.
+    """
+    from dateutil.parser import parse
+    return parse(*args, **kwargs)
 
 # logging.basicConfig()
 log = logging.getLogger('repos')
 dtformat = lambda x: x.strftime('%Y-%m-%d %H:%M:%S %z')
 
 
-def itersplit(s, sep=None):
-    if not s:
-        yield s
-        return
-    exp = re.compile(r'\s+' if sep is None else re.escape(sep))
-    pos = 0
-    while True:
-        m = exp.search(s, pos)
-        if not m:
-            if pos < len(s) or sep is not None:
-                yield s[pos:]
-            break
-        if pos < m.start() or sep is not None:
-            yield s[pos:m.start()]
-        pos = m.end()
-
-
 DEFAULT_FSEP = ' ||| '
 DEFAULT_LSEP = ' |..|'
 # DEFAULT_FSEP=u' %s ' % unichr(0xfffd)
@@ -60,20 +68,13 @@ def itersplit_to_fields(_str,
                         revtuple=None,
                         fields=[],
                         preparse=None):
-    if preparse:
-        _str = preparse(_str)
-    _fields = itersplit(_str, fsep)
-
-    if revtuple is not None:
-        try:
-            values = (t[1] for t in izip_longest(revtuple._fields, _fields))
-            return revtuple(*values)
-        except:
-            log.error(revtuple)
-            log.error(_fields)
-            raise
-
-    return tuple(izip_longest(fields, _fields, fillvalue=None))
+    try:
+        return splitting.itersplit_to_fields(
+            _str, fsep, revtuple=revtuple, fields=fields, preparse=preparse)
+    except:
+        log.error(revtuple)
+        log.error(_str)
+        raise
 
 
 _missing = unichr(822)
@@ -118,11 +119,20 @@ class cached_property(object):
 
 # TODO: sarge
 def sh(cmd, ignore_error=False, cwd=None, *args, **kwargs):
+    """
+    Run a command and return its output (stdout and stderr)
+
+    Args:
+        cmd (str or list): shell command string, or argument list
+            (run without a shell)
+    """
+    import subprocess
     kwargs.update({
-        'shell': True,
+        'shell': not isinstance(cmd, (list, tuple)),
         'cwd': cwd,
         'stderr': subprocess.STDOUT,
-        'stdout': subprocess.PIPE})
+        'stdout': subprocess.PIPE,
+        'universal_newlines': True})
     log.debug('cmd: %s %s' % (cmd, kwargs))
     p = subprocess.Popen(cmd, **kwargs)
     p_stdout = p.communicate()[0]
@@ -132,6 +142,88 @@ def sh(cmd, ignore_error=False, cwd=None, *args, **kwargs):
     return p_stdout
 
 
+CHUNK_SIZE = 65536
+
+
+def iter_records(chunks, sep):
+    """
+    Split a stream of text chunks into records
+
+    Only the current (incomplete) record is kept in memory; a separator
+    spanning two chunks is found.
+
+    Args:
+        chunks (iterable): text chunks (e.g. reads from a pipe)
+        sep (str): record separator
+    Yields:
+        str: records (as ``''.join(chunks).split(sep)``)
+    """
+    overlap = len(sep) - 1
+    pending = []
+    tail = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending.append(chunk)
+        if sep not in tail + chunk:
+            if overlap:
+                tail = (tail + chunk)[-overlap:]
+            continue
+        records = ''.join(pending).split(sep)
+        last = records.pop()
+        pending = [last]
+        tail = last[-overlap:] if overlap else ''
+        for record in records:
+            yield record
+    yield ''.join(pending)
+
+
+def sh_records(cmd, sep, ignore_error=False, cwd=None,
+               chunk_size=CHUNK_SIZE):
+    """
+    Run a command and yield the records of its output as they are read
+    (stderr is not part of the output)
+
+    Closing the generator before the end of the output kills the
+    command.
+
+    Args:
+        cmd (str or list): shell command string, or argument list
+        sep (str): record separator
+        ignore_error (bool): do not raise if the command fails
+        cwd (str): working directory
+        chunk_size (int): number of characters to read at a time
+    Yields:
+        str: records (see :func:`iter_records`)
+    Raises:
+        Exception: if the command fails (and not ``ignore_error``)
+    """
+    import subprocess
+    import tempfile
+    log.debug('cmd: %s (cwd=%r)' % (cmd, cwd))
+    with tempfile.TemporaryFile() as stderr:
+        p = subprocess.Popen(cmd,
+                             shell=not isinstance(cmd, (list, tuple)),
+                             cwd=cwd,
+                             stdout=subprocess.PIPE,
+                             stderr=stderr,
+                             universal_newlines=True)
+        try:
+            chunks = iter(lambda: p.stdout.read(chunk_size), '')
+            for record in iter_records(chunks, sep):
+                yield record
+            p.wait()
+        finally:
+            if p.poll() is None:
+                p.kill()
+            p.stdout.close()
+            p.wait()
+        if p.returncode and not ignore_error:
+            stderr.seek(0)
+            raise Exception("Subprocess return code: %d\n%r\n%r" % (
+                p.returncode, cmd, stderr.read()))
+
+
 class Repository(object):
     label = None
     prefix = None
@@ -140,13 +232,15 @@ class Repository(object):
     lsep = DEFAULT_LSEP
     fields = []
     clone_cmd = 'clone'
+    # log_iter of a failing log command yields nothing (instead of raising)
+    log_ignore_error = False
 
     def __init__(self, fpath):
         self.fpath = os.path.abspath(fpath)
         self.symlinks = []
 
     def __new__(cls, name):
-        self = super(Repository, cls).__new__(cls, name)
+        self = super(Repository, cls).__new__(cls)
         self._tuple = self._namedtuple
         return self
 
@@ -200,24 +294,28 @@ class Repository(object):
 
     @cached_property
     def last_commit(self):
-        return self.log_iter(maxentries=1).next()
+        return next(self.log_iter(maxentries=1))
+
+    def log_cmd(self, n=None, **kwargs):
+        """
+        :returns: str log command (of at most ``n`` entries)
+        """
+        pass
 
     def log(self, n=None, **kwargs):
         """
         :returns: str
         """
-        pass
+        return self.sh(self.log_cmd(n=n, **kwargs))
 
     def itersplit_to_fields(self, _str):
         if self.preparse:
             _str = self.preparse(_str)
 
-        _fields = itersplit(_str, self.fsep)
+        _fields = split_fields(_str, self.fsep, len(self._tuple._fields))
 
         try:
-            values = (
-                t[1] for t in izip_longest(self._tuple._fields, _fields))
-            return self._tuple(*values)
+            return self._tuple(*_fields)
         except:
             log.error(self._tuple)
             log.error(_fields)
@@ -231,19 +329,26 @@ class Repository(object):
         #   ignore_error=True
         # )
         template = repr(template or self.template)
-        op = self.log(n=maxentries, template=template, **kwargs)
-        if not op:
-            return
-        print(op)
-        for l in itersplit(op, self.lsep):
-            l = l.strip()
-            if not l:
-                continue
-            try:
-                yield self._parselog(l,)
-            except Exception:
-                log.error("%s %r" % (str(self), l))
-                raise
+        cmd = self.log_cmd(n=maxentries, template=template, **kwargs)
+        records = sh_records(cmd, self.lsep, cwd=self.fpath,
+                             ignore_error=self.log_ignore_error)
+        count = 0
+        try:
+            for l in records:
+                l = l.strip()
+                if not l:
+                    continue
+                try:
+                    yield self._parselog(l,)
+                except Exception:
+                    log.error("%s %r" % (str(self), l))
+                    raise
+                count += 1
+                if maxentries and count >= maxentries:
+                    break
+        finally:
+            # stops the log command if it is still running
+            records.close()
         return
 
     # def search_upwards():
@@ -253,7 +358,7 @@ class Repository(object):
 
     def full_report(self):
         yield ''
-        yield "# %s" % self.origin_report().next()
+        yield "# %s" % next(self.origin_report())
         yield "%s [%s]" % (self.last_commit, self)
         if self.status:
             for l in self.status.split('\n'):
@@ -274,6 +379,7 @@ class Repository(object):
         return url
 
     def str_report(self):
+        import pprint
         yield pprint.pformat(self.to_dict())
 
     def sh_report(self):
@@ -311,7 +417,7 @@ class Repository(object):
 
     def status_report(self):
         yield '######'
-        yield self.sh_report().next()
+        yield next(self.sh_report())
         yield self.last_commit
         yield self.status
         yield ""
@@ -373,8 +479,9 @@ class Repository(object):
             yield mtimestr, fname
 
     def sh(self, cmd, ignore_error=False, cwd=None, *args, **kwargs):
+        import subprocess
         kwargs.update({
-            'shell': True,
+            'shell': not isinstance(cmd, (list, tuple)),
             'cwd': cwd or self.fpath,
             'stderr': subprocess.STDOUT,
             'stdout': subprocess.PIPE})
@@ -388,6 +495,17 @@ class Repository(object):
         #         p.returncode, cmd, p_stdout))
         # return p_stdout #.rstrip()
 
+    def ash(self, cmd, ignore_error=False, cwd=None, **kwargs):
+        """
+        Run a command in this repository with asyncio (Python 3.7+)
+
+        Returns:
+            coroutine: see :func:`pkgsetcomp.asyncsh.ash`
+        """
+        from pkgsetcomp.asyncsh import ash
+        return ash(cmd, ignore_error=ignore_error, cwd=cwd or self.fpath,
+                   **kwargs)
+
     def to_dict(self):
         return self.__dict__
 
@@ -412,17 +530,30 @@ class MercurialRepository(Repository):
     def unique_id(self):
         return self.fpath  # self.sh('hg id -r 0').rstrip()
 
+    @cached_property
+    def hgdir(self):
+        """
+        :returns: hgfiles.HgDir reader of the hgrc, branch and dirstate
+            files, or None (hg is run instead)
+        """
+        return hgfiles.HgDir.find(self.fpath)
+
     @cached_property
     def status(self):
         return self.sh('hg status').rstrip()
 
     @cached_property
     def remote_url(self):
+        if self.hgdir is not None and self.hgdir.config is not None:
+            return self.hgdir.get('paths', 'default', '')
         return self.sh('hg showconfig paths.default',
                        ignore_error=True).strip()
 
     @cached_property
     def remote_urls(self):
+        if self.hgdir is not None and self.hgdir.config is not None:
+            return ''.join(
+                '%s\n' % l for l in self.hgdir.iter_config('paths'))
         return self.sh('hg showconfig paths')
 
     @cached_property
@@ -431,22 +562,26 @@ class MercurialRepository(Repository):
 
     @cached_property
     def current_id(self):
+        if self.hgdir is not None:
+            head_id = self.hgdir.head_id()
+            if head_id is not None:
+                return head_id
         return self.sh('hg id -i').rstrip().rstrip('+')  # TODO
 
     @cached_property
     def branch(self):
-        return self.sh('hg branch')
+        if self.hgdir is not None:
+            return self.hgdir.branch()
+        return self.sh('hg branch').strip()
 
-    def log(self, n=None, **kwargs):
-        # TODO: nested generator
-        return self.sh(' '.join((
+    def log_cmd(self, n=None, **kwargs):
+        return ' '.join((
             'hg log',
             ('-l%d' % n) if n else '',
             ' '.join(
-                ('--%s=%s' % (k, v)) for (k, v) in kwargs.iteritems()
+                ('--%s=%s' % (k, v)) for (k, v) in kwargs.items()
                 )
             ))
-        )
 
     def loggraph(self):
         return self.sh('hg log --graph')
@@ -457,19 +592,44 @@ class MercurialRepository(Repository):
     def serve(self):
         return self.sh('hg serve')
 
-    # @cached_property # TODO: once
+    # process-wide: see url_schemes
+    _url_schemes = None
+    _url_schemes_stamp = None
+
     @staticmethod
-    def _get_url_scheme_regexes():
-        output = sh("hg showconfig | grep '^schemes.'").split('\n')
-        log.debug(output)
-        schemes = (
-            l.split('.', 1)[1].split('=') for l in output if '=' in l)
-        regexes = sorted(
-            ((k, v, re.compile(v.replace('{1}', '(.*)')+'(.*)'))
-                for k, v in schemes),
-            key=lambda x: (len(x[0]), x),
-            reverse=True)
-        return regexes
+    def _read_url_schemes(paths):
+        config = hgfiles.read_config_files(paths)
+        if config is not None:
+            return config.get('schemes', {}).items()
+        # the config includes other files: ask hg
+        try:
+            output = sh(['hg', 'showconfig', 'schemes'], ignore_error=True)
+        except OSError as e:
+            log.debug("hg showconfig schemes: %r" % e)
+            return ()
+        return (
+            l[len('schemes.'):].split('=', 1) for l in output.splitlines()
+            if l.startswith('schemes.') and '=' in l)
+
+    @classmethod
+    def url_schemes(cls):
+        """
+        Mercurial URL schemes (``[schemes]`` of the system and user
+        config files), read once per process and again when one of the
+        files changes
+
+        Returns:
+            hgfiles.UrlSchemes: scheme table
+        """
+        paths = hgfiles.config_paths()
+        stamp = (paths, hgfiles.config_stamp(paths))
+        if (MercurialRepository._url_schemes is None or
+                MercurialRepository._url_schemes_stamp != stamp):
+            schemes = hgfiles.UrlSchemes(cls._read_url_schemes(paths))
+            log.debug(schemes)
+            MercurialRepository._url_schemes = schemes
+            MercurialRepository._url_schemes_stamp = stamp
+        return MercurialRepository._url_schemes
 
     @classmethod
     def to_hg_scheme_url(cls, url):
@@ -484,23 +644,7 @@ class MercurialRepository(Repository):
             << gh://westurner/dotfiles
 
         """
-        regexes = cls._get_url_scheme_regexes()
-        for scheme_key, pattern, regex in regexes:
-            match = regex.match(url)
-            if match is not None:
-                groups = match.groups()
-                if len(groups) == 2:
-                    return u''.join(
-                        scheme_key,
-                        '://',
-                        pattern.replace('{1}', groups[0]),
-                        groups[1])
-                elif len(groups) == 1:
-                    return u''.join(
-                        scheme_key,
-                        '://',
-                        pattern,
-                        groups[0])
+        return cls.url_schemes().to_hg_scheme_url(url)
 
     @classmethod
     def to_normal_url(cls, url):
@@ -515,15 +659,7 @@ class MercurialRepository(Repository):
             << 'git://github.com/westurner/dotfiles'
 
         """
-        regexes = cls._get_url_scheme_regexes()
-        _url = url[:]
-        for scheme_key, pattern, regex in regexes:
-            if _url.startswith(scheme_key):
-                if '{1}' in pattern:
-                    _url = pattern.replace('{1}', _url.lstrip(scheme_key))
-                else:
-                    _url = (pattern + _url.lstrip(scheme_key).lstrip('://'))
-        return _url
+        return cls.url_schemes().to_normal_url(url)
 
     # def to_pip_compatible_url(cls, url):
     #     PATTERNS = (
@@ -539,6 +675,7 @@ class MercurialRepository(Repository):
 class GitRepository(Repository):
     label = 'git'
     prefix = '.git'
+    log_ignore_error = True
     fields = (
         ('datestr', '%ai', None, parse_date),
         ('noderev', '%h', None),
@@ -555,22 +692,123 @@ class GitRepository(Repository):
     def unique_id(self):
         return self.fpath
 
+    @staticmethod
+    def _short_status(lines):
+        """
+        Convert ``git status --porcelain=v2`` entries to the
+        ``git status -s`` format
+
+        Args:
+            lines (iterable): porcelain v2 lines (``#`` headers skipped)
+        Returns:
+            str: ``git status -s`` output
+        """
+        def quote(path):
+            # -s also quotes paths with spaces (v2 only C-quotes)
+            if ' ' in path and not path.startswith('"'):
+                return '"%s"' % path
+            return path
+
+        short = []
+        for l in lines:
+            if l.startswith('1 '):
+                fields = l.split(' ', 8)
+                path = quote(fields[8])
+            elif l.startswith('2 '):
+                fields = l.split(' ', 9)
+                path = ' -> '.join(
+                    quote(p) for p in reversed(fields[9].split('\t', 1)))
+            elif l.startswith('u '):
+                fields = l.split(' ', 10)
+                path = quote(fields[10])
+            elif l.startswith(('? ', '! ')):
+                short.append('%s %s' % (l[0] * 2, quote(l[2:])))
+                continue
+            else:
+                continue
+            short.append('%s %s' % (fields[1].replace('.', ' '), path))
+        return ''.join('%s\n' % l for l in short)
+
+    def collect(self):
+        """
+        Read ``status``, ``branch``, ``current_id``, ``last_commit`` and
+        ``remote_url`` with two git commands (run without a shell):
+
+        * ``git status --porcelain=v2 --branch``: status and branch
+        * ``git log -1``: last commit and current (short) revision
+        * the remote URL is read from the config file (or with
+          ``git config --get remote.origin.url``)
+
+        The values are cached as the cached properties of the same
+        names; a repository without commits has no ``last_commit`` or
+        ``current_id`` (these are left to their properties).
+
+        Returns:
+            dict: collected values
+        """
+        collected = self.__dict__.get('_collected')
+        if collected is not None:
+            return collected
+        collected = {}
+        status = self.sh(['git', 'status', '--porcelain=v2', '--branch'])
+        lines = status.splitlines()
+        headers = dict(
+            l[2:].split(' ', 1) for l in lines if l.startswith('# '))
+        collected['branch'] = headers.get('branch.head')
+        collected['status'] = self._short_status(lines)
+        if headers.get('branch.oid', '(initial)') != '(initial)':
+            op = self.sh(['git', 'log', '-n1', '--format=%s' % self.template])
+            for l in itersplit(op, self.lsep):
+                l = l.strip()
+                if l:
+                    commit = self._parselog(l)
+                    collected['last_commit'] = commit
+                    collected['current_id'] = commit.noderev
+                    break
+        collected['remote_url'] = self._remote_url()
+        for name, value in collected.items():
+            self.__dict__.setdefault(name, value)
+        self.__dict__['_collected'] = collected
+        return collected
+
+    @cached_property
+    def gitdir(self):
+        """
+        :returns: gitfiles.GitDir reader of the HEAD, refs and config
+            files, or None (git is run instead)
+        """
+        return gitfiles.GitDir.find(self.fpath)
+
+    def _remote_url(self):
+        if self.gitdir is not None and self.gitdir.config is not None:
+            return self.gitdir.get('remote.origin.url', '')
+        return self.sh(['git', 'config', '--get', 'remote.origin.url'],
+                       ignore_error=True).strip()
+
     @cached_property
     def status(self):
-        return self.sh('git status -s')
+        return self.collect()['status']
 
     @cached_property
     def remote_url(self):
-        return self.sh('git config remote.origin.url',
-                       ignore_error=True).strip()  # .split('=',1)[1]# *
+        return self._remote_url()
 
     @cached_property
     def remote_urls(self):
+        if self.gitdir is not None and self.gitdir.config is not None:
+            return '\n'.join(self.gitdir.iter_urls())
         return self.sh('git config -l | grep "url"',
                        ignore_error=True).strip()  # .split('=',1)[1]# *
 
     @cached_property
     def current_id(self):
+        if self.gitdir is not None:
+            head_id = self.gitdir.head_id()
+            if head_id is not None:
+                return head_id
+        collected = self.collect()
+        if 'current_id' in collected:
+            return collected['current_id']
         return self.sh('git rev-parse --short HEAD').rstrip()
 
     def diff(self):
@@ -578,23 +816,27 @@ class GitRepository(Repository):
 
     @cached_property
     def branch(self):
-        return self.sh('git branch')
+        if self.gitdir is not None:
+            branch = self.gitdir.branch()
+            if branch is not None:
+                return branch
+        return self.collect()['branch']
 
-    def log(self, n=None, **kwargs):
+    def log_cmd(self, n=None, **kwargs):
         kwargs['format'] = kwargs.pop('template')
-        cmd = ' '.join((
+        return ' '.join((
             'git log',
             ('-n%d' % n) if n else '',
             ' '.join(
-                ('--%s=%s' % (k, v)) for (k, v) in kwargs.iteritems()
+                ('--%s=%s' % (k, v)) for (k, v) in kwargs.items()
             )
         ))
+
+    def log(self, n=None, **kwargs):
         try:
-            output = self.sh(cmd)
-            if "fatal: bad default revision 'HEAD'" in output:
-                return output
-            return output
+            return self.sh(self.log_cmd(n=n, **kwargs))
         except Exception as e:
+            # e.g. a repository without commits
             return
 
     def loggraph(self):
@@ -602,7 +844,10 @@ class GitRepository(Repository):
 
     @cached_property
     def last_commit(self):
-        return self.log_iter(maxentries=1).next()
+        collected = self.collect()
+        if 'last_commit' in collected:
+            return collected['last_commit']
+        return next(self.log_iter(maxentries=1))
 
     # def __log_iter(self, maxentries=None):
     #    rows = self.log(
@@ -652,7 +897,8 @@ class BzrRepository(Repository):
         'committer': 'author',
         'message': 'desc'
     }
-    logrgx = re.compile(
+    # matched with re.match (and compiled by the re cache) on first use
+    logrgx = (
         r'^(revno|tags|committer|branch\snick|timestamp|message):\s?(.*)\n?')
     clone_cmd = 'branch'
 
@@ -681,10 +927,10 @@ class BzrRepository(Repository):
     def branch(self):
         return self.sh('bzr nick')
 
-    def log(self, n=None, template=None):
-        return self.sh(' '.join((
+    def log_cmd(self, n=None, template=None):
+        return ' '.join((
             'bzr log',
-            '-l%d' % n if n else '')))
+            '-l%d' % n if n else ''))
 
     # @cached_property
     # def last_commit(self):
@@ -716,13 +962,12 @@ class BzrRepository(Repository):
         def __parselog(entry):
             bufname = None
             buf = deque()
-            print(entry)
             if entry == ['']:
                 return
             for l in itersplit(entry, '\n'):
                 if not l:
                     continue
-                mobj = self.logrgx.match(l)
+                mobj = re.match(self.logrgx, l)
                 if not mobj:
                     # "  - Log message"
                     buf.append(self._logmessage_transform(l))
@@ -810,15 +1055,12 @@ class SvnRepository(Repository):
             self.sh('svn info | grep "^Revision: "')
             .split(': ', 1)[1].strip())
 
-    def log(self, n=None, template=None, **kwargs):
-        return (
-            self.sh(' '.join((
-                'svn log',
-                ('-l%n' % n) if n else '',
-                ' '.join(('--%s=%s' % (k, v)) for (k, v) in kwargs.items())
-                ))
-            )
-        )
+    def log_cmd(self, n=None, template=None, **kwargs):
+        return ' '.join((
+            'svn log',
+            ('-l%d' % n) if n else '',
+            ' '.join(('--%s=%s' % (k, v)) for (k, v) in kwargs.items())
+            ))
 
     @cached_property
     def _last_commit(self):
@@ -869,7 +1111,7 @@ added selection range traits to make it possible for users to replace
 
     @cached_property
     def last_commit(self):
-        return self.log_iter().next()
+        return next(self.log_iter())
 
     # @cached_property
     def search_upwards(self, fpath=None, repodirname='.svn', upwards={}):
@@ -936,27 +1178,10 @@ REPO_REGISTRY = [
 ]
 REPO_PREFIXES = dict((r.prefix, r) for r in REPO_REGISTRY)
 REPO_REGEX = (
-    '|'.join('/%s' % r.prefix for r in REPO_REGISTRY)).replace('.', '\.')
-
-
-def listdir_find_repos(where):
-    stack = deque([(convert_path(where), '')])
-    while stack:
-        where, prefix = stack.pop()
-        try:
-            for name in sorted(os.listdir(where), reverse=True):
-                fn = os.path.join(where, name)
-                if os.path.isdir(fn):
-                    if name in REPO_PREFIXES:
-                        # yield name[1:], fn.rstrip(name)[:-1] # abspath
-                        repo = REPO_PREFIXES[name](fn.rstrip(name)[:-1])
-                        yield repo
-                    stack.append((fn, prefix + name + '/'))
-        except OSError as e:
-            if e.errno == errno.EACCES:
-                log.error("Skipping: %s", e)
-            else:
-                raise
+    '|'.join('/%s' % r.prefix for r in REPO_REGISTRY)).replace('.', r'\.')
+# metadata directories which are never descended into
+VCS_METADATA_DIRS = frozenset(
+    r.prefix for r in REPO_REGISTRY + [SvnRepository])
 
 
 def find_find_repos(where, ignore_error=True):
@@ -975,6 +1200,7 @@ def find_find_repos(where, ignore_error=True):
                " -regex '.*(%s)$'" % REPO_REGEX)
     cmd = ' '.join(cmd)
     log.debug("find_find_repos(%r) = %s" % (where, cmd))
+    import subprocess
     kwargs = {
         'shell': True,
         'cwd': where,
@@ -998,11 +1224,265 @@ def find_find_repos(where, ignore_error=True):
         # yield repo
 
 
-def find_unique_repos(where):
+class _DirEntry(object):
+
+    """
+    A minimal ``os.DirEntry`` (for Pythons without ``os.scandir``)
+    """
+
+    def __init__(self, dirpath, name):
+        self.name = name
+        self.path = os.path.join(dirpath, name)
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks:
+            return os.stat(self.path)
+        if self._lstat is None:
+            self._lstat = os.lstat(self.path)
+        return self._lstat
+
+    def _is(self, test, follow_symlinks):
+        try:
+            return test(self.stat(follow_symlinks=follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_dir(self, follow_symlinks=True):
+        return self._is(stat.S_ISDIR, follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self._is(stat.S_ISREG, follow_symlinks)
+
+
+def _scandir(path):
+    if scandir is not None:
+        return list(scandir(path))
+    return [_DirEntry(path, name) for name in os.listdir(path)]
+
+
+def list_repo_dir(dirpath):
+    """
+    List a directory for repository discovery
+
+    Args:
+        dirpath (str): directory path
+    Returns:
+        tuple: (sorted repository prefixes found in ``dirpath`` (e.g.
+        ``['.git']``), sorted names of the subdirectories to scan (not
+        symlinks or VCS metadata directories))
+    Raises:
+        OSError: if ``dirpath`` cannot be listed
+    """
+    prefixes, subdirs = [], []
+    for entry in _scandir(dirpath):
+        name = entry.name
+        if name in VCS_METADATA_DIRS:
+            if name in REPO_PREFIXES and (
+                    entry.is_dir(follow_symlinks=False) or
+                    (name == GitRepository.prefix and
+                     entry.is_file(follow_symlinks=False))):
+                prefixes.append(name)
+        elif entry.is_dir(follow_symlinks=False):
+            subdirs.append(name)
+    return sorted(prefixes), sorted(subdirs)
+
+
+class DiscoveryIndex(object):
+
+    """
+    A persistent index of directory listings for repository discovery
+
+    Each listed directory is stored with its mtime, repository prefixes
+    and subdirectories. A directory's mtime changes when entries are
+    added to, removed from or renamed in it, so a later scan only
+    re-lists the directories whose mtime changed (the others are only
+    ``stat``-ed).
+
+    The index is a JSON file::
+
+        {"version": 1,
+         "dirs": {"/home/user/src": [1400000000.0, [".git"], ["docs"]]}}
+
+    Args:
+        path (str): path to the JSON index file
+        rescan (bool): re-list every directory (and rewrite the index)
+    """
+
+    VERSION = 1
+    # an mtime this close to the time of listing may be updated again
+    # within the filesystem's timestamp granularity: not trusted
+    RACY_SECONDS = 2
+
+    def __init__(self, path, rescan=False):
+        self.path = os.path.expanduser(path)
+        self.rescan = rescan
+        self.dirs = {}
+        self.listed = {}
+        self.completed = []
+        self.relisted = 0
+        self.load()
+
+    def load(self):
+        """
+        Read the index file (a missing or invalid index is empty)
+        """
+        import json
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == self.VERSION:
+            self.dirs = data.get('dirs') or {}
+
+    def list_dir(self, dirpath):
+        """
+        Args:
+            dirpath (str): directory path
+        Returns:
+            tuple: (repository prefixes, subdirectories) of ``dirpath``,
+            from the index if its mtime is unchanged
+            (see :func:`list_repo_dir`)
+        Raises:
+            OSError: if ``dirpath`` cannot be listed
+        """
+        import time
+        mtime = os.stat(dirpath).st_mtime
+        cached = self.dirs.get(dirpath)
+        if not self.rescan and cached is not None and cached[0] == mtime:
+            self.listed[dirpath] = cached
+            return cached[1], cached[2]
+        prefixes, subdirs = list_repo_dir(dirpath)
+        self.relisted += 1
+        if time.time() - mtime < self.RACY_SECONDS:
+            mtime = None
+        self.listed[dirpath] = [mtime, prefixes, subdirs]
+        return prefixes, subdirs
+
+    def walked(self, where):
+        """
+        Mark a complete walk of ``where`` (the directories below it which
+        were not visited are dropped from the index when it is saved)
+        """
+        self.completed.append(where)
+
+    def save(self):
+        """
+        Write the index file (atomically)
+        """
+        import json
+        import tempfile
+
+        def walked(dirpath):
+            return any(
+                dirpath == where or
+                dirpath.startswith(where.rstrip(os.path.sep) + os.path.sep)
+                for where in self.completed)
+        dirs = dict(
+            (dirpath, value) for dirpath, value in self.dirs.items()
+            if not walked(dirpath))
+        dirs.update(self.listed)
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.pyrpo-index.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': self.VERSION, 'dirs': dirs}, f,
+                          sort_keys=True, separators=(',', ':'))
+            os.rename(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+        self.dirs = dirs
+
+
+def scandir_find_repos(where, exclude=(), max_depth=None,
+                       one_file_system=False, index=None):
+    """
+    Find repositories with ``os.scandir``
+
+    Directories are listed once, with the entry types from the directory
+    listing (no ``stat`` per entry); VCS metadata directories (``.git``,
+    ``.hg``, ...) are not descended into, and symlinks are not followed.
+    Repositories are yielded as soon as they are found, in sorted
+    depth-first order.
+
+    Args:
+        where (str): path to scan
+        exclude (iterable): glob (or ``re:``) patterns of directories
+            not to descend into, matched against the directory name, or
+            against the path relative to ``where`` if they contain ``/``
+            (e.g. ``node_modules``, ``build/*``)
+        max_depth (int): maximum depth of a repository below ``where``
+            (0: only ``where`` itself; None: no limit)
+        one_file_system (bool): do not descend into directories on
+            other filesystems (as ``find -xdev``)
+        index (DiscoveryIndex): index of the directory listings of
+            previous scans (only changed directories are re-listed)
+    Yields:
+        Repository: repositories (``.git`` files of worktrees and
+        submodules included)
+    """
+    exclude = list(exclude or ())
+    names = PatternSet(p for p in exclude if '/' not in p)
+    paths = PatternSet(p for p in exclude if '/' in p)
+    where = os.path.abspath(os.path.expanduser(where))
+    device = os.stat(where).st_dev if one_file_system else None
+    list_dir = index.list_dir if index is not None else list_repo_dir
+    stack = [(where, '', 0)]
+    while stack:
+        dirpath, relpath, depth = stack.pop()
+        try:
+            prefixes, subdirs = list_dir(dirpath)
+        except OSError as e:
+            if e.errno in (errno.EACCES, errno.ENOENT, errno.ENOTDIR):
+                log.error("Skipping: %s", e)
+                continue
+            raise
+        for prefix in prefixes:
+            yield REPO_PREFIXES[prefix](dirpath)
+        if max_depth is not None and depth >= max_depth:
+            continue
+        scan = []
+        for name in subdirs:
+            subpath = relpath + '/' + name if relpath else name
+            if names.match(name) or paths.match(subpath):
+                continue
+            path = os.path.join(dirpath, name)
+            if device is not None:
+                try:
+                    if os.lstat(path).st_dev != device:
+                        continue
+                except OSError:
+                    continue
+            scan.append((path, subpath, depth + 1))
+        stack.extend(reversed(scan))
+    if index is not None:
+        index.walked(where)
+
+
+def find_unique_repos(where, exclude=(), max_depth=None,
+                      one_file_system=False, index=None):
+    """
+    Find the repositories under ``where``, once each
+
+    Args:
+        where (str): path to scan
+        exclude (iterable): patterns of directories to skip
+        max_depth (int): maximum repository depth (None: no limit)
+        one_file_system (bool): stay on the filesystem of ``where``
+        index (DiscoveryIndex): index of previous scans
+    Yields:
+        Repository: repositories, as they are found
+        (see :func:`scandir_find_repos`)
+    """
     repos = Dict()
     path_uuids = Dict()
     log.debug("find_unique_repos(%r)" % where)
-    for repo in find_find_repos(where):
+    for repo in scandir_find_repos(where, exclude=exclude,
+                                   max_depth=max_depth,
+                                   one_file_system=one_file_system,
+                                   index=index):
         # log.debug(repo)
         repo2 = (hasattr(repo, 'search_upwards')
                  and repo.search_upwards(upwards=path_uuids))
@@ -1033,23 +1513,87 @@ REPORT_TYPES = dict(
 )
 
 
-def do_repo_report(repos, report='full', output=sys.stdout, *args, **kwargs):
-    for i, repo in enumerate(repos):
-        log.debug(str((i, repo.origin_report().next())))
-        try:
-            if repo is not None:
-                reportfunc = REPORT_TYPES.get(report)
-                if reportfunc is None:
-                    raise Exception("Unrecognized report type: %r (%s)" %
-                                    (report, ', '.join(REPORT_TYPES.keys())))
-                for l in reportfunc(repo, *args, **kwargs):
-                    print(l, file=output)
-        except Exception as e:
-            log.error(repo)
-            log.error(report)
-            log.error(e)
-            raise
+def _repo_report_lines(repo, reportfunc, *args, **kwargs):
+    """
+    Run one report for one repository
 
+    Returns:
+        tuple: (lines, traceback); lines is None if the report failed,
+        and traceback is the formatted traceback of the exception
+    """
+    try:
+        return list(reportfunc(repo, *args, **kwargs)), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _iter_repo_reports(repos, reportfunc, jobs, *args, **kwargs):
+    """
+    Yield (repo, (lines, traceback)) in discovery order, running up to
+    ``jobs`` reports at a time in a thread pool
+
+    Each report is yielded as soon as the reports of the repositories
+    before it are, while discovery continues. At most ``2 * jobs``
+    reports are queued ahead of the next repository to print, so that a
+    long scan is not read ahead all at once.
+    """
+    if jobs <= 1:
+        for repo in repos:
+            yield repo, _repo_report_lines(repo, reportfunc, *args, **kwargs)
+        return
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(jobs)
+    pending = deque()
+    try:
+        for repo in repos:
+            pending.append((repo, pool.apply_async(
+                _repo_report_lines, (repo, reportfunc) + args, kwargs)))
+            while pending and (len(pending) >= 2 * jobs or
+                               pending[0][1].ready()):
+                repo, result = pending.popleft()
+                yield repo, result.get()
+        while pending:
+            repo, result = pending.popleft()
+            yield repo, result.get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def do_repo_report(repos, report='full', output=sys.stdout, *args, **kwargs):
+    """
+    Print a report for each repository
+
+    Args:
+        repos (iterable): Repository instances (None is skipped)
+        report (str): report type (one of :data:`REPORT_TYPES`)
+        output (file): file to print the reports to
+        jobs (int): keyword only: number of reports to run concurrently
+            (in threads); reports are printed in the order of ``repos``
+            either way
+        args, kwargs: passed to the report function
+    Yields:
+        Repository: each repository, once its report is printed
+    Raises:
+        Exception: if ``report`` is not a known report type
+
+    A report which fails is logged (with its traceback) and skipped,
+    without aborting the reports of the other repositories.
+    """
+    jobs = kwargs.pop('jobs', 1)
+    reportfunc = REPORT_TYPES.get(report)
+    if reportfunc is None:
+        raise Exception("Unrecognized report type: %r (%s)" %
+                        (report, ', '.join(REPORT_TYPES.keys())))
+    repos = (repo for repo in repos if repo is not None)
+    reports = _iter_repo_reports(repos, reportfunc, jobs, *args, **kwargs)
+    for i, (repo, (lines, error)) in enumerate(reports):
+        log.debug(str((i, repo)))
+        if error is not None:
+            log.error("%s: %s report failed:\n%s" % (repo, report, error))
+        else:
+            for l in lines:
+                print(l, file=output)
         yield repo
 
 
@@ -1106,6 +1650,31 @@ def main():
                    default=[],
                    help='Path(s) to scan for repositories')
 
+    prs.add_option('--exclude',
+                   dest='exclude',
+                   action='append',
+                   default=[],
+                   help=('Glob (or re:) pattern of directories not to scan'
+                         ' (e.g. node_modules)'))
+    prs.add_option('--max-depth',
+                   dest='max_depth',
+                   action='store',
+                   type='int',
+                   help='Maximum depth of repositories below each path')
+    prs.add_option('-x', '--one-file-system',
+                   dest='one_file_system',
+                   action='store_true',
+                   help='Do not scan directories on other filesystems')
+    prs.add_option('--index',
+                   dest='index',
+                   action='store',
+                   help=('JSON index of directory listings, updated on each'
+                         ' scan (only changed directories are re-listed)'))
+    prs.add_option('--rescan',
+                   dest='rescan',
+                   action='store_true',
+                   help='Re-list every directory (and rewrite --index)')
+
     prs.add_option('-r', '--report',
                    dest='reports',
                    action='append',
@@ -1116,6 +1685,13 @@ def main():
                    action='store_true',
                    help='Write a thg-reporegistry.xml file to stdout')
 
+    prs.add_option('-j', '--jobs',
+                   dest='jobs',
+                   action='store',
+                   type='int',
+                   default=1,
+                   help='Number of repository reports to run in parallel')
+
     prs.add_option('--template',
                    dest='report_template',
                    action='store',
@@ -1129,6 +1705,8 @@ def main():
                    action='store_true',)
 
     (opts, args) = prs.parse_args()
+    if opts.rescan and not opts.index:
+        prs.error("--rescan requires --index")
 
     if not opts.quiet:
         _format = None
@@ -1147,6 +1725,17 @@ def main():
     if not opts.scan:
         opts.scan = ['.']
 
+    index = None
+    if opts.index:
+        index = DiscoveryIndex(opts.index, rescan=opts.rescan)
+
+    def find_repos(where):
+        return find_unique_repos(where,
+                                 exclude=opts.exclude,
+                                 max_depth=opts.max_depth,
+                                 one_file_system=opts.one_file_system,
+                                 index=index)
+
     if opts.scan:
         # if not opts.reports:
         #     opts.reports = ['pip']
@@ -1159,7 +1748,7 @@ def main():
             # for _path in opts.scan:
             #     repos.extend(find_unique_repos(_path))
             log.debug("SCANNING PATHS: %s" % opts.scan)
-            repos = chain(*imap(find_unique_repos, opts.scan))
+            repos = chain(*imap(find_repos, opts.scan))
 
             if opts.reports and opts.thg_report:
                 repos = list(repos)
@@ -1167,7 +1756,8 @@ def main():
 
             if opts.reports:
                 for report in opts.reports:
-                    list(do_repo_report(repos, report=report))
+                    list(do_repo_report(repos, report=report,
+                                        jobs=opts.jobs))
             if opts.thg_report:
                 import sys
                 do_tortoisehg_report(repos, output=sys.stdout)
@@ -1175,8 +1765,14 @@ def main():
         else:
             opts.scan = '.'
             list(do_repo_report(
-                find_unique_repos(opts.scan),
-                report='sh'))
+                find_repos(opts.scan),
+                report='sh',
+                jobs=opts.jobs))
+
+    if index is not None:
+        index.save()
+        log.debug("index %s: %d directories re-listed" % (
+            opts.index, index.relisted))
 
 if __name__ == "__main__":
     main()
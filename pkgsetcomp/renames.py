@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Match renamed packages across releases
+
+Comparing a host with a manifest from another release lists renamed
+packages twice: ``libfoo1`` as uninstalled and ``libfoo2`` as also
+installed. Likely renames are paired by n-gram similarity:
+
+* the new names are indexed once in an n-gram inverted index
+  (n-gram -> ids of the names containing it)
+* each old name only scores the new names it shares one of its rarest
+  n-grams with (prefix filtering: a name sharing none of them cannot
+  reach the threshold), so common n-grams such as ``lib`` do not make
+  every name a candidate
+* candidates are scored with the Dice coefficient of the two n-gram
+  sets, instead of computing the edit distance of every pair
+* pairs scoring at least ``threshold`` are matched greedily, best
+  score first, so that each name is matched at most once
+
+.. code:: python
+
+    >>> match_renames(['libfoo1', 'bar'], ['libfoo2', 'zsh'])
+    [Rename(old='libfoo1', new='libfoo2', score=0.714...)]
+
+"""
+
+import collections
+import math
+
+NGRAM = 3
+DEFAULT_THRESHOLD = 0.5
+
+Rename = collections.namedtuple('Rename', ('old', 'new', 'score'))
+
+
+def ngrams(name, n=NGRAM):
+    """
+    Args:
+        name (str): package name
+        n (int): n-gram length
+    Returns:
+        frozenset: n-grams of ``name``, padded with ``^`` and ``$`` so
+        that prefixes and suffixes count
+    """
+    padded = '^%s$' % name
+    if len(padded) <= n:
+        return frozenset((padded,))
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class NgramIndex(object):
+
+    """
+    An n-gram inverted index of package names
+
+    Args:
+        names (iterable): package names to index
+        n (int): n-gram length
+    """
+
+    def __init__(self, names=(), n=NGRAM):
+        self.n = n
+        self.names = []
+        self.grams = []
+        self.postings = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """
+        Args:
+            name (str): package name to index
+        """
+        grams = ngrams(name, self.n)
+        i = len(self.names)
+        self.names.append(name)
+        self.grams.append(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, name, threshold=DEFAULT_THRESHOLD):
+        """
+        Find the indexed names similar to ``name``
+
+        Args:
+            name (str): package name
+            threshold (float): minimum Dice coefficient (0 to 1)
+        Returns:
+            list: (score, indexed name) tuples, best score first
+        """
+        grams = ngrams(name, self.n)
+        postings = self.postings
+        # a name sharing c of the m n-grams of ``name`` scores at most
+        # 2c / (m + c), so it must share c >= threshold * m / (2 - threshold)
+        min_shared = max(1, int(math.ceil(
+            threshold * len(grams) / (2.0 - threshold) - 1e-9)))
+        rarest = sorted(grams, key=lambda gram: (
+            len(postings.get(gram, ())), gram))
+        candidates = set()
+        for gram in rarest[:len(grams) - min_shared + 1]:
+            candidates.update(postings.get(gram, ()))
+        results = []
+        for i in candidates:
+            other = self.grams[i]
+            score = 2.0 * len(grams & other) / (len(grams) + len(other))
+            if score >= threshold:
+                results.append((score, self.names[i]))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return results
+
+
+def match_renames(old, new, threshold=DEFAULT_THRESHOLD, n=NGRAM):
+    """
+    Pair names which are likely renames of each other, one to one
+
+    Args:
+        old (iterable): names found only in the old package list
+            (e.g. ``PkgComparison.uninstalled``)
+        new (iterable): names found only in the new package list
+            (e.g. ``PkgComparison.also_installed``)
+        threshold (float): minimum Dice coefficient (0 to 1)
+        n (int): n-gram length
+    Returns:
+        list: :class:`Rename` tuples, sorted by old name
+    """
+    index = NgramIndex(new, n)
+    candidates = []
+    for name in old:
+        for score, other in index.search(name, threshold):
+            if other != name:
+                candidates.append((-score, name, other))
+    candidates.sort()
+    matched_old, matched_new = set(), set()
+    renames = []
+    for score, name, other in candidates:
+        if name in matched_old or other in matched_new:
+            continue
+        matched_old.add(name)
+        matched_new.add(other)
+        renames.append(Rename(name, other, -score))
+    renames.sort()
+    return renames
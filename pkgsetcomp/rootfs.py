@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Read package databases out of root filesystems
+
+A root may be:
+
+* a directory (an unpacked chroot or container rootfs)
+* a ``.tar`` / ``.tar.gz`` / ``.tar.bz2`` rootfs or image layer tarball
+* a ``docker save`` image tarball (``manifest.json`` + layer tarballs)
+
+Tarballs are read member by member, stopping as soon as every requested
+file has been found; nothing is extracted to disk. Image layers are
+searched from the topmost layer down, honoring ``.wh.`` whiteouts.
+"""
+
+import os
+import posixpath
+
+DPKG_STATUS = 'var/lib/dpkg/status'
+APT_EXTENDED_STATES = 'var/lib/apt/extended_states'
+IMAGE_MANIFEST = 'manifest.json'
+WHITEOUT_PREFIX = '.wh.'
+
+
+def _decode(data):
+    if str is bytes:
+        return data
+    return data.decode('utf-8', 'replace')
+
+
+def _normpath(name):
+    """normalize a tar member name (``./var/lib/..`` -> ``var/lib/..``)"""
+    name = posixpath.normpath(name.lstrip('/'))
+    return '' if name == '.' else name
+
+
+def _whiteout(path):
+    dirname, basename = posixpath.split(path)
+    return posixpath.join(dirname, WHITEOUT_PREFIX + basename)
+
+
+def _read_members(tar, paths, found):
+    """
+    Read ``paths`` from an open tarfile, in member order, into ``found``
+    (a whiteout records None); stop once every path has been found
+
+    Returns:
+        bool: whether the tarball has an image ``manifest.json``
+    """
+    wanted = dict((path, path) for path in paths if path not in found)
+    wanted.update((_whiteout(path), path) for path in list(wanted))
+    is_image = False
+    for member in tar:
+        name = _normpath(member.name)
+        if name == IMAGE_MANIFEST:
+            is_image = True
+            continue
+        path = wanted.pop(name, None)
+        if path is None or path in found:
+            continue
+        if name != path:
+            found[path] = None
+        elif member.isfile():
+            found[path] = _decode(tar.extractfile(member).read())
+        if all(path in found for path in paths):
+            break
+    return is_image
+
+
+def _read_image(tar, paths, found):
+    """
+    Read ``paths`` from the layers of a ``docker save`` image tarball,
+    topmost layer first
+    """
+    import json
+    import tarfile
+    manifest = json.loads(_decode(tar.extractfile(IMAGE_MANIFEST).read()))
+    for layer in reversed(manifest[0]['Layers']):
+        layer_tar = tarfile.open(fileobj=tar.extractfile(layer))
+        try:
+            _read_members(layer_tar, paths, found)
+        finally:
+            layer_tar.close()
+        if all(path in found for path in paths):
+            break
+
+
+def read_files(root, paths):
+    """
+    Read text files from a root filesystem directory or tarball
+
+    Args:
+        root (str): rootfs directory, rootfs/layer tarball, or
+            ``docker save`` image tarball
+        paths (iterable): paths relative to the root
+            (e.g. ``var/lib/dpkg/status``)
+    Returns:
+        dict: path -> file contents (str), or None if not found
+    """
+    paths = [_normpath(path) for path in paths]
+    found = {}
+    if os.path.isdir(root):
+        for path in paths:
+            filename = os.path.join(root, *path.split('/'))
+            if os.path.isfile(filename):
+                with open(filename, 'rb') as f:
+                    found[path] = _decode(f.read())
+    else:
+        import tarfile
+        tar = tarfile.open(root)
+        try:
+            if _read_members(tar, paths, found):
+                _read_image(tar, paths, found)
+        finally:
+            tar.close()
+    return dict((path, found.get(path)) for path in paths)
+
+
+def read_dpkg_database(root):
+    """
+    Read the dpkg status and apt extended_states files from a root
+
+    Args:
+        root (str): rootfs directory or tarball (see :func:`read_files`)
+    Returns:
+        tuple: (status, extended_states) lists of lines
+    Raises:
+        IOError: if the root has no dpkg status file
+    """
+    files = read_files(root, (DPKG_STATUS, APT_EXTENDED_STATES))
+    if files[DPKG_STATUS] is None:
+        raise IOError("No %s found in %r" % (DPKG_STATUS, root))
+    return (files[DPKG_STATUS].splitlines(True),
+            (files[APT_EXTENDED_STATES] or '').splitlines(True))
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+External-memory set algebra over package lists
+
+Package lists are streamed, never loaded whole:
+
+* sorted inputs (e.g. the ``sort -u`` output of ``get_package_lists``)
+  are read line by line
+* unsorted inputs are cut into runs of at most ``run_size`` names,
+  which are sorted in memory and spilled to temporary files
+
+The sorted streams are then combined with one k-way merge, so memory
+use is bounded by ``run_size`` (plus one name per open run), regardless
+of the size of the lists.
+
+Input files may be plain package lists (the first whitespace-separated
+field of each line, as in a ``.manifest``) or deb822 files with
+``Package:`` fields (an APT ``Packages`` index or a dpkg status file).
+
+.. code:: bash
+
+    pkgsetcomp union a.pkgs.txt b.pkgs.txt c.pkgs.txt
+    pkgsetcomp difference manifest.pkgs.txt installed.pkgs.txt
+
+"""
+
+import heapq
+import itertools
+import operator
+import os
+import sys
+
+SETOPS = ('union', 'intersection', 'difference', 'symmetric_difference')
+DEFAULT_RUN_SIZE = 100000
+MAX_MERGE_FANIN = 64
+
+
+def iter_names(lines):
+    """
+    Read package names from the lines of a package list or deb822 file
+
+    Args:
+        lines (iterable): lines of a file
+    Yields:
+        str: package names, in file order
+    """
+    deb822 = None
+    for line in lines:
+        if deb822 is None:
+            if not line.strip():
+                continue
+            deb822 = line.startswith('Package:')
+        if deb822:
+            if line.startswith('Package:'):
+                yield line[8:].strip()
+        else:
+            fields = line.split(None, 1)
+            if fields:
+                yield fields[0]
+
+
+def iter_file_names(filename):
+    """
+    Args:
+        filename (str): path to a package list (``-`` for stdin)
+    Yields:
+        str: package names, in file order
+    """
+    if filename == '-':
+        for name in iter_names(sys.stdin):
+            yield name
+        return
+    with open(filename) as f:
+        for name in iter_names(f):
+            yield name
+
+
+def unique_sorted(names):
+    """
+    Drop consecutive duplicates from a sorted stream, checking its order
+
+    Args:
+        names (iterable): sorted names
+    Yields:
+        str: sorted, unique names
+    Raises:
+        ValueError: if ``names`` are not sorted
+    """
+    last = None
+    for name in names:
+        if last is not None:
+            if name == last:
+                continue
+            if name < last:
+                raise ValueError("Input is not sorted: %r < %r"
+                                 % (name, last))
+        yield name
+        last = name
+
+
+def is_sorted(filename):
+    """
+    Args:
+        filename (str): path to a package list
+    Returns:
+        bool: whether the names in ``filename`` are in sorted order
+    """
+    names = iter_file_names(filename)
+    last = next(names, None)
+    for name in names:
+        if name < last:
+            return False
+        last = name
+    return True
+
+
+def _write_run(names, tmpdir):
+    import tempfile
+    fd, path = tempfile.mkstemp(prefix='run_', suffix='.txt', dir=tmpdir)
+    with os.fdopen(fd, 'w') as f:
+        for name in names:
+            f.write(name)
+            f.write('\n')
+    return path
+
+
+def _iter_run(path):
+    with open(path) as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def external_sort(names, run_size=DEFAULT_RUN_SIZE, tmpdir=None):
+    """
+    Sort and de-duplicate a stream of names in bounded memory
+
+    Args:
+        names (iterable): names, in any order
+        run_size (int): maximum number of names to hold in memory
+        tmpdir (str): directory in which to spill sorted runs
+    Yields:
+        str: sorted, unique names
+    """
+    import shutil
+    import tempfile
+    runs = []
+    workdir = None
+    try:
+        names = iter(names)
+        while True:
+            chunk = list(itertools.islice(names, run_size))
+            if not chunk:
+                break
+            exhausted = len(chunk) < run_size
+            run = sorted(set(chunk))
+            del chunk
+            if not runs and exhausted:
+                # the whole input fit in memory
+                for name in run:
+                    yield name
+                return
+            if workdir is None:
+                workdir = tempfile.mkdtemp(prefix='pkgsetcomp_',
+                                           dir=tmpdir)
+            runs.append(_write_run(run, workdir))
+            del run
+        while len(runs) > MAX_MERGE_FANIN:
+            merged = [
+                _write_run(
+                    unique_sorted(heapq.merge(*map(_iter_run, group))),
+                    workdir)
+                for group in (runs[i:i + MAX_MERGE_FANIN]
+                              for i in range(0, len(runs), MAX_MERGE_FANIN))]
+            for path in runs:
+                os.remove(path)
+            runs = merged
+        for name in unique_sorted(heapq.merge(*map(_iter_run, runs))):
+            yield name
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir)
+
+
+def _tag(names, i):
+    for name in names:
+        yield name, i
+
+
+def setop(op, inputs):
+    """
+    Apply a set operation to N sorted, unique streams of names
+
+    ``difference`` is the names of the first input not found in any
+    other; ``symmetric_difference`` is the names found in an odd number
+    of inputs (as in ``a ^ b ^ c``).
+
+    Args:
+        op (str): one of :data:`SETOPS`
+        inputs (list): iterables of sorted, unique names
+    Yields:
+        str: sorted names of the result
+    """
+    if op not in SETOPS:
+        raise ValueError("Unrecognized set operation: %r (%s)"
+                         % (op, ', '.join(SETOPS)))
+    count = len(inputs)
+    merged = heapq.merge(*(_tag(names, i) for i, names in
+                           enumerate(inputs)))
+    for name, group in itertools.groupby(merged, operator.itemgetter(0)):
+        members = [i for _, i in group]
+        if op == 'union':
+            keep = True
+        elif op == 'intersection':
+            keep = len(members) == count
+        elif op == 'difference':
+            keep = members == [0]
+        else:
+            keep = len(members) % 2 == 1
+        if keep:
+            yield name
+
+
+def setop_files(op, filenames, presorted=False,
+                run_size=DEFAULT_RUN_SIZE, tmpdir=None):
+    """
+    Apply a set operation to package list files
+
+    Args:
+        op (str): one of :data:`SETOPS`
+        filenames (list): paths to package lists (``-`` for stdin)
+        presorted (bool): if true, do not check whether inputs are sorted
+            (unsorted input then raises ValueError)
+        run_size (int): maximum number of names to sort in memory
+        tmpdir (str): directory in which to spill sorted runs
+    Yields:
+        str: sorted names of the result
+    """
+    inputs = []
+    for filename in filenames:
+        names = iter_file_names(filename)
+        if presorted or (filename != '-' and is_sorted(filename)):
+            inputs.append(unique_sorted(names))
+        else:
+            inputs.append(external_sort(names, run_size, tmpdir))
+    return setop(op, inputs)
+
+
+def main(argv=None):
+    """
+    pkgsetcomp <setop> main method (CLI)
+    """
+    import optparse
+
+    prs = optparse.OptionParser(
+        usage="%%prog {%s} [-o <path>] <path> [<path> ...]"
+        % '|'.join(SETOPS))
+
+    prs.add_option('-o', '--output',
+                   dest='output',
+                   action='store',
+                   help="Path to which to write the result (default: stdout)")
+    prs.add_option('-S', '--sorted',
+                   dest='presorted',
+                   action='store_true',
+                   help="Inputs are already sorted (skip the check)")
+    prs.add_option('--run-size',
+                   dest='run_size',
+                   action='store',
+                   type='int',
+                   default=DEFAULT_RUN_SIZE,
+                   help="Maximum number of names to sort in memory")
+    prs.add_option('--tmpdir',
+                   dest='tmpdir',
+                   action='store',
+                   help="Directory in which to spill sorted runs")
+
+    (opts, args) = prs.parse_args(argv)
+    if len(args) < 2 or args[0] not in SETOPS:
+        prs.error("expected a set operation and at least one path")
+
+    names = setop_files(args[0], args[1:], presorted=opts.presorted,
+                        run_size=opts.run_size, tmpdir=opts.tmpdir)
+    output = open(opts.output, 'w') if opts.output else sys.stdout
+    try:
+        for name in names:
+            output.write(name)
+            output.write('\n')
+    finally:
+        if opts.output:
+            output.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Split VCS log output into records and fields
+
+These are the inner loops of :meth:`pkgsetcomp.pyrpo.Repository.log_iter`:
+
+* separators are literal strings, split with ``str.split`` (instead
+  of compiling a regular expression for each call and searching for
+  each match)
+* a record is split into a fixed number of fields in one call,
+  padded with None (instead of zipping with ``izip_longest``)
+* :func:`parse_records` splits many records at once into tuples, and
+  :func:`split_columns` into one tuple per field
+
+``python tests/bench_splitting.py`` compares these with the previous
+implementation.
+
+.. code:: python
+
+    >>> split_fields('2014-05-21 ||| abc123 ||| wes', ' ||| ', 4)
+    ('2014-05-21', 'abc123', 'wes', None)
+    >>> split_columns(['a|1', 'b|2', 'c'], '|', 2)
+    [('a', 'b', 'c'), ('1', '2', None)]
+
+"""
+
+
+def itersplit(s, sep=None):
+    """
+    Split a string
+
+    Args:
+        s (str): string to split
+        sep (str): literal separator (None: runs of whitespace, as
+            ``str.split()``)
+    Returns:
+        iterator: the parts of ``s`` (``s`` itself if it is empty or None)
+    """
+    if not s:
+        return iter((s,))
+    return iter(s.split(sep))
+
+
+def split_fields(record, sep, nfields):
+    """
+    Split a record into a fixed number of fields
+
+    Args:
+        record (str): record to split (an empty record or None is one
+            empty field, as with :func:`itersplit`)
+        sep (str): literal field separator
+        nfields (int): number of fields
+    Returns:
+        tuple: fields, padded with None if ``record`` has fewer (a record
+        with more fields is returned unchanged)
+    """
+    fields = record.split(sep) if record else [record]
+    missing = nfields - len(fields)
+    if missing > 0:
+        fields.extend((None,) * missing)
+    return tuple(fields)
+
+
+def parse_records(records, sep, nfields, strip=True):
+    """
+    Split records into fields
+
+    Args:
+        records (iterable): records (empty records are skipped)
+        sep (str): literal field separator
+        nfields (int): number of fields per record
+        strip (bool): strip whitespace around each record first
+    Returns:
+        list: one tuple of ``nfields`` fields per record
+        (see :func:`split_fields`)
+    """
+    if strip:
+        records = (record.strip() for record in records)
+    return [split_fields(record, sep, nfields)
+            for record in records if record]
+
+
+def split_columns(records, sep, nfields, strip=True):
+    """
+    Split records into columns of fields
+
+    Args:
+        records (iterable): records (empty records are skipped)
+        sep (str): literal field separator
+        nfields (int): number of fields per record
+        strip (bool): strip whitespace around each record first
+    Returns:
+        list: ``nfields`` tuples, one per field, of the values of each
+        record (extra fields are dropped)
+    """
+    rows = parse_records(records, sep, nfields, strip=strip)
+    if not rows:
+        return [()] * nfields
+    return list(zip(*rows))[:nfields]
+
+
+def itersplit_to_fields(_str,
+                        fsep=' ||| ',
+                        revtuple=None,
+                        fields=[],
+                        preparse=None):
+    """
+    Split one record into fields
+
+    Args:
+        _str (str): record
+        fsep (str): field separator
+        revtuple (type): namedtuple to return
+        fields (sequence): field names (if there is no ``revtuple``)
+        preparse (callable): function applied to ``_str`` first
+    Returns:
+        tuple: ``revtuple`` of the fields, or (field name, value) tuples
+    """
+    if preparse:
+        _str = preparse(_str)
+    if revtuple is not None:
+        return revtuple(*split_fields(_str, fsep, len(revtuple._fields)))
+    values = split_fields(_str, fsep, len(fields))
+    names = tuple(fields) + (None,) * (len(values) - len(fields))
+    return tuple(zip(names, values))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Count the processes launched to read the metadata of one git repository
+
+Compares the previous per-property shell commands with
+:meth:`pkgsetcomp.pyrpo.GitRepository.collect`::
+
+    python tests/bench_git_processes.py [-n REPEAT] [path/to/git/repo]
+
+A ``shell=True`` command counts as two processes (``/bin/sh`` and git).
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pkgsetcomp import pyrpo  # noqa
+
+# status, remote_url, current_id, branch and last_commit, as each cached
+# property used to run them (one shell per command)
+SHELL_COMMANDS = (
+    'git status -s',
+    'git config remote.origin.url',
+    'git rev-parse --short HEAD',
+    'git branch',
+    'git log -n1 --format=%r' % pyrpo.GitRepository.template,
+)
+
+
+class PopenCounter(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.processes = 0
+
+    def __enter__(self):
+        self.popen = subprocess.Popen
+
+        def popen(*args, **kwargs):
+            self.calls += 1
+            self.processes += 2 if kwargs.get('shell') else 1
+            return self.popen(*args, **kwargs)
+        subprocess.Popen = popen
+        return self
+
+    def __exit__(self, *exc_info):
+        subprocess.Popen = self.popen
+
+
+def shell_commands(path):
+    return [pyrpo.sh(cmd, cwd=path, ignore_error=True)
+            for cmd in SHELL_COMMANDS]
+
+
+def collect(path):
+    repo = pyrpo.GitRepository(path)
+    return (repo.status, repo.remote_url, repo.current_id, repo.branch,
+            repo.last_commit)
+
+
+def make_repo():
+    path = tempfile.mkdtemp()
+    subprocess.check_call(['git', 'init', '-q', path])
+    with open(os.path.join(path, 'README'), 'w') as f:
+        f.write('README\n')
+    for args in (('add', 'README'),
+                 ('-c', 'user.name=bench', '-c', 'user.email=bench@localhost',
+                  'commit', '-q', '-m', 'Initial commit'),
+                 ('config', 'remote.origin.url', 'https://example.org/r')):
+        subprocess.check_call(('git',) + args, cwd=path)
+    return path
+
+
+def main(argv=None):
+    import optparse
+    prs = optparse.OptionParser(usage="%prog [-n REPEAT] [path]")
+    prs.add_option('-n', dest='repeat', type='int', default=20)
+    (opts, args) = prs.parse_args(argv)
+    path = args[0] if args else make_repo()
+    try:
+        print("%-16s %8s %10s %10s" % ('', 'Popen', 'processes', 'ms/repo'))
+        for name, func in (('shell commands', shell_commands),
+                           ('collect()', collect)):
+            with PopenCounter() as counter:
+                start = time.time()
+                for _ in range(opts.repeat):
+                    func(path)
+                elapsed = time.time() - start
+            print("%-16s %8d %10d %10.2f" % (
+                name,
+                counter.calls // opts.repeat,
+                counter.processes // opts.repeat,
+                elapsed * 1000 / opts.repeat))
+    finally:
+        if not args:
+            shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+"""
+Time parsing a generated ``git log`` of N commits into revision tuples
+
+Compares the previous regular expression ``itersplit`` and
+``izip_longest`` field parsing with :mod:`pkgsetcomp.splitting`::
+
+    python tests/bench_splitting.py [-n COMMITS] [-r REPEAT]
+"""
+
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+try:
+    from itertools import izip_longest
+except ImportError:
+    from itertools import zip_longest as izip_longest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pkgsetcomp import pyrpo, splitting  # noqa
+
+
+def legacy_itersplit(s, sep=None):
+    # pyrpo.itersplit before pkgsetcomp.splitting
+    if not s:
+        yield s
+        return
+    exp = re.compile(r'\s+' if sep is None else re.escape(sep))
+    pos = 0
+    while True:
+        m = exp.search(s, pos)
+        if not m:
+            if pos < len(s) or sep is not None:
+                yield s[pos:]
+            break
+        if pos < m.start() or sep is not None:
+            yield s[pos:m.start()]
+        pos = m.end()
+
+
+def make_log(ncommits, fsep=pyrpo.DEFAULT_FSEP, lsep=pyrpo.DEFAULT_LSEP):
+    """
+    Returns:
+        str: ``git log --format=<GitRepository.template>`` output
+    """
+    return ''.join(
+        fsep.join((
+            '2014-05-21 12:%02d:%02d -0500' % (i // 60 % 60, i % 60),
+            '%07x' % (i * 2654435761 % 0xfffffff),
+            'Wes Turner',
+            ' (tag: v0.1.%d)' % i if i % 100 == 0 else '',
+            'Commit message number %d ' % i)) + lsep + '\n'
+        for i in range(ncommits))
+
+
+def parse_legacy(text, revtuple):
+    revs = []
+    for record in legacy_itersplit(text, pyrpo.DEFAULT_LSEP):
+        record = record.strip()
+        if not record:
+            continue
+        _fields = legacy_itersplit(record, pyrpo.DEFAULT_FSEP)
+        revs.append(revtuple(
+            *(t[1] for t in izip_longest(revtuple._fields, _fields))))
+    return revs
+
+
+def parse_split(text, revtuple):
+    nfields = len(revtuple._fields)
+    revs = []
+    for record in splitting.itersplit(text, pyrpo.DEFAULT_LSEP):
+        record = record.strip()
+        if not record:
+            continue
+        revs.append(revtuple(*splitting.split_fields(
+            record, pyrpo.DEFAULT_FSEP, nfields)))
+    return revs
+
+
+def parse_records(text, revtuple):
+    return [revtuple(*fields) for fields in splitting.parse_records(
+        text.split(pyrpo.DEFAULT_LSEP), pyrpo.DEFAULT_FSEP,
+        len(revtuple._fields))]
+
+
+def parse_columns(text, revtuple):
+    return splitting.split_columns(
+        text.split(pyrpo.DEFAULT_LSEP), pyrpo.DEFAULT_FSEP,
+        len(revtuple._fields))
+
+
+def main(argv=None):
+    import optparse
+    prs = optparse.OptionParser(usage="%prog [-n COMMITS] [-r REPEAT]")
+    prs.add_option('-n', dest='ncommits', type='int', default=1000000)
+    prs.add_option('-r', dest='repeat', type='int', default=3)
+    (opts, args) = prs.parse_args(argv)
+    revtuple = namedtuple(
+        'GitRev', [f[0] for f in pyrpo.GitRepository.fields])
+    text = make_log(opts.ncommits)
+    expected = parse_legacy(text, revtuple)
+    assert parse_split(text, revtuple) == expected
+    assert parse_records(text, revtuple) == expected
+    assert parse_columns(text, revtuple) == list(zip(*expected))
+
+    print("%d commits, %.1f MB" % (opts.ncommits, len(text) / 1e6))
+    print("%-24s %10s %8s" % ('', 's (best)', 'speedup'))
+    baseline = None
+    for name, func in (('legacy itersplit', parse_legacy),
+                       ('itersplit+split_fields', parse_split),
+                       ('parse_records', parse_records),
+                       ('split_columns', parse_columns)):
+        times = []
+        for _ in range(opts.repeat):
+            start = time.time()
+            func(text, revtuple)
+            times.append(time.time() - start)
+        best = min(times)
+        baseline = baseline or best
+        print("%-24s %10.3f %7.1fx" % (name, best, baseline / best))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pkgsetcomp import pkgsetcomp
+from pkgsetcomp.aptindex import PackageSizes, SourceIndex
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+class Test_PackageSizes(unittest.TestCase):
+
+    def setUp(self):
+        self.sizes = PackageSizes.from_apt_lists(
+            os.path.join(TESTDATA, 'apt-lists'),
+            os.path.join(TESTDATA, 'dpkg-status'))
+
+    def test_00_index(self):
+        self.assertEqual(len(self.sizes), 8)
+        self.assertEqual(self.sizes.names[0], 'bash')
+        self.assertEqual(self.sizes.size[0], 500000)
+
+    def test_10_totals(self):
+        totals = self.sizes.totals(['postfix', 'bash', 'missing'])
+        self.assertEqual(totals.count, 3)
+        self.assertEqual(totals.download, 1500000)
+        # installed size of postfix is read from the dpkg status file
+        self.assertEqual(totals.installed, (1500 + 3000) * 1024)
+        self.assertEqual(totals.missing, 1)
+
+    def test_15_from_rootfs(self):
+        tmpdir = tempfile.mkdtemp(prefix='rootfs_')
+        try:
+            root = os.path.join(tmpdir, 'root')
+            shutil.copytree(os.path.join(TESTDATA, 'apt-lists'),
+                            os.path.join(root, 'var', 'lib', 'apt', 'lists'))
+            os.makedirs(os.path.join(root, 'var', 'lib', 'dpkg'))
+            shutil.copy(os.path.join(TESTDATA, 'dpkg-status'),
+                        os.path.join(root, 'var', 'lib', 'dpkg', 'status'))
+            sizes = PackageSizes.from_rootfs(root)
+            self.assertEqual(sizes.totals(['postfix', 'bash', 'missing']),
+                             self.sizes.totals(['postfix', 'bash', 'missing']))
+            self.assertEqual(len(PackageSizes.from_rootfs(tmpdir)), 0)
+            tarball = os.path.join(tmpdir, 'rootfs.tar')
+            open(tarball, 'w').close()
+            self.assertRaises(ValueError, PackageSizes.from_rootfs, tarball)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_20_comparison_sizes(self):
+        comparison = pkgsetcomp.PkgComparison(
+            ['bsd-mailx'], ['bsd-mailx', 'postfix'], ['bash'],
+            ['bash'], ['bsd-mailx', 'postfix'])
+        sizes = comparison.sizes(self.sizes)
+        self.assertEqual(list(sizes), list(comparison._fields))
+        self.assertEqual(sizes['also_installed'].download, 1060000)
+        self.assertEqual(sizes['uninstalled'].installed, 1500 * 1024)
+
+
+class Test_SourceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = SourceIndex.from_apt_lists(
+            os.path.join(TESTDATA, 'apt-lists'),
+            os.path.join(TESTDATA, 'dpkg-status'))
+
+    def test_00_index(self):
+        self.assertEqual(len(self.sources), 8)
+        # Source: postfix (2.11.0-1)
+        self.assertEqual(self.sources.source('postfix'), 'postfix')
+        self.assertEqual(self.sources.source('libc6'), 'eglibc')
+        self.assertEqual(self.sources.source('libgcc1'), 'gcc-4.9')
+        # no Source field, or not indexed
+        self.assertEqual(self.sources.source('bash'), 'bash')
+        self.assertEqual(self.sources.source('missing'), 'missing')
+        with open(os.path.join(TESTDATA, 'dpkg-status')) as f:
+            installed = SourceIndex.from_dpkg_lines(f)
+        self.assertEqual(len(installed), 7)
+        self.assertEqual(installed.source('liblockfile1'), 'liblockfile')
+
+    def test_10_group(self):
+        sources = SourceIndex({'libfoo1': 'foo', 'foo-bin': 'foo',
+                               'libbar1': 'bar'})
+        groups = sources.group(['missing', 'libfoo1', 'foo-bin', 'libbar1'])
+        self.assertEqual(list(groups.items()), [
+            ('bar', ['libbar1']),
+            ('foo', ['foo-bin', 'libfoo1']),
+            ('missing', ['missing'])])
+
+    def test_20_comparison_by_source(self):
+        comparison = pkgsetcomp.PkgComparison(
+            ['bsd-mailx'], ['bsd-mailx', 'libc6', 'libgcc1'], ['bash'],
+            ['bash'], ['bsd-mailx', 'libc6', 'libgcc1'])
+        groups = comparison.by_source(self.sources)
+        self.assertEqual(list(groups), list(comparison._fields))
+        self.assertEqual(list(groups['also_installed']),
+                         ['bsd-mailx', 'eglibc', 'gcc-4.9'])
+        batches = comparison._install_batches(
+            comparison.also_installed,
+            sources=SourceIndex({'libc6': 'eglibc', 'libgcc1': 'eglibc'}))
+        self.assertEqual(list(batches), [['bsd-mailx'], ['libc6', 'libgcc1']])
@@ -0,0 +1,102 @@
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pkgsetcomp import pyrpo
+
+from tests.test_pyrpo import StringIO, git_init
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "asyncsh requires 3.7+")
+class Test_asyncsh(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repos = [
+            git_init(os.path.join(self.tmpdir, name), url)
+            for name, url in (
+                ('a', 'https://example.org/a.git'),
+                ('b', None),
+                ('c', 'https://example.org/c.git'))]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_00_ash(self):
+        import asyncio
+        from pkgsetcomp import asyncsh
+        self.assertEqual(
+            asyncio.run(asyncsh.ash('echo $0 && pwd', cwd=self.tmpdir)),
+            '/bin/sh\n%s\n' % os.path.realpath(self.tmpdir))
+        self.assertEqual(asyncio.run(asyncsh.ash(['echo', 'a b'])), 'a b\n')
+        self.assertEqual(
+            asyncio.run(asyncsh.ash('exit 3', ignore_error=True)), '')
+        self.assertRaises(Exception, asyncio.run, asyncsh.ash('exit 3'))
+        self.assertRaises(asyncio.TimeoutError, asyncio.run,
+                          asyncsh.ash('sleep 5', timeout=0.1))
+        self.assertEqual(
+            asyncio.run(self.repos[0].ash('git config remote.origin.url')),
+            'https://example.org/a.git\n')
+
+    def test_10_prefetch(self):
+        import asyncio
+        from pkgsetcomp import asyncsh
+        repo = self.repos[0]
+        asyncio.run(asyncsh.prefetch(repo, names=('remote_url', 'branch')))
+        self.assertNotIn('status', repo.__dict__)
+        asyncio.run(asyncsh.prefetch(repo))
+        self.assertEqual(repo.__dict__['status'], '')
+        # read from files, not prefetched
+        self.assertNotIn('remote_url', repo.__dict__)
+        self.assertEqual(repo.remote_url, 'https://example.org/a.git')
+
+    def test_20_run_repo_report(self):
+        from pkgsetcomp import asyncsh
+        missing = pyrpo.GitRepository(os.path.join(self.tmpdir, 'missing'))
+        expected = StringIO()
+        list(pyrpo.do_repo_report(self.repos, report='sh', output=expected))
+        asyncsh.set_concurrency(2)
+        try:
+            output = StringIO()
+            repos = asyncsh.run_repo_report(
+                [None, self.repos[0], missing] + self.repos[1:],
+                report='sh', output=output)
+        finally:
+            asyncsh.set_concurrency(64)
+        self.assertEqual(repos, [self.repos[0], missing] + self.repos[1:])
+        self.assertEqual(output.getvalue(), expected.getvalue())
+
+    def test_30_async_reports(self):
+        import subprocess
+        from pkgsetcomp import asyncsh
+        path = self.repos[0].fpath
+        for i in range(3):
+            with open(os.path.join(path, 'a'), 'w') as f:
+                f.write(str(i))
+            subprocess.check_call(['git', 'add', 'a'], cwd=path)
+            subprocess.check_call(
+                ['git', '-c', 'user.name=a', '-c', 'user.email=a@a',
+                 'commit', '-q', '-m', 'commit %d' % i], cwd=path)
+        with open(os.path.join(path, 'b'), 'w') as f:
+            f.write('b')
+        for report in ('full', 'status'):
+            expected = StringIO()
+            list(pyrpo.do_repo_report(
+                [pyrpo.GitRepository(path)], report=report,
+                output=expected))
+            sh, sh_records = pyrpo.sh, pyrpo.sh_records
+
+            def blocking(*args, **kwargs):
+                raise AssertionError("blocking command: %r" % (args,))
+            pyrpo.sh = pyrpo.sh_records = blocking
+            try:
+                output = StringIO()
+                asyncsh.run_repo_report([pyrpo.GitRepository(path)],
+                                        report=report, output=output)
+            finally:
+                pyrpo.sh, pyrpo.sh_records = sh, sh_records
+            self.assertEqual(output.getvalue(), expected.getvalue())
+            self.assertTrue('commit 2' in output.getvalue())
@@ -0,0 +1,74 @@
+
+import os
+import unittest
+
+from pkgsetcomp import backends
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+ROOTS = os.path.join(TESTDATA, 'roots')
+
+
+class Test_backends(unittest.TestCase):
+
+    def test_00_registry(self):
+        self.assertEqual(list(backends.BACKENDS),
+                         ['dpkg', 'pacman', 'apk', 'rpm-list'])
+        backend = backends.get_backend('apk', ROOTS)
+        self.assertTrue(isinstance(backend, backends.ApkBackend))
+        self.assertRaises(ValueError, backends.get_backend, 'emerge')
+        self.assertEqual(backends.dependency_name('readline>=7.0'),
+                         'readline')
+        self.assertEqual(backends.dependency_name('libncursesw.so=6-64'),
+                         'libncursesw.so')
+
+    def test_10_pacman(self):
+        backend = backends.PacmanBackend(os.path.join(ROOTS, 'pacman'))
+        graph = backend.depgraph()
+        self.assertTrue(backend.depgraph() is graph)
+        self.assertEqual(backend.manual_packages(), ['base', 'vim'])
+        self.assertEqual(len(backend.installed_packages()), 6)
+        # libncursesw.so is provided by ncurses
+        self.assertEqual(graph.targets('readline'), ['glibc', 'ncurses'])
+        self.assertEqual(graph.autoremovable(['base']),
+                         ['bash', 'readline', 'ncurses'])
+        self.assertRaises(IOError,
+                          backends.PacmanBackend(ROOTS).depgraph)
+
+    def test_20_apk(self):
+        backend = backends.ApkBackend(os.path.join(ROOTS, 'apk'))
+        graph = backend.depgraph()
+        # etc/apk/world
+        self.assertEqual(backend.manual_packages(),
+                         ['alpine-baselayout', 'busybox', 'curl'])
+        # /bin/sh and so:libc.musl-x86_64.so.1 are provided; conflicts
+        # (!baselayout-old) are not dependencies
+        self.assertEqual(graph.targets('alpine-baselayout'),
+                         ['alpine-baselayout-data', 'busybox'])
+        self.assertEqual(graph.targets('curl'), ['musl'])
+        self.assertEqual(list(graph.unsatisfied), ['curl'])
+        self.assertEqual(backend.read_manifest(['curl>=7.80 bash@edge\n']),
+                         ['bash', 'curl'])
+
+    def test_30_rpm_list(self):
+        backend = backends.RpmListBackend(os.path.join(TESTDATA,
+                                                       'rpm-qa.txt'))
+        self.assertEqual(backend.manual_packages(), [
+            'bash', 'coreutils', 'gpg-pubkey', 'perl-Net-SSLeay'])
+        for value, name in (
+                ('perl-Net-SSLeay', 'perl-Net-SSLeay'),
+                ('gpg-pubkey-f4a80eb5-53a7ff4b', 'gpg-pubkey'),
+                ('kernel-core-5.14.0-70.el9.x86_64', 'kernel-core'),
+                ('glibc-2.17-c758.alt1.i686', 'glibc'),
+                ('tzdata-2024a-1.fc39.noarch', 'tzdata'),
+                ('python3-setuptools-wheel', 'python3-setuptools-wheel'),
+                ('xorg-x11-fonts-100dpi', 'xorg-x11-fonts-100dpi'),
+                ('xorg-x11-fonts-ISO8859-1-100dpi',
+                 'xorg-x11-fonts-ISO8859-1-100dpi'),
+                ('xorg-x11-fonts-ISO8859-1-100dpi-7.5-9.el7.noarch',
+                 'xorg-x11-fonts-ISO8859-1-100dpi'),
+                ('libgcc-4.8.5-44.el7', 'libgcc-4.8.5-44.el7')):
+            self.assertEqual(backends.RpmListBackend.package_name(value),
+                             name)
+        self.assertRaises(IOError,
+                          backends.RpmListBackend(TESTDATA).depgraph)
+        self.assertEqual(backend.depgraph().refcounts['bash'], 0)
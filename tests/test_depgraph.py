@@ -0,0 +1,64 @@
+
+import unittest
+
+from pkgsetcomp.depgraph import DepGraph, ProvidesIndex
+
+
+class Test_DepGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = DepGraph({
+            'app': ['libapp', 'mail-transport-agent'],
+            'tool': ['libapp'],
+            'libapp': ['libc'],
+            'postfix': ['libc', 'libpostfix'],
+            'libpostfix': ['libc'],
+            'libc': [],
+            'manual': ['libc', 'missing'],
+        }, auto=['libapp', 'postfix', 'libpostfix', 'libc'])
+        self.graph.provides = ProvidesIndex(
+            {'mail-transport-agent': ['postfix']})
+
+    def test_00_refcounts(self):
+        self.assertEqual(self.graph.refcounts['libapp'], 2)
+        self.assertEqual(self.graph.refcounts['postfix'], 1)
+        self.assertEqual(self.graph.refcounts['libc'], 4)
+        self.assertEqual(self.graph.targets('app'), ['libapp', 'postfix'])
+
+    def test_05_provides(self):
+        resolve = self.graph.provides.resolve
+        self.assertEqual(resolve('mail-transport-agent', self.graph),
+                         ('postfix',))
+        self.assertEqual(resolve('libc', self.graph), ('libc',))
+        self.assertEqual(resolve('missing', self.graph), ())
+        self.assertEqual(dict(self.graph.unsatisfied),
+                         {'manual': [('missing',)]})
+
+    def test_10_autoremovable(self):
+        self.assertEqual(self.graph.autoremovable(['app']),
+                         ['postfix', 'libpostfix'])
+        self.assertEqual(
+            sorted(self.graph.autoremovable(['app', 'tool'])),
+            ['libapp', 'libpostfix', 'postfix'])
+        self.assertEqual(
+            sorted(self.graph.autoremovable(['app', 'tool', 'manual'])),
+            ['libapp', 'libc', 'libpostfix', 'postfix'])
+        self.assertEqual(self.graph.autoremovable(['missing']), [])
+
+    def test_15_layers(self):
+        self.assertEqual(
+            self.graph.layers(['app', 'libc', 'tool', 'libapp', 'manual']),
+            [['libc'], ['libapp', 'manual'], ['app', 'tool']])
+        # ordered through packages which are not selected
+        self.assertEqual(self.graph.layers(['app', 'libc', 'missing']),
+                         [['libc', 'missing'], ['app']])
+        cyclic = DepGraph({'a': ['b'], 'b': ['a'], 'c': ['a']})
+        self.assertEqual(cyclic.layers(['c', 'b', 'a']),
+                         [['b'], ['a'], ['c']])
+
+    def test_20_removal_impact(self):
+        impact = self.graph.removal_impact(['tool', ('app', 'tool')])
+        self.assertEqual(impact['tool'], [])
+        self.assertEqual(len(impact[('app', 'tool')]), 3)
+        # queries do not modify the reference counts
+        self.assertEqual(self.graph.refcounts['libapp'], 2)
@@ -0,0 +1,57 @@
+
+import os
+import unittest
+
+from pkgsetcomp import dpkg
+from pkgsetcomp.depgraph import DepGraph
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+DPKG_STATUS = os.path.join(TESTDATA, 'dpkg-status')
+APT_EXTENDED_STATES = os.path.join(TESTDATA, 'apt-extended_states')
+
+
+class Test_dpkg(unittest.TestCase):
+
+    def test_00_parse_relations(self):
+        self.assertEqual(
+            dpkg.parse_relations(
+                'libc6:any (>= 2.14), exim4 | mail-transport-agent,'
+                ' foo [amd64] <!nocheck>'),
+            [('libc6',), ('exim4', 'mail-transport-agent'), ('foo',)])
+        self.assertEqual(dpkg.parse_relations(''), [])
+        self.assertEqual(dpkg.parse_relations(None), [])
+
+    def test_10_read_status(self):
+        with dpkg.open_text(DPKG_STATUS) as f:
+            installed = dpkg.read_installed_packages(f)
+        self.assertEqual(installed, [
+            'bsd-mailx', 'debconf', 'libc6', 'libgcc1', 'liblockfile1',
+            'postfix', 'ssl-cert'])
+        with dpkg.open_text(DPKG_STATUS) as f:
+            depends, provides = dpkg.read_status_depends(f)
+        self.assertEqual(depends['postfix'][0], ('debconf', 'debconf-2.0'))
+        self.assertEqual(provides['mail-transport-agent'], ['postfix'])
+        with dpkg.open_text(APT_EXTENDED_STATES) as f:
+            auto = dpkg.read_auto_installed(f)
+        self.assertEqual(
+            auto, set(['libc6', 'libgcc1', 'liblockfile1', 'ssl-cert']))
+
+    def test_20_depgraph_from_dpkg_status(self):
+        graph = DepGraph.from_dpkg_status(DPKG_STATUS, APT_EXTENDED_STATES)
+        self.assertEqual(len(graph), 7)
+        self.assertEqual(graph.depends['bsd-mailx'][-1],
+                         ('exim4', 'mail-transport-agent'))
+        self.assertEqual(graph.targets('bsd-mailx'),
+                         ['libc6', 'liblockfile1', 'postfix'])
+        self.assertEqual(graph.targets('postfix'), ['debconf', 'libc6',
+                                                    'ssl-cert'])
+        self.assertEqual(list(graph.unsatisfied.items()), [
+            ('postfix', [('netbase',)]),
+            ('libgcc1', [('multiarch-support',), ('gcc-4.9-base',)]),
+            ('ssl-cert', [('openssl',)])])
+        self.assertEqual(
+            graph.dependencies_of(['bsd-mailx']),
+            set(['libc6', 'libgcc1', 'liblockfile1', 'postfix',
+                 'debconf', 'ssl-cert']))
+        self.assertEqual(graph.autoremovable(['bsd-mailx']),
+                         ['liblockfile1'])
@@ -0,0 +1,163 @@
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from pkgsetcomp import pyrpo
+from pkgsetcomp.gitfiles import GitDir, normalize_key, parse_config
+
+from tests.test_pyrpo import StringIO
+
+CONFIG = r"""# comment
+[core]
+	bare = false
+	filemode
+[remote "origin"]
+	url = "https://example.org/a b.git" ; comment
+	fetch = +refs/heads/*:refs/remotes/origin/*
+[Branch "Main"] Remote = origin
+[alias]
+	lg = "log \
+  --oneline" # comment
+[url "git@example.org:"]
+	insteadOf = https://example.org/
+	insteadOf = http://example.org/
+"""
+
+
+class Test_gitfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'repo')
+        os.makedirs(self.path)
+        self.git('init', '-q')
+        self.git('config', 'remote.origin.url', 'https://example.org/a.git')
+        with open(os.path.join(self.path, 'a'), 'w') as f:
+            f.write('a')
+        self.git('add', 'a')
+        self.git('commit', '-q', '-m', 'Initial commit')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def git(self, *args, **kwargs):
+        return subprocess.check_output(
+            ('git', '-c', 'user.name=a', '-c', 'user.email=a@a') + args,
+            cwd=kwargs.get('cwd', self.path),
+            universal_newlines=True).strip()
+
+    def assertGitDir(self, path):
+        gitdir = GitDir.find(path)
+        self.assertEqual(gitdir.resolve(), self.git('rev-parse', 'HEAD',
+                                                    cwd=path))
+        self.assertEqual(gitdir.head_id(),
+                         self.git('rev-parse', 'HEAD', cwd=path)[:7])
+        self.assertEqual(gitdir.branch(), self.git(
+            'rev-parse', '--abbrev-ref', 'HEAD', cwd=path))
+        self.assertEqual(gitdir.get('remote.origin.url'),
+                         'https://example.org/a.git')
+        return gitdir
+
+    def test_00_parse_config(self):
+        config = parse_config(CONFIG.splitlines())
+        self.assertEqual(list(config.items()), [
+            ('core.bare', ['false']),
+            ('core.filemode', [True]),
+            ('remote.origin.url', ['https://example.org/a b.git']),
+            ('remote.origin.fetch', ['+refs/heads/*:refs/remotes/origin/*']),
+            ('branch.Main.remote', ['origin']),
+            ('alias.lg', ['log   --oneline']),
+            ('url.git@example.org:.insteadof', ['https://example.org/',
+                                               'http://example.org/']),
+        ])
+        self.assertEqual(normalize_key('Branch.Main.REMOTE'),
+                         'branch.Main.remote')
+        self.assertEqual(normalize_key('Core.FileMode'), 'core.filemode')
+
+    def test_10_refs(self):
+        gitdir = self.assertGitDir(self.path)
+        self.assertEqual(gitdir.head(), self.git('symbolic-ref', 'HEAD'))
+        self.git('tag', 'v1')
+        self.git('pack-refs', '--all')
+        self.git('checkout', '-q', '-b', 'feature')
+        self.git('commit', '-q', '--allow-empty', '-m', 'feature')
+        gitdir = self.assertGitDir(self.path)
+        self.assertEqual(gitdir.branch(), 'feature')
+        self.assertEqual(gitdir.resolve('refs/tags/v1'),
+                         self.git('rev-parse', 'v1'))
+        self.assertEqual(gitdir.resolve('refs/tags/v2'), None)
+        self.git('checkout', '-q', '--detach', 'v1')
+        gitdir = GitDir.find(self.path)
+        self.assertEqual(gitdir.head(), None)
+        self.assertEqual(gitdir.branch(), '(detached)')
+        self.assertEqual(gitdir.resolve(), self.git('rev-parse', 'v1'))
+        self.assertEqual(
+            list(gitdir.iter_urls()),
+            ['remote.origin.url=https://example.org/a.git'])
+
+    def test_20_gitdir_files(self):
+        # a linked worktree: .git file + commondir
+        worktree = os.path.join(self.tmpdir, 'worktree')
+        self.git('worktree', 'add', '-q', '-b', 'wt', worktree)
+        self.assertGitDir(worktree)
+        self.assertEqual(GitDir.find(worktree).branch(), 'wt')
+        # a relative gitdir: file (as in submodules)
+        shutil.move(os.path.join(self.path, '.git'),
+                    os.path.join(self.tmpdir, 'repo.git'))
+        with open(os.path.join(self.path, '.git'), 'w') as f:
+            f.write('gitdir: ../repo.git\n')
+        self.assertGitDir(self.path)
+        self.assertEqual(GitDir.find(self.tmpdir), None)
+
+    def test_30_fallback(self):
+        gitdir = GitDir.find(self.path)
+        self.git('checkout', '-q', '--orphan', 'unborn')
+        self.assertEqual(gitdir.resolve(), None)
+        self.assertEqual(gitdir.branch(), 'unborn')
+        with open(os.path.join(self.path, '.git', 'config'), 'a') as f:
+            f.write('[include]\n\tpath = other.config\n')
+        gitdir = GitDir.find(self.path)
+        self.assertEqual(gitdir.config, None)
+        self.assertEqual(gitdir.get('remote.origin.url'), None)
+
+    def test_35_reftable(self):
+        git_dir = os.path.join(self.path, '.git')
+        head = self.git('symbolic-ref', 'HEAD')
+        with open(os.path.join(git_dir, 'HEAD'), 'w') as f:
+            f.write('ref: refs/heads/.invalid\n')
+        gitdir = GitDir.find(self.path)
+        self.assertEqual(gitdir.branch(), None)
+        with open(os.path.join(git_dir, 'HEAD'), 'w') as f:
+            f.write('ref: %s\n' % head)
+        self.assertNotEqual(GitDir.find(self.path).branch(), None)
+        with open(os.path.join(git_dir, 'config'), 'a') as f:
+            f.write('[extensions]\n\trefStorage = reftable\n')
+        gitdir = GitDir.find(self.path)
+        self.assertEqual(gitdir.branch(), None)
+        self.assertEqual(gitdir.head_id(), None)
+
+    def test_40_reports_without_processes(self):
+        with open(os.path.join(self.path, 'setup.py'), 'w') as f:
+            f.write('')
+        popen = subprocess.Popen
+        calls = []
+
+        def counting_popen(*args, **kwargs):
+            calls.append(args[0])
+            return popen(*args, **kwargs)
+        output = StringIO()
+        subprocess.Popen = counting_popen
+        try:
+            repo = pyrpo.GitRepository(self.path)
+            for report in ('sh', 'pip', 'origin'):
+                list(pyrpo.do_repo_report([repo], report=report,
+                                          output=output))
+        finally:
+            subprocess.Popen = popen
+        self.assertEqual(calls, [])
+        self.assertEqual(output.getvalue().splitlines()[1],
+                         '-e git+https://example.org/a.git@%s#egg=repo'
+                         % self.git('rev-parse', '--short=7', 'HEAD'))
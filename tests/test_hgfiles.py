@@ -0,0 +1,231 @@
+
+import binascii
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from pkgsetcomp import pyrpo
+from pkgsetcomp.hgfiles import (HgDir, NULL_ID, DIRSTATE_V2_MARKER,
+                                UrlSchemes, config_paths, config_stamp,
+                                parse_hgrc, read_config_files,
+                                read_dirstate_parents)
+
+from tests.test_pyrpo import StringIO
+
+HGRC = """\
+# comment
+[paths]
+default = https://example.org/hg/repo
+upstream = ssh://hg@example.org/repo
+; comment
+[ui]
+username = A
+  <a@example.org>
+[extensions]
+color =
+%unset color
+"""
+
+SCHEMES = (
+    ('py', 'https://hg.python.org/'),
+    ('gh', 'git://github.com/'),
+    ('gcode', 'https://{1}.googlecode.com/hg/'),
+    ('swap', 'https://example.org/{2}/{1}/'),
+    ('lossy', 'https://example.org/{2}/'),
+)
+
+P1 = binascii.unhexlify('1f4e63d8e4a2' + 'ab' * 14)
+P2 = binascii.unhexlify('cd' * 20)
+
+
+class Test_hgfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.hg_dir = os.path.join(self.tmpdir, '.hg')
+        os.makedirs(self.hg_dir)
+        self.write('requires', 'revlogv1\nstore\n')
+        self.write('hgrc', HGRC)
+        self.hgrcpath = os.environ.get('HGRCPATH')
+        self.user_hgrc = os.path.join(self.tmpdir, 'hgrc')
+        os.environ['HGRCPATH'] = self.user_hgrc
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        if self.hgrcpath is None:
+            os.environ.pop('HGRCPATH', None)
+        else:
+            os.environ['HGRCPATH'] = self.hgrcpath
+
+    def write(self, name, contents, mode='w'):
+        with open(os.path.join(self.hg_dir, name), mode) as f:
+            f.write(contents)
+
+    def test_00_parse_hgrc(self):
+        config = parse_hgrc(HGRC.splitlines())
+        self.assertEqual(list(config), ['paths', 'ui', 'extensions'])
+        self.assertEqual(list(config['paths'].items()), [
+            ('default', 'https://example.org/hg/repo'),
+            ('upstream', 'ssh://hg@example.org/repo')])
+        self.assertEqual(config['ui']['username'], 'A\n<a@example.org>')
+        self.assertEqual(dict(config['extensions']), {})
+        self.assertEqual(parse_hgrc(['%include ~/.hgrc.d/paths']), None)
+
+    def test_10_read_dirstate_parents(self):
+        self.assertEqual(read_dirstate_parents(P1 + P2 + b'\0' * 20),
+                         (P1, P2))
+        docket = (DIRSTATE_V2_MARKER + P1 + b'\0' * 12 + NULL_ID +
+                  b'\0' * 12 + b'\0' * 44)
+        self.assertEqual(read_dirstate_parents(docket), (P1, NULL_ID))
+        self.assertEqual(read_dirstate_parents(P1), None)
+
+    def test_20_hgdir(self):
+        hgdir = HgDir.find(self.tmpdir)
+        self.assertEqual(HgDir.find(self.hg_dir), None)
+        self.assertEqual(hgdir.get('paths', 'default'),
+                         'https://example.org/hg/repo')
+        self.assertEqual(list(hgdir.iter_config('paths')), [
+            'paths.default=https://example.org/hg/repo',
+            'paths.upstream=ssh://hg@example.org/repo'])
+        self.assertEqual(hgdir.branch(), 'default')
+        self.assertEqual(hgdir.head_id(), '000000000000')
+
+        self.write('branch', 'stable\n')
+        self.write('dirstate', P1 + NULL_ID + b'\0' * 30, 'wb')
+        hgdir = HgDir.find(self.tmpdir)
+        self.assertEqual(hgdir.branch(), 'stable')
+        self.assertEqual(hgdir.head_id(), '1f4e63d8e4a2')
+
+        # an uncommitted merge: left to hg
+        self.write('dirstate', P1 + P2, 'wb')
+        self.assertEqual(hgdir.head_id(), None)
+
+    def test_30_reports_without_processes(self):
+        self.write('dirstate', P1 + NULL_ID, 'wb')
+        popen = subprocess.Popen
+        calls = []
+
+        def counting_popen(*args, **kwargs):
+            calls.append(args[0])
+            return popen(*args, **kwargs)
+        output = StringIO()
+        subprocess.Popen = counting_popen
+        try:
+            repo = pyrpo.MercurialRepository(self.tmpdir)
+            for report in ('sh', 'origin', 'hgsub'):
+                list(pyrpo.do_repo_report([repo], report=report,
+                                          output=output))
+            self.assertEqual((repo.branch, repo.current_id),
+                             ('default', '1f4e63d8e4a2'))
+        finally:
+            subprocess.Popen = popen
+        self.assertEqual(calls, [])
+        self.assertTrue(output.getvalue().startswith(
+            "hg clone 'https://example.org/hg/repo' "))
+
+    def test_40_url_schemes(self):
+        schemes = UrlSchemes(SCHEMES)
+        for url, normal_url in (
+                ('py://cpython', 'https://hg.python.org/cpython'),
+                ('gh://westurner/dotfiles',
+                 'git://github.com/westurner/dotfiles'),
+                ('gcode://project', 'https://project.googlecode.com/hg/'),
+                ('gcode://project/sub/path',
+                 'https://project.googlecode.com/hg/sub/path'),
+                ('swap://a/b/c', 'https://example.org/b/a/c')):
+            self.assertEqual(schemes.to_normal_url(url), normal_url)
+            self.assertEqual(schemes.to_hg_scheme_url(normal_url), url)
+        self.assertEqual(schemes.to_normal_url('lossy://a/b'),
+                         'https://example.org/b/')
+        self.assertEqual(schemes.to_normal_url('https://example.org/a'),
+                         'https://example.org/a')
+        self.assertEqual(schemes.to_normal_url(None), None)
+        self.assertEqual(schemes.to_hg_scheme_url('ssh://example.org/a'),
+                         None)
+        self.assertEqual(UrlSchemes(()).to_hg_scheme_url('py://a'), None)
+
+        # more schemes than fit in one regular expression
+        many = UrlSchemes(('s%d' % i, 'https://example.org/%d/{1}/' % i)
+                          for i in range(100))
+        self.assertEqual(many.to_hg_scheme_url('https://example.org/75/a/b'),
+                         's75://a/b')
+
+    def test_50_config_files(self):
+        self.assertEqual(config_paths({'HGRCPATH': os.pathsep.join(
+            ('/etc/hgrc', '', '/etc/hgrc.d'))}), ['/etc/hgrc', '/etc/hgrc.d'])
+        self.assertEqual(config_paths({'HGRCPATH': ''}), [])
+        self.assertEqual(len(config_paths({})), 4)
+
+        rcdir = os.path.join(self.tmpdir, 'hgrc.d')
+        os.makedirs(rcdir)
+        with open(os.path.join(rcdir, 'a.rc'), 'w') as f:
+            f.write('[schemes]\npy = http://hg.python.org/\n')
+        with open(self.user_hgrc, 'w') as f:
+            f.write('[schemes]\npy = https://hg.python.org/\n')
+        paths = [rcdir, self.user_hgrc, os.path.join(self.tmpdir, 'none')]
+        self.assertEqual(read_config_files(paths)['schemes']['py'],
+                         'https://hg.python.org/')
+        stamp = config_stamp(paths)
+        self.assertEqual(stamp[2], None)
+        with open(self.user_hgrc, 'a') as f:
+            f.write('%include other.rc\n')
+        self.assertEqual(read_config_files(paths), None)
+        self.assertNotEqual(config_stamp(paths), stamp)
+
+    def test_60_url_schemes_cache(self):
+        with open(self.user_hgrc, 'w') as f:
+            f.write('[schemes]\ngh = git://github.com/\n')
+        hg = pyrpo.MercurialRepository
+        reads = []
+        read_url_schemes = hg._read_url_schemes
+
+        def counting_read(paths):
+            reads.append(paths)
+            return read_url_schemes(paths)
+        hg._read_url_schemes = staticmethod(counting_read)
+        try:
+            for _ in range(3):
+                self.assertEqual(hg.to_normal_url('gh://a/b'),
+                                 'git://github.com/a/b')
+                self.assertEqual(hg.to_hg_scheme_url('git://github.com/a/b'),
+                                 'gh://a/b')
+            self.assertEqual(len(reads), 1)
+
+            # ~/.hgrc changed
+            with open(self.user_hgrc, 'w') as f:
+                f.write('[schemes]\ngithub = git://github.com/\n')
+            self.assertEqual(hg.to_hg_scheme_url('git://github.com/a/b'),
+                             'github://a/b')
+            self.assertEqual(hg.to_normal_url('gh://a/b'), 'gh://a/b')
+            self.assertEqual(len(reads), 2)
+        finally:
+            hg._read_url_schemes = staticmethod(read_url_schemes)
+
+    def test_70_pip_report_without_processes(self):
+        self.write('dirstate', P1 + NULL_ID, 'wb')
+        self.write('hgrc', '[paths]\ndefault = gh://westurner/dotfiles\n')
+        with open(os.path.join(self.tmpdir, 'setup.py'), 'w') as f:
+            f.write('')
+        with open(self.user_hgrc, 'w') as f:
+            f.write('[schemes]\ngh = git://github.com/\n')
+        popen = subprocess.Popen
+        calls = []
+
+        def counting_popen(*args, **kwargs):
+            calls.append(args[0])
+            return popen(*args, **kwargs)
+        output = StringIO()
+        subprocess.Popen = counting_popen
+        try:
+            repos = [pyrpo.MercurialRepository(self.tmpdir)
+                     for _ in range(3)]
+            list(pyrpo.do_repo_report(repos, report='pip', output=output))
+        finally:
+            subprocess.Popen = popen
+        self.assertEqual(calls, [])
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            ['-e hg+git://github.com/westurner/dotfiles@1f4e63d8e4a2'
+             '#egg=%s' % os.path.basename(self.tmpdir)] * 3)
@@ -0,0 +1,89 @@
+
+
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# cumulative import time budgets, in microseconds
+IMPORT_BUDGETS = {
+    'pkgsetcomp': 10000,
+    'pkgsetcomp.pkgsetcomp': 60000,
+    'pkgsetcomp.pyrpo': 60000,
+}
+RUNS = 3
+
+# modules which must only be imported when they are used
+DEFERRED_MODULES = (
+    'asyncio',
+    'dateutil',
+    'distutils',
+    'json',
+    'pprint',
+    'shutil',
+    'subprocess',
+    'tarfile',
+    'tempfile',
+)
+
+
+def python(*args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [REPO_ROOT] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+    p = subprocess.Popen((sys.executable,) + args,
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE,
+                         env=env,
+                         cwd=REPO_ROOT,
+                         universal_newlines=True)
+    stdout, stderr = p.communicate()
+    if p.returncode:
+        raise Exception("%r returned %d\n%s" % (args, p.returncode, stderr))
+    return stdout, stderr
+
+
+def import_time(modname):
+    """
+    Args:
+        modname (str): module to import in a fresh interpreter
+    Returns:
+        int: cumulative import time of ``modname``, in microseconds
+    """
+    _, stderr = python('-X', 'importtime', '-c', 'import %s' % modname)
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == modname:
+            return int(fields[1])
+    raise ValueError("No import time for %r:\n%s" % (modname, stderr))
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime requires 3.7+")
+class Test_importtime(unittest.TestCase):
+
+    def test_00_import_budgets(self):
+        for modname, budget in sorted(IMPORT_BUDGETS.items()):
+            elapsed = min(import_time(modname) for _ in range(RUNS))
+            self.assertLessEqual(
+                elapsed, budget,
+                "import %s took %dus (budget: %dus)"
+                % (modname, elapsed, budget))
+
+    def test_10_deferred_imports(self):
+        stdout, _ = python('-c', '\n'.join((
+            'import sys',
+            'import pkgsetcomp, pkgsetcomp.pkgsetcomp, pkgsetcomp.pyrpo',
+            'print(" ".join(sorted(sys.modules)))',
+            'print("__version__" in vars(pkgsetcomp))',
+        )))
+        modules, version_read = stdout.splitlines()
+        modules = set(modules.split())
+        for modname in DEFERRED_MODULES:
+            self.assertNotIn(modname, modules)
+        self.assertEqual(version_read, 'False')
+        import pkgsetcomp
+        self.assertTrue(pkgsetcomp.__version__)
+        self.assertEqual(pkgsetcomp.version, pkgsetcomp.__version__)
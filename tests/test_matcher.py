@@ -0,0 +1,64 @@
+
+import unittest
+
+from pkgsetcomp import pkgsetcomp
+from pkgsetcomp.matcher import PatternSet, PrefixTrie, compile_matcher
+
+NAMES = [
+    'bash',
+    'bash-completion',
+    'language-pack-de',
+    'language-pack-de-base',
+    'libc6',
+    'libc6-dbg',
+    'libc6-dev',
+    'linux-headers-3.13.0-24',
+    'linux-image-3.13.0-24-generic',
+]
+
+
+class Test_matcher(unittest.TestCase):
+
+    def test_00_prefix_trie(self):
+        trie = PrefixTrie(['linux-image-', 'linux-headers-', 'linux-image-'])
+        self.assertEqual(len(trie), 2)
+        self.assertTrue(trie.match('linux-image-generic'))
+        self.assertTrue(trie.match('linux-image-'))
+        self.assertFalse(trie.match('linux-image'))
+        self.assertFalse(trie.match('linux-tools-common'))
+        self.assertFalse(PrefixTrie().match('bash'))
+        self.assertTrue(PrefixTrie(['']).match('bash'))
+
+    def test_10_pattern_set(self):
+        patterns = PatternSet(['bash', 'linux-*', 'language-pack-*-base',
+                               're:lib.*-d[be][gv]$'])
+        self.assertEqual(patterns.names, set(['bash']))
+        self.assertEqual(len(patterns.prefixes), 1)
+        self.assertEqual([name for name in NAMES if patterns.match(name)], [
+            'bash',
+            'language-pack-de-base',
+            'libc6-dbg',
+            'libc6-dev',
+            'linux-headers-3.13.0-24',
+            'linux-image-3.13.0-24-generic'])
+
+    def test_20_compile_matcher(self):
+        self.assertEqual(compile_matcher(), None)
+        match = compile_matcher(exclude=['linux-image-*', 'linux-headers-*',
+                                         'language-pack-*'])
+        self.assertEqual(list(match.filter(NAMES)), [
+            'bash', 'bash-completion', 'libc6', 'libc6-dbg', 'libc6-dev'])
+        match = compile_matcher(include=['lib*', 'bash'],
+                                exclude=['re:.*-d(bg|ev)$'])
+        self.assertEqual(list(match.filter(NAMES)), ['bash', 'libc6'])
+
+    def test_30_compare_package_lists(self):
+        match = compile_matcher(exclude=['linux-image-*'])
+        for compact in (False, True):
+            comparison = pkgsetcomp.compare_package_lists(
+                ['bash', 'linux-image-generic', 'zsh'],
+                iter(['bash', 'linux-image-3.13.0-24-generic', 'libc6']),
+                compact=compact,
+                match=match)
+            self.assertEqual(list(comparison.uninstalled), ['zsh'])
+            self.assertEqual(list(comparison.also_installed), ['libc6'])
@@ -0,0 +1,75 @@
+
+import unittest
+
+from pkgsetcomp.pkgset import PkgSet
+
+
+class Test_PkgSet(unittest.TestCase):
+
+    def setUp(self):
+        self.names = ['libfoo-dev', 'bash', 'libbar-dev', 'libbar1', 'bash']
+        self.pkgset = PkgSet(self.names)
+
+    def test_00_sorted_unique(self):
+        self.assertEqual(list(self.pkgset),
+                         ['bash', 'libbar-dev', 'libbar1', 'libfoo-dev'])
+        self.assertEqual(len(self.pkgset), 4)
+        self.assertEqual(self.pkgset[-1], 'libfoo-dev')
+        self.assertEqual(self.pkgset, set(self.names))
+        self.assertEqual(PkgSet.from_sorted(sorted(set(self.names))),
+                         self.pkgset)
+        self.assertRaises(ValueError, PkgSet.from_sorted, ['b', 'a'])
+
+    def test_10_contains(self):
+        for name in self.names:
+            self.assertTrue(name in self.pkgset)
+        for name in ('', 'a', 'libbar', 'libbar-dev0', 'zsh'):
+            self.assertFalse(name in self.pkgset)
+        self.assertFalse('bash' in PkgSet())
+        self.assertEqual(self.pkgset.index('libbar1'), 2)
+        self.assertRaises(ValueError, self.pkgset.index, 'libbar')
+
+    def test_20_prefix_match(self):
+        self.assertEqual(list(self.pkgset.prefix('libbar')),
+                         ['libbar-dev', 'libbar1'])
+        self.assertEqual(list(self.pkgset.prefix('')), list(self.pkgset))
+        self.assertEqual(list(self.pkgset.match('lib*-dev')),
+                         ['libbar-dev', 'libfoo-dev'])
+        self.assertEqual(list(self.pkgset.match('bash')), ['bash'])
+        pkgset = PkgSet(['bash', 'bash-completion', 'bashtop'])
+        self.assertEqual(list(pkgset.match('bash')), ['bash'])
+        self.assertEqual(list(pkgset.match('bas')), [])
+        self.assertEqual(list(pkgset.match('bash*')),
+                         ['bash', 'bash-completion', 'bashtop'])
+        self.assertEqual(list(self.pkgset.match('*1')), ['libbar1'])
+
+    def test_30_set_algebra(self):
+        other = ['bash', 'libbar1', 'zsh']
+        expected = set(self.names)
+        for op in ('union', 'intersection', 'difference',
+                   'symmetric_difference'):
+            result = getattr(self.pkgset, op)(PkgSet(other))
+            self.assertEqual(list(result),
+                             sorted(getattr(expected, op)(other)))
+        self.assertEqual(self.pkgset - self.pkgset, PkgSet())
+        self.assertTrue(PkgSet(['bash']).issubset(self.pkgset))
+        self.assertTrue(self.pkgset.isdisjoint(['zsh']))
+
+    def test_40_mask(self):
+        self.assertEqual(self.pkgset.mask(['libbar1', 'bash', 'zsh']),
+                         bytearray([1, 0, 1, 0]))
+        self.assertEqual(PkgSet().mask(['bash']), bytearray())
+
+    def test_50_positions(self):
+        self.assertEqual(
+            list(self.pkgset.positions(['zsh', 'libbar1', 'a', 'bash'])),
+            [-1, 0, 2, -1])
+        self.assertEqual(list(PkgSet().positions(['bash'])), [-1])
+        self.assertEqual(list(self.pkgset.positions([])), [])
+        # binary search (a few names) and merge (many names) agree
+        large = PkgSet('pkg%05d' % i for i in range(0, 20000, 2))
+        for step in (997, 3):
+            names = ['pkg%05d' % i for i in range(1, 20000, step)]
+            expected = [large.index(name) if name in large else -1
+                        for name in sorted(names)]
+            self.assertEqual(list(large.positions(names)), expected)
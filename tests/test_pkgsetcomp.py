@@ -1,10 +1,15 @@
 
 
+import os
 import shutil
 import tempfile
 import unittest
 
 from pkgsetcomp import pkgsetcomp
+from pkgsetcomp.depgraph import DepGraph
+from pkgsetcomp.matcher import compile_matcher
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
 
 
 class Test_pkgsetcomp(unittest.TestCase):
@@ -34,6 +39,116 @@ class Test_pkgsetcomp(unittest.TestCase):
 
         # raise Exception()
 
+    def test_03_lazy_comparison(self):
+        manifest = ['orange', 'carrot', 'corn']
+        installed = ['apple', 'orange', 'peach']
+
+        comparison = pkgsetcomp.compare_package_lists(manifest, installed)
+
+        self.assertEqual(comparison.uninstalled, ['carrot', 'corn'])
+        self.assertEqual(comparison.also_installed, ['apple', 'peach'])
+        # the dependency graph is only loaded for comparison.minimal
+        self.assertEqual(comparison._depgraph, None)
+        self.assertEqual(comparison._minimal, None)
+
+        comparison = pkgsetcomp.compare_package_lists(
+            manifest, installed, compact=True,
+            depgraph=DepGraph({'apple': ['peach'], 'peach': []}))
+        self.assertEqual(list(comparison.uninstalled), ['carrot', 'corn'])
+        self.assertEqual(comparison.manifest, set(manifest))
+        self.assertEqual(list(comparison.minimal), ['apple'])
+        minimal, also_installed, uninstalled, _, _ = comparison
+        self.assertEqual(list(also_installed), ['apple', 'peach'])
+        # a sequence of its fields, as the namedtuple was
+        self.assertEqual(len(comparison), 5)
+        self.assertEqual(list(comparison[0]), ['apple'])
+        self.assertEqual(list(comparison[-1]), list(comparison.installed))
+        self.assertEqual(comparison[1:3], (also_installed, uninstalled))
+        self.assertEqual(comparison, tuple(comparison))
+        self.assertEqual(comparison, pkgsetcomp.PkgComparison(
+            *comparison, compact=True))
+        self.assertNotEqual(comparison, pkgsetcomp.compare_package_lists(
+            manifest, [], compact=True, depgraph=DepGraph()))
+
+        # an excluded package still covers its dependencies
+        comparison = pkgsetcomp.compare_package_lists(
+            manifest, installed, compact=True,
+            depgraph=DepGraph({'apple': ['peach'], 'peach': []}),
+            match=compile_matcher(exclude=['apple']))
+        self.assertEqual(list(comparison.also_installed), ['peach'])
+        self.assertEqual(list(comparison.minimal), [])
+        self.assertEqual(list(comparison.installed), ['orange', 'peach'])
+
+        # any callable
+        comparison = pkgsetcomp.compare_package_lists(
+            manifest, installed,
+            depgraph=DepGraph({'apple': ['peach'], 'peach': []}),
+            match=lambda name: name.startswith('p'))
+        self.assertEqual(comparison.installed, ['peach'])
+        self.assertEqual(comparison.also_installed, ['peach'])
+        self.assertEqual(comparison.minimal, [])
+
+    def test_05_compare_with_dpkg_status(self):
+        depgraph = DepGraph.from_dpkg_status(
+            os.path.join(TESTDATA, 'dpkg-status'), None)
+        manifest = ['libc6', 'debconf']
+        installed = ['bsd-mailx', 'debconf', 'libc6', 'libgcc1', 'postfix']
+
+        comparison = pkgsetcomp.compare_package_lists(
+            manifest, installed, depgraph=depgraph)
+
+        self.assertEqual(comparison.also_installed,
+                         ['bsd-mailx', 'libgcc1', 'postfix'])
+        self.assertEqual(comparison.minimal, ['bsd-mailx'])
+
+        comparison.write_package_scripts(self.output_dir, depgraph=depgraph)
+        with open(os.path.join(self.output_dir,
+                               'also_installed.pkgs.sh')) as f:
+            self.assertEqual(f.read().splitlines(), [
+                'apt-get install libgcc1',
+                'apt-get install postfix',
+                'apt-get install bsd-mailx'])
+
+    def test_07_compare_rootfs(self):
+        root = os.path.join(self.output_dir, 'root')
+        dpkg_dir = os.path.join(root, 'var', 'lib', 'dpkg')
+        os.makedirs(dpkg_dir)
+        shutil.copy(os.path.join(TESTDATA, 'dpkg-status'),
+                    os.path.join(dpkg_dir, 'status'))
+        manifest = os.path.join(self.output_dir, 'test.manifest')
+        with open(manifest, 'w') as f:
+            f.write("libc6\t2.19-0ubuntu6\nbash\t4.3-6ubuntu1\n")
+
+        comparison = pkgsetcomp.pkgsetcomp_packages_with_manifest(
+            manifest, self.output_dir, root=root)
+
+        self.assertEqual(comparison.uninstalled, ['bash'])
+        self.assertEqual(comparison.minimal, ['bsd-mailx'])
+        self.assertEqual(len(comparison.installed), 7)
+
+        comparison = pkgsetcomp.pkgsetcomp_packages_with_manifest(
+            manifest, self.output_dir, root=root,
+            exclude=['bsd-*', 're:^ba'])
+
+        self.assertEqual(comparison.uninstalled, [])
+        # bsd-mailx is not listed, but still covers its dependencies
+        self.assertNotIn('bsd-mailx', comparison.also_installed)
+        self.assertEqual(comparison.minimal, [])
+
+    def test_08_compare_backend(self):
+        manifest = os.path.join(self.output_dir, 'pkglist.txt')
+        with open(manifest, 'w') as f:
+            f.write("base\nbash\nnano\n")
+
+        comparison = pkgsetcomp.pkgsetcomp_packages_with_manifest(
+            manifest, self.output_dir, backend='pacman',
+            root=os.path.join(TESTDATA, 'roots', 'pacman'))
+
+        self.assertEqual(comparison.manifest, ['base', 'bash', 'nano'])
+        self.assertEqual(comparison.installed, ['base', 'vim'])
+        self.assertEqual(comparison.uninstalled, ['bash', 'nano'])
+        self.assertEqual(comparison.minimal, ['vim'])
+
     def test_10_get_package_lists(self):
         installed, manifest = pkgsetcomp.get_package_lists(
             output_dir=self.output_dir)
@@ -0,0 +1,97 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pkgsetcomp import pkgsetcomp, pydist
+
+METADATA = {
+    'Flask-1.0.dist-info/METADATA': (
+        "Metadata-Version: 2.1\n"
+        "Name: Flask\n"
+        "Version: 1.0\n"
+        "Requires-Dist: Werkzeug (>=0.14)\n"
+        "Requires-Dist: Jinja2>=2.10\n"
+        "Requires-Dist: python-dotenv ; extra == 'dotenv'\n"
+        "Requires-Dist: colorama ; sys_platform == 'win32'\n"
+        "Requires-Dist: MarkupSafe ; python_version >= '2.6'\n"
+        "\n"
+        "Requires-Dist: not-a-header\n"),
+    'Werkzeug-0.14.dist-info/METADATA': (
+        "Name: Werkzeug\nVersion: 0.14\n"),
+    'Jinja2-2.10.egg-info/PKG-INFO': (
+        "Name: Jinja2\nVersion: 2.10\n"),
+    'Jinja2-2.10.egg-info/requires.txt': (
+        "MarkupSafe>=0.23\n\n[i18n]\nBabel>=0.8\n"),
+    'MarkupSafe-1.0.egg-info': (
+        "Name: MarkupSafe\nVersion: 1.0\n"),
+    'zope.interface-4.0.dist-info/METADATA': (
+        "Name: zope.interface\nVersion: 4.0\nRequires-Dist: setuptools\n"),
+}
+
+REQUIREMENTS = """\
+# web
+flask>=1.0
+-e git+https://github.com/westurner/pyrpo@abc123#egg=pyrpo
+#-e hg+/home/user/src/local@def456#egg=local
+-r other-requirements.txt
+zope_interface ; python_version >= "2.7"
+"""
+
+
+class Test_pydist(unittest.TestCase):
+
+    def setUp(self):
+        self.site_packages = tempfile.mkdtemp(prefix='site-packages_')
+        for path, content in METADATA.items():
+            path = os.path.join(self.site_packages, *path.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(content)
+        self.requirements = os.path.join(self.site_packages,
+                                         'requirements.txt')
+        with open(self.requirements, 'w') as f:
+            f.write(REQUIREMENTS)
+
+    def tearDown(self):
+        shutil.rmtree(self.site_packages)
+
+    def test_00_names(self):
+        self.assertEqual(pydist.normalize_name('Zope.Interface_'),
+                         'zope-interface-')
+        self.assertEqual(pydist.requirement_name('Foo_Bar[x] (>=1.0)'),
+                         'foo-bar')
+        self.assertEqual(list(pydist.iter_requirements([
+            'baz @ https://example.org/baz.whl',
+            'https://example.org/qux.tar.gz',
+            '--index-url https://example.org/simple',
+            'six==1.10 # pinned'])), ['baz', 'six'])
+
+    def test_10_read_site_packages(self):
+        dists = list(pydist.iter_distributions(self.site_packages))
+        self.assertEqual([dist.name for dist in dists], [
+            'flask', 'jinja2', 'markupsafe', 'werkzeug', 'zope-interface'])
+        self.assertEqual(dists[0].version, '1.0')
+        self.assertEqual(dists[0].requires, ['werkzeug', 'jinja2'])
+        self.assertEqual(dists[0].conditional, ['colorama', 'markupsafe'])
+        self.assertEqual(dists[1].requires, ['markupsafe'])
+        graph = pydist.read_site_packages([self.site_packages])
+        self.assertEqual(graph.dependencies_of(['flask']),
+                         set(['werkzeug', 'jinja2', 'markupsafe']))
+        # conditional requirements are dependencies only if installed
+        self.assertEqual(graph.targets('flask'),
+                         ['werkzeug', 'jinja2', 'markupsafe'])
+        self.assertEqual(list(graph.unsatisfied), ['zope-interface'])
+
+    def test_20_compare_site_packages(self):
+        comparison = pkgsetcomp.compare_site_packages(
+            [self.requirements], [self.site_packages])
+        self.assertEqual(comparison.manifest,
+                         ['flask', 'pyrpo', 'zope-interface'])
+        self.assertEqual(comparison.uninstalled, ['pyrpo'])
+        self.assertEqual(comparison.also_installed,
+                         ['jinja2', 'markupsafe', 'werkzeug'])
+        # markupsafe is a dependency of jinja2
+        self.assertEqual(comparison.minimal, ['jinja2', 'werkzeug'])
@@ -0,0 +1,293 @@
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from pkgsetcomp import pyrpo
+
+
+def git_init(path, url=None):
+    os.makedirs(path)
+    subprocess.check_call(['git', 'init', '-q', path])
+    if url is not None:
+        subprocess.check_call(
+            ['git', 'config', 'remote.origin.url', url], cwd=path)
+    return pyrpo.GitRepository(path)
+
+
+class Test_pyrpo(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.repos = [
+            git_init(os.path.join(self.tmpdir, name), url)
+            for name, url in (
+                ('a', 'https://example.org/a.git'),
+                ('b', None),
+                ('c', 'https://example.org/c.git'),
+                ('d', 'https://example.org/d.git'))]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def report(self, repos, report='origin', jobs=1):
+        output = StringIO()
+        done = list(pyrpo.do_repo_report(
+            repos, report=report, output=output, jobs=jobs))
+        return done, output.getvalue().splitlines()
+
+    def test_00_do_repo_report(self):
+        done, lines = self.report(self.repos)
+        self.assertEqual(done, self.repos)
+        self.assertEqual(lines, [
+            'git://%s = %s' % (
+                os.path.join(self.tmpdir, 'a'), 'https://example.org/a.git'),
+            'git://%s = ' % os.path.join(self.tmpdir, 'b'),
+            'git://%s = %s' % (
+                os.path.join(self.tmpdir, 'c'), 'https://example.org/c.git'),
+            'git://%s = %s' % (
+                os.path.join(self.tmpdir, 'd'), 'https://example.org/d.git'),
+        ])
+        self.assertRaises(Exception, list,
+                          pyrpo.do_repo_report(self.repos, report='nope'))
+
+    def test_10_do_repo_report_jobs(self):
+        serial = self.report(self.repos, report='sh')
+        for jobs in (2, 3, 8):
+            self.assertEqual(self.report(self.repos, report='sh', jobs=jobs),
+                             serial)
+
+    def test_15_do_repo_report_streams(self):
+        output = StringIO()
+        printed = []
+
+        def discover():
+            yield self.repos[0]
+            time.sleep(0.5)
+            yield self.repos[1]
+            # the first report is done: printed before discovery goes on
+            printed.append(output.getvalue())
+            for repo in self.repos[2:]:
+                yield repo
+        done = list(pyrpo.do_repo_report(
+            discover(), report='origin', output=output, jobs=8))
+        self.assertEqual(done, self.repos)
+        self.assertEqual(printed[0].splitlines(),
+                         output.getvalue().splitlines()[:1])
+
+    def test_20_do_repo_report_errors(self):
+        missing = pyrpo.GitRepository(os.path.join(self.tmpdir, 'missing'))
+        repos = self.repos[:2] + [missing, None] + self.repos[2:]
+        expected = self.report(self.repos)[1]
+        errors = []
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                errors.append(record.getMessage())
+        handler = Handler()
+        pyrpo.log.addHandler(handler)
+        try:
+            for jobs in (1, 3):
+                done, lines = self.report(repos, jobs=jobs)
+                self.assertEqual(done, self.repos[:2] + [missing] +
+                                 self.repos[2:])
+                self.assertEqual(lines, expected)
+        finally:
+            pyrpo.log.removeHandler(handler)
+        self.assertEqual(len(errors), 2)
+        for error in errors:
+            self.assertTrue('report failed' in error)
+            self.assertTrue('Traceback (most recent call last)' in error)
+
+    def test_30_git_collect(self):
+        path = self.repos[0].fpath
+
+        def git(*args):
+            subprocess.check_call(
+                ('git', '-c', 'user.name=a', '-c', 'user.email=a@a') + args,
+                cwd=path)
+        for name in ('a', 'b'):
+            with open(os.path.join(path, name), 'w') as f:
+                f.write(name)
+        git('add', 'a', 'b')
+        git('commit', '-q', '-m', 'Initial commit')
+        git('mv', 'a', 'c')
+        with open(os.path.join(path, 'b'), 'a') as f:
+            f.write('b')
+        with open(os.path.join(path, 'new file'), 'w') as f:
+            f.write('')
+
+        popen = subprocess.Popen
+        calls = []
+
+        def counting_popen(*args, **kwargs):
+            calls.append(args[0])
+            return popen(*args, **kwargs)
+        subprocess.Popen = counting_popen
+        try:
+            repo = pyrpo.GitRepository(path)
+            collected = (repo.status, repo.remote_url, repo.current_id,
+                         repo.branch, repo.last_commit)
+        finally:
+            subprocess.Popen = popen
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(isinstance(cmd, list) for cmd in calls))
+
+        expected = pyrpo.GitRepository(path)
+        self.assertEqual(collected, (
+            expected.sh('git status -s'),
+            'https://example.org/a.git',
+            expected.sh('git rev-parse --short HEAD').rstrip(),
+            expected.sh('git symbolic-ref --short HEAD').rstrip(),
+            next(expected.log_iter(maxentries=1))))
+        self.assertEqual(collected[0], ' M b\nR  a -> c\n?? "new file"\n')
+        self.assertEqual(collected[4].desc.strip(), 'Initial commit')
+
+        # no commits yet
+        repo = self.repos[1]
+        self.assertEqual(repo.collect(), {
+            'status': '',
+            'branch': repo.sh('git symbolic-ref --short HEAD').rstrip(),
+            'remote_url': ''})
+        self.assertRaises(Exception, getattr, repo, 'current_id')
+
+    def test_40_scandir_find_repos(self):
+        root = os.path.join(self.tmpdir, 'scan')
+        for path in ('a/sub/.hg', 'a/.git/modules/m/.hg',
+                     'b/node_modules/x/.git', 'build/g/.git', 'c',
+                     'd/e/f/.bzr'):
+            os.makedirs(os.path.join(root, *path.split('/')))
+        os.makedirs(os.path.join(root, 'a', '.git', 'refs'))
+        with open(os.path.join(root, 'c', '.git'), 'w') as f:
+            f.write('gitdir: ../a/.git\n')
+        os.symlink(os.path.join(root, 'a'), os.path.join(root, 'link'))
+
+        def find(**kwargs):
+            return [(repo.label, os.path.relpath(repo.fpath, root))
+                    for repo in pyrpo.find_unique_repos(root, **kwargs)]
+        self.assertEqual(find(), [
+            ('git', 'a'),
+            ('hg', os.path.join('a', 'sub')),
+            ('git', os.path.join('b', 'node_modules', 'x')),
+            ('git', os.path.join('build', 'g')),
+            ('git', 'c'),
+            ('bzr', os.path.join('d', 'e', 'f'))])
+        self.assertEqual(find(exclude=['node_modules', 'build/*']), [
+            ('git', 'a'),
+            ('hg', os.path.join('a', 'sub')),
+            ('git', 'c'),
+            ('bzr', os.path.join('d', 'e', 'f'))])
+        self.assertEqual(find(max_depth=1), [('git', 'a'), ('git', 'c')])
+        self.assertEqual(find(max_depth=0), [])
+        self.assertEqual(find(max_depth=2, one_file_system=True), [
+            ('git', 'a'),
+            ('hg', os.path.join('a', 'sub')),
+            ('git', os.path.join('build', 'g')),
+            ('git', 'c')])
+        self.assertEqual(find(exclude=['re:^[a-c]$']), [
+            ('git', os.path.join('build', 'g')),
+            ('bzr', os.path.join('d', 'e', 'f'))])
+
+    def test_50_discovery_index(self):
+        root = os.path.join(self.tmpdir, 'scan')
+        for path in ('a/.git', 'b/c/d', 'b/e/.hg', 'f'):
+            os.makedirs(os.path.join(root, *path.split('/')))
+        past = 1400000000
+
+        def age():
+            for dirpath, dirnames, _ in os.walk(root):
+                os.utime(dirpath, (past, past))
+
+        def find(index):
+            found = [os.path.relpath(repo.fpath, root)
+                     for repo in pyrpo.find_unique_repos(root, index=index)]
+            index.save()
+            return found, index.relisted
+        age()
+        filename = os.path.join(self.tmpdir, 'index.json')
+        expected = ['a', os.path.join('b', 'e')]
+        # 1 + a, b, c, d, e, f
+        self.assertEqual(find(pyrpo.DiscoveryIndex(filename)), (expected, 7))
+        self.assertEqual(find(pyrpo.DiscoveryIndex(filename)), (expected, 0))
+
+        # a new repository: b/c/d and the new directory are re-listed
+        os.makedirs(os.path.join(root, 'b', 'c', 'd', 'g', '.git'))
+        os.utime(os.path.join(root, 'b', 'c', 'd', 'g'), (past, past))
+        os.utime(os.path.join(root, 'b', 'c', 'd'), (past + 1, past + 1))
+        expected.insert(1, os.path.join('b', 'c', 'd', 'g'))
+        self.assertEqual(find(pyrpo.DiscoveryIndex(filename)), (expected, 2))
+        # a removed repository
+        shutil.rmtree(os.path.join(root, 'a'))
+        os.utime(root, (past + 1, past + 1))
+        index = pyrpo.DiscoveryIndex(filename)
+        self.assertEqual(find(index), (expected[1:], 1))
+        self.assertNotIn(os.path.join(root, 'a'), index.dirs)
+        self.assertEqual(
+            find(pyrpo.DiscoveryIndex(filename, rescan=True)),
+            (expected[1:], 7))
+
+        # recently modified directories are re-listed
+        os.utime(os.path.join(root, 'f'), None)
+        self.assertEqual(find(pyrpo.DiscoveryIndex(filename)),
+                         (expected[1:], 1))
+        self.assertEqual(find(pyrpo.DiscoveryIndex(filename)),
+                         (expected[1:], 1))
+
+        with open(filename, 'w') as f:
+            f.write('{')
+        self.assertEqual(pyrpo.DiscoveryIndex(filename).dirs, {})
+
+    def test_60_iter_records(self):
+        text = 'a |..|bb |..| |..|c |.. |..|'
+        for sep in (' |..|', '|', 'c'):
+            expected = text.split(sep)
+            for size in range(1, len(text) + 1):
+                chunks = [text[i:i + size]
+                          for i in range(0, len(text), size)]
+                self.assertEqual(
+                    list(pyrpo.iter_records(chunks, sep)), expected)
+        self.assertEqual(list(pyrpo.iter_records([], '|')), [''])
+
+    def test_70_sh_records(self):
+        self.assertEqual(
+            list(pyrpo.sh_records('printf "a|b|c"', '|', chunk_size=1)),
+            ['a', 'b', 'c'])
+        self.assertRaises(Exception, list,
+                          pyrpo.sh_records('echo a; exit 3', '|'))
+        self.assertEqual(
+            list(pyrpo.sh_records('echo a; echo b >&2; exit 3', '|',
+                                  ignore_error=True)),
+            ['a\n'])
+        # an endless command is stopped when the generator is closed
+        records = pyrpo.sh_records(['yes', 'record|'], '|\n')
+        self.assertEqual([next(records) for _ in range(3)], ['record'] * 3)
+        records.close()
+
+    def test_80_log_iter(self):
+        repo = self.repos[0]
+        for i in range(3):
+            subprocess.check_call(
+                ('git', '-c', 'user.name=a', '-c', 'user.email=a@a',
+                 'commit', '-q', '--allow-empty', '-m', 'commit %d' % i),
+                cwd=repo.fpath)
+        stdout = pyrpo.sys.stdout
+        pyrpo.sys.stdout = output = StringIO()
+        try:
+            commits = list(repo.log_iter())
+            last = list(repo.log_iter(maxentries=2))
+        finally:
+            pyrpo.sys.stdout = stdout
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual([c.desc.strip() for c in commits],
+                         ['commit 2', 'commit 1', 'commit 0'])
+        self.assertEqual(last, commits[:2])
+        self.assertEqual(list(self.repos[1].log_iter()), [])
@@ -0,0 +1,43 @@
+
+import unittest
+
+from pkgsetcomp import pkgsetcomp
+from pkgsetcomp.renames import NgramIndex, Rename, match_renames, ngrams
+
+
+class Test_renames(unittest.TestCase):
+
+    def test_00_ngrams(self):
+        self.assertEqual(ngrams('abc'), frozenset(('^ab', 'abc', 'bc$')))
+        self.assertEqual(ngrams(''), frozenset(('^$',)))
+
+    def test_10_search(self):
+        index = NgramIndex(['libfoo2', 'libfoo-dev', 'libbar1', 'zsh'])
+        self.assertEqual(len(index), 4)
+        results = index.search('libfoo1')
+        self.assertEqual([name for _, name in results],
+                         ['libfoo2', 'libfoo-dev'])
+        self.assertAlmostEqual(results[0][0], 10.0 / 14)
+        self.assertEqual(index.search('libfoo1', threshold=0.7),
+                         results[:1])
+        self.assertEqual(index.search('bash'), [])
+
+    def test_20_match_renames(self):
+        renames = match_renames(
+            ['libfoo1', 'libfoo-dev', 'python2.7', 'bash'],
+            ['libfoo2', 'python3.4', 'libfoo3', 'zsh'])
+        # each name is matched at most once, best score first:
+        # libfoo1 -> libfoo2 (10/14) before libfoo-dev -> libfoo2 (10/17)
+        self.assertEqual([(r.old, r.new) for r in renames], [
+            ('libfoo-dev', 'libfoo3'),
+            ('libfoo1', 'libfoo2'),
+            ('python2.7', 'python3.4')])
+        renames = match_renames(['python2.7'], ['python3.4'], threshold=0.6)
+        self.assertEqual(renames, [])
+
+    def test_30_comparison_renames(self):
+        comparison = pkgsetcomp.compare_package_lists(
+            ['bash', 'libfoo1', 'python2.7'],
+            ['bash', 'libfoo2', 'zsh'])
+        self.assertEqual(comparison.match_renames(),
+                         [Rename('libfoo1', 'libfoo2', 10.0 / 14)])
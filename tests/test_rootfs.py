@@ -0,0 +1,79 @@
+
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from pkgsetcomp import rootfs
+from pkgsetcomp.depgraph import DepGraph
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+def make_rootfs(path):
+    for name, dest in (('dpkg-status', rootfs.DPKG_STATUS),
+                       ('apt-extended_states', rootfs.APT_EXTENDED_STATES)):
+        dest = os.path.join(path, *dest.split('/'))
+        os.makedirs(os.path.dirname(dest))
+        shutil.copy(os.path.join(TESTDATA, name), dest)
+
+
+def add_bytes(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+class Test_rootfs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='rootfs_')
+        self.root = os.path.join(self.tmpdir, 'root')
+        make_rootfs(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assertDpkgDatabase(self, root):
+        graph = DepGraph.from_rootfs(root)
+        self.assertEqual(graph.manual_packages(),
+                         ['bsd-mailx', 'debconf', 'postfix'])
+        self.assertEqual(graph.targets('bsd-mailx'),
+                         ['libc6', 'liblockfile1', 'postfix'])
+
+    def test_00_directory(self):
+        self.assertDpkgDatabase(self.root)
+        files = rootfs.read_files(self.root, ['etc/missing'])
+        self.assertEqual(files, {'etc/missing': None})
+
+    def test_10_tarball(self):
+        tarball = os.path.join(self.tmpdir, 'rootfs.tar.gz')
+        with tarfile.open(tarball, 'w:gz') as tar:
+            tar.add(self.root, arcname='.')
+        self.assertDpkgDatabase(tarball)
+
+    def test_20_image(self):
+        layers = []
+        for i, whiteout in enumerate((False, True)):
+            layer = os.path.join(self.tmpdir, 'layer%d.tar' % i)
+            with tarfile.open(layer, 'w') as tar:
+                if whiteout:
+                    add_bytes(tar, 'var/lib/apt/.wh.extended_states', b'')
+                    add_bytes(tar, 'var/lib/dpkg/status',
+                              b'Package: zsh\nStatus: install ok installed\n')
+                else:
+                    tar.add(self.root, arcname='.')
+            layers.append(layer)
+        image = os.path.join(self.tmpdir, 'image.tar')
+        with tarfile.open(image, 'w') as tar:
+            for i, layer in enumerate(layers):
+                tar.add(layer, arcname='%d/layer.tar' % i)
+            add_bytes(tar, 'manifest.json', json.dumps([{
+                'Layers': ['0/layer.tar', '1/layer.tar']}]).encode('utf-8'))
+        status, extended_states = rootfs.read_dpkg_database(image)
+        self.assertEqual(status[0], 'Package: zsh\n')
+        self.assertEqual(extended_states, [])
+        self.assertRaises(IOError, rootfs.read_dpkg_database, self.tmpdir)
@@ -0,0 +1,65 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pkgsetcomp import setops
+
+
+class Test_setops(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='setops_')
+        self.lists = [
+            ['zsh', 'bash', 'vim', 'bash', 'curl'],
+            ['curl', 'vim', 'emacs'],
+            ['vim', 'zsh', 'git'],
+        ]
+        self.filenames = []
+        for i, names in enumerate(self.lists):
+            filename = os.path.join(self.tmpdir, '%d.pkgs.txt' % i)
+            with open(filename, 'w') as f:
+                f.write(''.join('%s\t1.0\n' % name for name in names))
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_00_external_sort(self):
+        names = ['n%04d' % (i * 7919 % 1000) for i in range(3000)]
+        for run_size in (10, 100, 5000):
+            result = list(setops.external_sort(names, run_size=run_size,
+                                               tmpdir=self.tmpdir))
+            self.assertEqual(result, sorted(set(names)))
+        # spilled runs are removed
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['0.pkgs.txt', '1.pkgs.txt', '2.pkgs.txt'])
+
+    def test_10_setop_files(self):
+        sets = [set(names) for names in self.lists]
+        expected = {
+            'union': sets[0] | sets[1] | sets[2],
+            'intersection': sets[0] & sets[1] & sets[2],
+            'difference': sets[0] - sets[1] - sets[2],
+            'symmetric_difference': sets[0] ^ sets[1] ^ sets[2],
+        }
+        for op in setops.SETOPS:
+            for run_size in (2, setops.DEFAULT_RUN_SIZE):
+                result = list(setops.setop_files(
+                    op, self.filenames, run_size=run_size,
+                    tmpdir=self.tmpdir))
+                self.assertEqual(result, sorted(expected[op]))
+
+    def test_20_iter_names(self):
+        lines = ['Package: vim\n', 'Depends: libc6\n', '\n',
+                 'Package: bash\n']
+        self.assertEqual(list(setops.iter_names(lines)), ['vim', 'bash'])
+        self.assertRaises(ValueError, list,
+                          setops.unique_sorted(['b', 'a']))
+
+    def test_30_main(self):
+        output = os.path.join(self.tmpdir, 'output.txt')
+        setops.main(['intersection', '-o', output] + self.filenames)
+        with open(output) as f:
+            self.assertEqual(f.read(), 'vim\n')
@@ -0,0 +1,75 @@
+
+import unittest
+from collections import namedtuple
+
+from pkgsetcomp import pyrpo
+from pkgsetcomp.splitting import (itersplit, itersplit_to_fields,
+                                  parse_records, split_columns, split_fields)
+
+from tests.bench_splitting import (legacy_itersplit, make_log, parse_columns,
+                                   parse_legacy, parse_records as
+                                   bench_parse_records, parse_split)
+
+Rev = namedtuple('Rev', ('date', 'rev', 'author'))
+
+
+class Test_splitting(unittest.TestCase):
+
+    def test_00_itersplit(self):
+        for s, sep in (('a b  c ', None),
+                       ('  a\tb\n', None),
+                       ('a||b|', '|'),
+                       ('|a', '|'),
+                       ('a ||| b ||| ', ' ||| '),
+                       ('abc', ' |..|'),
+                       ('', ' |..|'),
+                       (None, None)):
+            self.assertEqual(list(itersplit(s, sep)),
+                             list(legacy_itersplit(s, sep)))
+
+    def test_10_split_fields(self):
+        self.assertEqual(split_fields('a | b', ' | ', 3), ('a', 'b', None))
+        self.assertEqual(split_fields('a|b|c|d', '|', 3),
+                         ('a', 'b', 'c', 'd'))
+        self.assertEqual(split_fields('', '|', 2), ('', None))
+        self.assertEqual(split_fields(None, '|', 2), (None, None))
+
+    def test_20_itersplit_to_fields(self):
+        self.assertEqual(
+            itersplit_to_fields('d ||| r', revtuple=Rev),
+            Rev('d', 'r', None))
+        self.assertEqual(
+            itersplit_to_fields('d|r|a|x', '|', fields=('date', 'rev')),
+            (('date', 'd'), ('rev', 'r'), (None, 'a'), (None, 'x')))
+        self.assertEqual(
+            itersplit_to_fields(' d|r ', '|', revtuple=Rev,
+                                preparse=str.strip),
+            Rev('d', 'r', None))
+        self.assertRaises(TypeError, itersplit_to_fields, 'a|b|c|d', '|',
+                          revtuple=Rev)
+        # pyrpo re-exports, logging errors
+        self.assertEqual(pyrpo.itersplit_to_fields('d ||| r', revtuple=Rev),
+                         Rev('d', 'r', None))
+
+    def test_30_parse_records(self):
+        records = ['a|1|x\n', '  ', 'b|2', 'c']
+        self.assertEqual(parse_records(records, '|', 3),
+                         [('a', '1', 'x'), ('b', '2', None),
+                          ('c', None, None)])
+        self.assertEqual(split_columns(records, '|', 3),
+                         [('a', 'b', 'c'), ('1', '2', None),
+                          ('x', None, None)])
+        self.assertEqual(split_columns(['a|1|x'], '|', 2),
+                         [('a',), ('1',)])
+        self.assertEqual(split_columns([], '|', 2), [(), ()])
+
+    def test_40_log(self):
+        revtuple = namedtuple(
+            'GitRev', [f[0] for f in pyrpo.GitRepository.fields])
+        text = make_log(250)
+        expected = parse_legacy(text, revtuple)
+        self.assertEqual(len(expected), 250)
+        self.assertEqual(parse_split(text, revtuple), expected)
+        self.assertEqual(bench_parse_records(text, revtuple), expected)
+        self.assertEqual(parse_columns(text, revtuple),
+                         list(zip(*expected)))